@@ -1,22 +1,14 @@
 from flask import Flask, render_template, request, jsonify, send_file
-import pickle
-import yfinance as yf
 import pandas as pd
 import numpy as np
-from finta import TA
 from datetime import datetime, timedelta
 import json
 import os
 from pathlib import Path
 from dotenv import load_dotenv
-import google.generativeai as genai
-from document_rag_agent import DocumentRAGAgent
-from technical_analysis import TechnicalAnalysisEngine
 import uuid
 import requests
-from textblob import TextBlob
 import re
-from bs4 import BeautifulSoup
 import time
 
 # Load environment variables
@@ -28,88 +20,113 @@ app = Flask(__name__)
 chat_sessions = {}  # session_id -> chat_history
 current_session_id = None
 
-# Configure Gemini API
-GEMINI_API_KEY = os.getenv('GOOGLE_API_KEY') or os.getenv('GEMINI_API_KEY')
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-    gemini_model = genai.GenerativeModel(os.getenv('GEMINI_MODEL', 'gemini-1.5-flash'))
-    print(f" Gemini API anahtarı yüklendi: {GEMINI_API_KEY[:10]}...")
-else:
-    print("Gemini API anahtarı bulunamadı. .env dosyasında GOOGLE_API_KEY veya GEMINI_API_KEY tanımlayın.")
-    gemini_model = None
-
-# News API Configuration
-NEWS_API_KEY = os.getenv('NEWS_API_KEY', '67b1d8b38f8b4ba8ba13fada3b9deac1')  # API key
-NEWS_API_URL = "https://newsapi.org/v2/everything"
-
-# Initialize Document RAG Agent
-try:
-    document_rag_agent = DocumentRAGAgent()
-    print("Document RAG Agent basariyla yuklendi")
-except Exception as e:
-    print(f"Document RAG Agent yuklenemedi: {e}")
-    document_rag_agent = None
-
-# Initialize Technical Analysis Engine
-try:
-    technical_analysis_engine = TechnicalAnalysisEngine()
-    print("Technical Analysis Engine basariyla yuklendi")
-except Exception as e:
-    print(f"Technical Analysis Engine yuklenemedi: {e}")
-    technical_analysis_engine = None
-
-# Initialize Financial Q&A Agent
-try:
-    from financial_qa_agent import FinancialQAAgent
-    financial_qa_agent = FinancialQAAgent()
-    print("Financial Q&A Agent basariyla yuklendi")
-except Exception as e:
-    print(f"Financial Q&A Agent yuklenemedi: {e}")
-    financial_qa_agent = None
-
-# Initialize Investment Advisor
-try:
-    from investment_advisor import InvestmentAdvisor
-    investment_advisor = InvestmentAdvisor()
-    print("Investment Advisor başarıyla yüklendi")
-except Exception as e:
-    print(f"Investment Advisor yüklenemedi: {e}")
-    investment_advisor = None
-
-# Hisse simülasyon modülünü import et
-try:
-    from hisse_simulasyon import hisse_simulasyon
-    print("Hisse Simülasyon modülü başarıyla yüklendi")
-except Exception as e:
-    print(f"Hisse Simülasyon modülü yüklenemedi: {e}")
-    hisse_simulasyon = None
-
-# Initialize Portfolio Manager
-try:
-    from portfolio_manager import PortfolioManager
-    portfolio_manager = PortfolioManager()
-    print("Portfolio Manager başarıyla yüklendi")
-except Exception as e:
-    print(f"Portfolio Manager yüklenemedi: {e}")
-    portfolio_manager = None
-
-# Initialize Financial Calendar
-try:
-    from financial_calendar import FinancialCalendar
-    financial_calendar = FinancialCalendar()
-    print("Financial Calendar başarıyla yüklendi")
-except Exception as e:
-    print(f"Financial Calendar yüklenemedi: {e}")
-    financial_calendar = None
-
-# Initialize Financial Alert System
-try:
-    from financial_alerts import FinancialAlertSystem
-    financial_alert_system = FinancialAlertSystem()
-    print("Financial Alert System başarıyla yüklendi")
-except Exception as e:
-    print(f"Financial Alert System yüklenemedi: {e}")
-    financial_alert_system = None
+# Grafik ve kod sanal alanı işçi süreçleri (forkserver/spawn) bu betiği __mp_main__ adıyla yeniden içe aktarır;
+# ajanlar, modeller ve izleyici iş parçacıkları yalnızca uygulama sürecinde kurulur
+if __name__ != '__mp_main__':
+    import google.generativeai as genai
+    from document_rag_agent import DocumentRAGAgent
+    from technical_analysis import TechnicalAnalysisEngine
+    from market_data import market_data_service
+    from indicators import compute_indicators, indicator_engine
+    from bist_calendar import bist_calendar
+    from singleflight import SingleFlight
+    from symbol_resolver import symbol_resolver
+    from universe import parse_condition, universe_cache
+    from model_registry import model_registry
+    from chart_cache import chart_cache
+    from chart_renderer import chart_renderer
+    from code_sandbox import code_sandbox
+    from code_cache import code_cache
+    from llm_gateway import llm_gateway
+    from price_predictor import (HORIZONS, MODEL_FEATURES, PRICE_MODEL, explain_prediction, feature_contributions,
+                                 forecast_batch, forecast_features, predict_batch, prediction_cache)
+    from textblob import TextBlob
+    from bs4 import BeautifulSoup
+
+    # Configure Gemini API
+    GEMINI_API_KEY = os.getenv('GOOGLE_API_KEY') or os.getenv('GEMINI_API_KEY')
+    if GEMINI_API_KEY:
+        genai.configure(api_key=GEMINI_API_KEY)
+        gemini_model = genai.GenerativeModel(os.getenv('GEMINI_MODEL', 'gemini-1.5-flash'))
+        print(f" Gemini API anahtarı yüklendi: {GEMINI_API_KEY[:10]}...")
+    else:
+        print("Gemini API anahtarı bulunamadı. .env dosyasında GOOGLE_API_KEY veya GEMINI_API_KEY tanımlayın.")
+        gemini_model = None
+
+    # News API Configuration
+    NEWS_API_KEY = os.getenv('NEWS_API_KEY', '67b1d8b38f8b4ba8ba13fada3b9deac1')  # API key
+    NEWS_API_URL = "https://newsapi.org/v2/everything"
+    # Aynı haber sorgusu için eşzamanlı istekler tek API çağrısını paylaşır
+    news_flight = SingleFlight()
+
+    # Initialize Document RAG Agent
+    try:
+        document_rag_agent = DocumentRAGAgent()
+        print("Document RAG Agent basariyla yuklendi")
+    except Exception as e:
+        print(f"Document RAG Agent yuklenemedi: {e}")
+        document_rag_agent = None
+
+    # Initialize Technical Analysis Engine
+    try:
+        technical_analysis_engine = TechnicalAnalysisEngine()
+        print("Technical Analysis Engine basariyla yuklendi")
+    except Exception as e:
+        print(f"Technical Analysis Engine yuklenemedi: {e}")
+        technical_analysis_engine = None
+
+    # Initialize Financial Q&A Agent
+    try:
+        from financial_qa_agent import FinancialQAAgent
+        financial_qa_agent = FinancialQAAgent()
+        print("Financial Q&A Agent basariyla yuklendi")
+    except Exception as e:
+        print(f"Financial Q&A Agent yuklenemedi: {e}")
+        financial_qa_agent = None
+
+    # Initialize Investment Advisor
+    try:
+        from investment_advisor import InvestmentAdvisor
+        investment_advisor = InvestmentAdvisor()
+        print("Investment Advisor başarıyla yüklendi")
+    except Exception as e:
+        print(f"Investment Advisor yüklenemedi: {e}")
+        investment_advisor = None
+
+    # Hisse simülasyon modülünü import et
+    try:
+        from hisse_simulasyon import hisse_simulasyon
+        print("Hisse Simülasyon modülü başarıyla yüklendi")
+    except Exception as e:
+        print(f"Hisse Simülasyon modülü yüklenemedi: {e}")
+        hisse_simulasyon = None
+
+    # Initialize Portfolio Manager
+    try:
+        from portfolio_manager import PortfolioManager
+        portfolio_manager = PortfolioManager()
+        print("Portfolio Manager başarıyla yüklendi")
+    except Exception as e:
+        print(f"Portfolio Manager yüklenemedi: {e}")
+        portfolio_manager = None
+
+    # Initialize Financial Calendar
+    try:
+        from financial_calendar import FinancialCalendar
+        financial_calendar = FinancialCalendar()
+        print("Financial Calendar başarıyla yüklendi")
+    except Exception as e:
+        print(f"Financial Calendar yüklenemedi: {e}")
+        financial_calendar = None
+
+    # Initialize Financial Alert System
+    try:
+        from financial_alerts import FinancialAlertSystem
+        financial_alert_system = FinancialAlertSystem()
+        print("Financial Alert System başarıyla yüklendi")
+    except Exception as e:
+        print(f"Financial Alert System yüklenemedi: {e}")
+        financial_alert_system = None
 
 # Sohbet geçmişi yönetimi
 def create_new_session():
@@ -273,21 +290,12 @@ def export_chat_history(session_id, format='txt'):
     
     return None
 
-# Model yükleme
-def load_model():
-    try:
-        with open('model/kchol_xgb_model.pkl', 'rb') as f:
-            model = pickle.load(f)
-        return model
-    except Exception as e:
-        print(f"Model yüklenirken hata: {e}")
-        return None
-
 # Gemini AI ile genel soruları yanıtlama
 def get_gemini_response(user_message, context=""):
     try:
         # Fiyat tahmini için özel prompt
         if any(word in user_message.lower() for word in ['tahmin', 'fiyat', 'ne olacak', 'yükselir mi', 'düşer mi']):
+            scope = 'chat_prediction'
             system_prompt = f"""
 Sen profesyonel bir finans analisti olarak KCHOL hisse senedi fiyat tahmini yapıyorsun.
 
@@ -310,6 +318,7 @@ Kullanıcı sorusu: {user_message}
 """
         else:
             # Genel sorular için
+            scope = 'chat'
             system_prompt = f"""
 Sen Türkçe konuşan bir finans ve yatırım asistanısın. KCHOL hisse senedi ve genel finans konularında uzman bilgi veriyorsun.
 
@@ -328,8 +337,9 @@ Lütfen aşağıdaki kurallara uygun olarak yanıt ver:
 {context}
 """
         
-        response = gemini_model.generate_content(system_prompt)
-        response_text = response.text.strip()
+        # Aynı soru + aynı piyasa bağlamı için önbellekten (llm_gateway)
+        response_text = llm_gateway.generate(gemini_model, system_prompt, scope=scope,
+                                             question=user_message, context=context).strip()
         
         # Eğer Gemini hata mesajı veriyorsa None döndür
         if "Üzgünüm" in response_text or "şu anda yanıt veremiyorum" in response_text or "error" in response_text.lower():
@@ -343,37 +353,22 @@ Lütfen aşağıdaki kurallara uygun olarak yanıt ver:
 # Hisse verisi alma ve özellik çıkarma
 def get_stock_data(symbol='KCHOL.IS', days=300):
     try:
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
-        
-        print(f"Veri alınıyor: {symbol} - {start_date} to {end_date}")
-        df = yf.download(symbol, start_date, end_date, progress=False)
-        
-        print(f"Alınan veri boyutu: {df.shape}")
+        print(f"Veri alınıyor: {symbol} - son {days} gün")
+        df = market_data_service.get_history(symbol, days=days)
         
-        if df.empty:
+        if df is None:
             print("Veri boş!")
             return None
             
-        print(f"Orijinal sütunlar: {df.columns.tolist()}")
-        
-        # Sütun isimlerini düzenleme
-        df.columns = ['_'.join(col).lower() for col in df.columns]
-        df.columns = [col.split('_')[0] for col in df.columns]
-        
-        print(f"Düzenlenmiş sütunlar: {df.columns.tolist()}")
+        print(f"Alınan veri boyutu: {df.shape}")
         
-        # Teknik indikatörler
-        df['SMA200'] = TA.SMA(df, 200)
-        df['RSI'] = TA.RSI(df)
-        df['ATR'] = TA.ATR(df)
-        df['BBWidth'] = TA.BBWIDTH(df)
-        df['Williams'] = TA.WILLIAMS(df)
+        # Teknik indikatörler (ortak indikatör motoru, sembol/bar başına bir kez hesaplanır)
+        df = compute_indicators(df, symbol, columns=MODEL_FEATURES)
         
         print(f"Teknik indikatörler eklendi. Veri boyutu: {df.shape}")
         
-        # NaN değerleri temizleme
-        df = df.dropna()
+        # NaN değerleri temizleme (modelin kullandığı sütunlarda)
+        df = df.dropna(subset=MODEL_FEATURES)
         
         print(f"NaN temizlendikten sonra veri boyutu: {df.shape}")
         
@@ -387,124 +382,41 @@ def get_stock_data(symbol='KCHOL.IS', days=300):
         return None
 
 # Tahmin fonksiyonu
-def create_model_explanation(X, features, predicted_price, current_price):
-    """Model tahminini açıklayan basit analiz (SHAP olmadan)"""
-    try:
-        # Özellik değerlerini al
-        feature_values = X[0] if len(X.shape) > 1 else X
-        
-        # Özellik katkılarını hesapla (basit yaklaşım)
-        explanations = []
-        
-        # Fiyat verileri analizi
-        close_price = feature_values[features.index('close')]
-        high_price = feature_values[features.index('high')]
-        low_price = feature_values[features.index('low')]
-        open_price = feature_values[features.index('open')]
-        volume = feature_values[features.index('volume')]
-        
-        # Teknik göstergeler
-        sma200 = feature_values[features.index('SMA200')]
-        rsi = feature_values[features.index('RSI')]
-        atr = feature_values[features.index('ATR')]
-        bbwidth = feature_values[features.index('BBWidth')]
-        williams = feature_values[features.index('Williams')]
-        
-        # Fiyat pozisyonu analizi
-        if close_price > sma200:
-            explanations.append(f"Kapanış fiyatı ({close_price:.2f} TL) 200 günlük ortalamanın ({sma200:.2f} TL) üzerinde - Yükseliş trendi")
-        else:
-            explanations.append(f"Kapanış fiyatı ({close_price:.2f} TL) 200 günlük ortalamanın ({sma200:.2f} TL) altında - Düşüş trendi")
-        
-        # RSI analizi
-        if rsi > 70:
-            explanations.append(f"RSI ({rsi:.1f}) aşırı alım bölgesinde - Düşüş riski")
-        elif rsi < 30:
-            explanations.append(f"RSI ({rsi:.1f}) aşırı satım bölgesinde - Yükseliş fırsatı")
-        else:
-            explanations.append(f"RSI ({rsi:.1f}) nötr bölgede - Trend devam edebilir")
-        
-        # Volatilite analizi
-        if atr > 5:
-            explanations.append(f"Yüksek volatilite (ATR: {atr:.2f}) - Fiyat hareketleri büyük olabilir")
-        else:
-            explanations.append(f"Düşük volatilite (ATR: {atr:.2f}) - Fiyat hareketleri sınırlı olabilir")
-        
-        # Bollinger Bant analizi
-        if bbwidth > 0.2:
-            explanations.append(f"Geniş Bollinger Bantları ({bbwidth:.3f}) - Volatilite artıyor")
-        else:
-            explanations.append(f"Dar Bollinger Bantları ({bbwidth:.3f}) - Volatilite azalıyor")
-        
-        # Williams %R analizi
-        if williams < -80:
-            explanations.append(f"Williams %R ({williams:.1f}) aşırı satım - Yükseliş sinyali")
-        elif williams > -20:
-            explanations.append(f"Williams %R ({williams:.1f}) aşırı alım - Düşüş sinyali")
-        else:
-            explanations.append(f"Williams %R ({williams:.1f}) nötr bölge")
-        
-        # Hacim analizi
-        avg_volume = volume / 1000000  # Milyon cinsinden
-        if avg_volume > 10:
-            explanations.append(f"Yüksek işlem hacmi ({avg_volume:.1f}M) - Güçlü trend")
-        else:
-            explanations.append(f"Düşük işlem hacmi ({avg_volume:.1f}M) - Zayıf trend")
-        
-        # Tahmin yönü analizi
-        if predicted_price > current_price:
-            trend_direction = "YÜKSELİŞ"
-            confidence = "Yüksek" if abs(predicted_price - current_price) > 5 else "Orta"
-        else:
-            trend_direction = "DÜŞÜŞ"
-            confidence = "Yüksek" if abs(predicted_price - current_price) > 5 else "Orta"
-        
-        return {
-            'trend_direction': trend_direction,
-            'confidence': confidence,
-            'explanations': explanations,
-            'key_factors': {
-                'price_vs_sma200': "Yukarı" if close_price > sma200 else "Aşağı",
-                'rsi_signal': "Aşırı alım" if rsi > 70 else "Aşırı satım" if rsi < 30 else "Nötr",
-                'volatility': "Yüksek" if atr > 5 else "Düşük",
-                'volume_strength': "Güçlü" if avg_volume > 10 else "Zayıf"
-            }
-        }
-        
-    except Exception as e:
-        print(f"Model açıklama hatası: {e}")
-        return {
-            'trend_direction': "Belirsiz",
-            'confidence': "Düşük",
-            'explanations': ["Model açıklaması oluşturulamadı"],
-            'key_factors': {}
-        }
-
-def predict_price(model, df):
+def predict_price(model, df, symbol='KCHOL.IS'):
     try:
-        print(f"Tahmin fonksiyonu başladı. Veri boyutu: {len(df) if df is not None else 'None'}")
-        
         if df is None:
             return None, "Veri bulunamadı"
             
         if len(df) < 1:
             return None, f"Yeterli veri bulunamadı. Mevcut veri: {len(df)} satır"
         
-        # Son veriyi al
-        latest_data = df.iloc[-1:].copy()
-        print(f"Son veri sütunları: {latest_data.columns.tolist()}")
-        
         # Gerekli özellikler
-        features = ['close', 'high', 'low', 'open', 'volume', 'SMA200', 'RSI', 'ATR', 'BBWidth', 'Williams']
+        features = MODEL_FEATURES
         
         # Eksik özellikleri kontrol et
-        missing_features = [f for f in features if f not in latest_data.columns]
+        missing_features = [f for f in features if f not in df.columns]
         if missing_features:
             print(f"Eksik özellikler: {missing_features}")
             return None, f"Eksik özellikler: {missing_features}"
         
-        # Tahmin için veriyi hazırla
-        X = latest_data[features].values
+        # Tahmin için son satırı hazırla (DataFrame kopyası oluşturmadan)
+        X = df.to_numpy(dtype='f8')[-1:, df.columns.get_indexer(features)]
+        
+        # Tahmin tarihi: BIST takvimine göre sonraki işlem günü (hafta sonu ve tatiller atlanır)
+        tomorrow = bist_calendar.next_trading_day(bist_calendar.now().date())
+        
+        # Aynı model sürümü ve aynı son bar için sonuç önbellekten döner
+        entry = model_registry.entry(PRICE_MODEL)
+        cache_key = None
+        if entry is not None and entry.model is model:
+            cache_key = prediction_cache.key(entry.version, symbol, df.index[-1], X)
+            cached = prediction_cache.get(cache_key)
+            if cached is not None:
+                cached['prediction_date'] = tomorrow.strftime('%Y-%m-%d')
+                return cached, None
+        
+        print(f"Tahmin fonksiyonu başladı. Veri boyutu: {len(df)}")
+        print(f"Son veri sütunları: {df.columns.tolist()}")
         print(f"Tahmin verisi şekli: {X.shape}")
         print(f"Tahmin verisi: {X}")
         
@@ -512,19 +424,22 @@ def predict_price(model, df):
         prediction = model.predict(X)[0]
         print(f"Tahmin sonucu: {prediction}")
         
-        current_price = latest_data['close'].iloc[0]
+        current_price = X[0, features.index('close')]
         change = prediction - current_price
         change_percent = (change / current_price) * 100
         
-        # Tahmin tarihini hesapla (hafta sonu kontrolü ile)
-        tomorrow = datetime.now() + timedelta(days=1)
-        if tomorrow.weekday() >= 5:  # Cumartesi veya Pazar
-            # Sonraki iş gününe kadar ilerle
-            while tomorrow.weekday() >= 5:
-                tomorrow = tomorrow + timedelta(days=1)
-        
-        # Model açıklaması oluştur (SHAP olmadan)
-        model_explanation = create_model_explanation(X, features, prediction, current_price)
+        # Model açıklaması: ağaçların kendi özellik katkıları (pred_contribs); sonuçla birlikte önbelleğe alınır
+        try:
+            contributions = feature_contributions(model, X)[0]
+            model_explanation = explain_prediction(X[0], contributions, prediction, current_price)
+        except Exception as e:
+            print(f"Model açıklama hatası: {e}")
+            model_explanation = {
+                'trend_direction': "Belirsiz",
+                'confidence': "Düşük",
+                'explanations': ["Model açıklaması oluşturulamadı"],
+                'key_factors': {}
+            }
         
         result = {
             'current_price': float(round(current_price, 2)),
@@ -536,6 +451,8 @@ def predict_price(model, df):
         }
         
         print(f"Tahmin sonucu: {result}")
+        if cache_key is not None:
+            prediction_cache.put(cache_key, result)
         return result, None
         
     except Exception as e:
@@ -544,7 +461,50 @@ def predict_price(model, df):
         traceback.print_exc()
         return None, f"Tahmin hatası: {e}"
 
+# Sorudaki vade ifadesine göre tahmin ufku (işlem günü)
+HORIZON_KEYWORDS = [
+    (20, ['gelecek ay', 'önümüzdeki ay', 'bir ay', '1 ay', 'ay sonra', 'aylık', 'ay içinde']),
+    (5, ['gelecek hafta', 'önümüzdeki hafta', 'bir hafta', '1 hafta', 'hafta sonra', 'haftalık', 'hafta içinde']),
+]
+
+def requested_horizon(message):
+    for horizon, keywords in HORIZON_KEYWORDS:
+        if any(keyword in message for keyword in keywords):
+            return horizon
+    return 1
+
 # Haber analizi fonksiyonları
+def _fetch_news_query(search_query):
+    """Tek bir arama sorgusu için News API çağrısı"""
+    params = {
+        'q': search_query,
+        'sortBy': 'publishedAt',
+        'apiKey': NEWS_API_KEY,
+        'pageSize': 10
+    }
+    
+    print(f"Geniş arama yapılıyor: {search_query}")
+    
+    response = requests.get(NEWS_API_URL, params=params)
+    
+    print(f"Arama sorgusu: {search_query}")
+    print(f"API URL: {response.url}")
+    print(f"Status Code: {response.status_code}")
+    
+    if response.status_code != 200:
+        print(f"News API hatası ({search_query}): {response.status_code}")
+        print(f"Response: {response.text}")
+        return []
+    
+    data = response.json()
+    articles = data.get('articles', [])
+    print(f"Bulunan haber sayısı: {len(articles)}")
+    
+    # Her makaleye kaynak şirket bilgisi ekle
+    for article in articles:
+        article['source_company'] = search_query
+    return articles
+
 def get_news_articles(query="KCHOL Koç Holding", days=7):
     """Haber API'sinden makaleleri al"""
     try:
@@ -565,33 +525,7 @@ def get_news_articles(query="KCHOL Koç Holding", days=7):
         all_articles = []
         
         for search_query in search_queries:
-            params = {
-                'q': search_query,
-                'sortBy': 'publishedAt',
-                'apiKey': NEWS_API_KEY,
-                'pageSize': 10
-            }
-            
-            print(f"Geniş arama yapılıyor: {search_query}")
-            
-            response = requests.get(NEWS_API_URL, params=params)
-            
-            print(f"Arama sorgusu: {search_query}")
-            print(f"API URL: {response.url}")
-            print(f"Status Code: {response.status_code}")
-            
-            if response.status_code == 200:
-                data = response.json()
-                articles = data.get('articles', [])
-                print(f"Bulunan haber sayısı: {len(articles)}")
-                
-                # Her makaleye kaynak şirket bilgisi ekle
-                for article in articles:
-                    article['source_company'] = search_query
-                all_articles.extend(articles)
-            else:
-                print(f"News API hatası ({search_query}): {response.status_code}")
-                print(f"Response: {response.text}")
+            all_articles.extend(news_flight.do(('news', search_query), _fetch_news_query, search_query))
         
         # Duplicate makaleleri temizle (URL'ye göre)
         unique_articles = []
@@ -844,8 +778,8 @@ Yanıt kuralları:
 5. Teknik jargon kullanma
 6. Haberlerin fiyat üzerindeki potansiyel etkisini açıkla
 """
-            response = gemini_model.generate_content(gemini_prompt)
-            response_text = response.text.strip()
+            response_text = llm_gateway.generate(gemini_model, gemini_prompt, scope='news',
+                                                 ttl=llm_gateway.news_ttl).strip()
             if response_text and "Üzgünüm" not in response_text and "şu anda yanıt veremiyorum" not in response_text:
                 return response_text
             else:
@@ -882,8 +816,8 @@ def chat():
         # Kullanıcı mesajını oturuma ekle
         add_message_to_session(session_id, 'user', original_message)
         
-        # Model yükleme
-        model = load_model()
+        # Model açılışta yüklendi, burada yalnızca kayıttaki güncel nesne alınır
+        model = model_registry.get(PRICE_MODEL)
         if model is None:
             error_response = 'Üzgünüm, model şu anda kullanılamıyor. Lütfen daha sonra tekrar deneyin.'
             add_message_to_session(session_id, 'bot', error_response, 'error')
@@ -1096,7 +1030,8 @@ def chat():
             # Teknik analiz yap
             if technical_analysis_engine:
                 try:
-                    result = technical_analysis_engine.process_technical_analysis_request(original_message)
+                    result = technical_analysis_engine.process_technical_analysis_request(original_message,
+                                                                                          data.get('chart_mode'))
                     
                     if result.get('error'):
                         error_response = f'Teknik analiz hatası: {result["error"]}'
@@ -1147,8 +1082,8 @@ Yanıt kuralları:
 - Risk uyarısı ekle
 - Maksimum 4-5 paragraf yaz
 """
-                                strategy_response = gemini_model.generate_content(strategy_prompt)
-                                strategy_text = strategy_response.text.strip()
+                                strategy_text = llm_gateway.generate(gemini_model, strategy_prompt,
+                                                                     scope='strategy').strip()
                                 
                                 if strategy_text and "Üzgünüm" not in strategy_text:
                                     enhanced_response = f"""KCHOL Teknik Analiz Raporu
@@ -1313,6 +1248,21 @@ Not: Bu öneriler teknik analiz sonuçlarına dayalıdır. Yatırım kararı ver
                     'session_id': session_id
                 })
             
+            # Haftalık/aylık sorularda vade modelleri aynı özellik satırıyla çağrılır
+            horizon = requested_horizon(message)
+            horizon_text = ""
+            if horizon != 1:
+                X = df.to_numpy(dtype='f8')[-1:, df.columns.get_indexer(MODEL_FEATURES)]
+                forecast = forecast_features('KCHOL.IS', X, df.index[-1])
+                result['horizons'] = forecast['horizons']
+                requested = next((f for f in forecast['horizons'] if f['horizon'] == horizon), None)
+                if requested is not None:
+                    horizon_text = f"\n\n{horizon} işlem günü sonrası ({requested['target_date']}) için vade modelinin tahmini {requested['predicted_price']:.2f} TL ({requested['change_percent']:+.2f}%)."
+                else:
+                    horizon_text = f"\n\n{horizon} işlem günlük vade modeli henüz yayınlanmadığı için tahmin ertesi işlem gününe aittir."
+                for item in forecast['horizons']:
+                    horizon_text += f"\n• {item['horizon']} işlem günü ({item['target_date']}): {item['predicted_price']:.2f} TL ({item['change_percent']:+.2f}%)"
+            
             # Sadece model tahmini ve teknik analiz ile cevap ver (web araması yapma)
             print("Model tahmini ve teknik analiz ile yanıt oluşturuluyor...")
             
@@ -1336,7 +1286,7 @@ Teknik analiz sonuçlarına göre trend yönü {model_explanation.get('trend_dir
                 if key_factors:
                     explanation_text += f"""
 
-Teknik göstergelerin detaylı analizi sonucunda, fiyat 200 günlük hareketli ortalamanın {key_factors.get('price_vs_sma200', 'Belirsiz')} tarafında konumlanmaktadır. RSI göstergesi {key_factors.get('rsi_signal', 'Belirsiz')} seviyede olup, volatilite {key_factors.get('volatility', 'Belirsiz')} seviyede seyretmektedir. Hacim verileri ise {key_factors.get('volume_strength', 'Belirsiz')} bir yapı göstermektedir."""
+Modelin ağaç katkılarına göre tahmini en çok yukarı çeken gösterge {key_factors.get('top_positive') or 'yok'} ({key_factors.get('top_positive_contribution', 0):+.2f} TL), en çok aşağı çeken gösterge ise {key_factors.get('top_negative') or 'yok'} ({key_factors.get('top_negative_contribution', 0):+.2f} TL) olmuştur. Modelin taban değeri {model_explanation.get('base_value', 0):.2f} TL'dir."""
             
             # Teknik analiz özeti - bağlamlı ve neden-sonuç ilişkili
             technical_summary = f"""
@@ -1357,7 +1307,7 @@ RİSK UYARISI: Bu analiz sadece teknik göstergelere dayalıdır ve yatırım ta
             
             response = f"""KCHOL Hisse Senedi Fiyat Tahmini
 
-KCHOL hisse senedi şu anda {result['current_price']} TL seviyesinde işlem görüyor. Teknik analiz sonuçlarına göre, hisse senedinin {result['predicted_price']:.2f} TL seviyesine {result['change']:+.2f} TL ({result['change_percent']:+.2f}%) değişimle ulaşması bekleniyor. {trend_text}
+KCHOL hisse senedi şu anda {result['current_price']} TL seviyesinde işlem görüyor. Teknik analiz sonuçlarına göre, hisse senedinin {result['predicted_price']:.2f} TL seviyesine {result['change']:+.2f} TL ({result['change_percent']:+.2f}%) değişimle ulaşması bekleniyor. {trend_text}{horizon_text}
 
 {explanation_text}
 
@@ -1998,6 +1948,8 @@ def get_technical_analysis():
     try:
         data = request.get_json()
         user_request = data.get('request', '')
+        # Varsayılan: seriler + grafik tanımı (tarayıcıda çizilir); sunucu PNG'si için render=png
+        chart_mode = data.get('render') or request.args.get('render')
         
         if not technical_analysis_engine:
             return jsonify({
@@ -2006,7 +1958,7 @@ def get_technical_analysis():
             }), 500
         
         # Teknik analiz yap
-        result = technical_analysis_engine.process_technical_analysis_request(user_request)
+        result = technical_analysis_engine.process_technical_analysis_request(user_request, chart_mode)
         
         if result.get('error'):
             # Gemini API olmadan da çalışabilmeli
@@ -2014,7 +1966,7 @@ def get_technical_analysis():
                 # Varsayılan analiz yap
                 df = technical_analysis_engine.get_stock_data()
                 if df is not None:
-                    charts = technical_analysis_engine.create_default_charts(df)
+                    charts = technical_analysis_engine.create_default_charts(df, chart_mode)
                     analysis = technical_analysis_engine.analyze_technical_indicators(df)
                     
                     result = {
@@ -2045,6 +1997,120 @@ def get_technical_analysis():
             'message': f'Teknik analiz hatası: {str(e)}'
         }), 500
 
+@app.route('/api/market_data/stats', methods=['GET'])
+def get_market_data_stats():
+    """Piyasa verisi önbelleği isabet/ıska istatistikleri"""
+    return jsonify({
+        'success': True,
+        'data': market_data_service.stats(),
+        'news_single_flight': news_flight.stats(),
+        'symbol_resolver': symbol_resolver.stats(),
+        'indicator_cache': indicator_engine.stats(),
+        'universe_cache': universe_cache.stats(),
+        'prediction_cache': prediction_cache.stats(),
+        'chart_cache': chart_cache.stats(),
+        'chart_renderer': chart_renderer.stats(),
+        'code_sandbox': code_sandbox.stats(),
+        'code_cache': code_cache.stats(),
+        'llm_gateway': llm_gateway.stats()
+    })
+
+@app.route('/api/model', methods=['GET'])
+def get_model_info():
+    """Fiyat tahmin modelinin sürümü, özellik listesi ve yükleme bilgileri"""
+    info = model_registry.info(PRICE_MODEL)
+    if info is None:
+        return jsonify({
+            'success': False,
+            'message': 'Model şu anda kullanılamıyor'
+        }), 503
+    return jsonify({
+        'success': True,
+        'data': info,
+        'registry': model_registry.stats()
+    })
+
+@app.route('/api/predictions', methods=['GET'])
+def get_batch_predictions():
+    """İzleme listesindeki tüm hisseler için ertesi işlem günü tahminleri (tek model çağrısı)"""
+    try:
+        symbols = [s.strip().upper() for s in request.args.get('symbols', '').split(',') if s.strip()]
+        explain = request.args.get('explain', 'false').lower() == 'true'
+        table = predict_batch(symbols or None, explain=explain)
+        return jsonify({
+            'success': True,
+            'model': model_registry.info(PRICE_MODEL),
+            'count': len(table),
+            'data': table.to_dict(orient='records')
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Toplu tahmin hatası: {str(e)}'
+        }), 500
+
+@app.route('/api/forecast', methods=['GET'])
+def get_forecast():
+    """Çoklu ufuk tahmini: ?symbols=KCHOL.IS,GARAN.IS&horizons=1,5,20 (özellikler bir kez hesaplanır)"""
+    try:
+        symbols = [s.strip().upper() for s in request.args.get('symbols', 'KCHOL.IS').split(',') if s.strip()]
+        horizons = [int(h) for h in request.args.get('horizons', '').split(',') if h.strip()] or HORIZONS
+        table = forecast_batch(symbols, horizons)
+        available = sorted(table['horizon'].unique().tolist())
+        return jsonify({
+            'success': True,
+            'horizons': horizons,
+            'available_horizons': available,
+            'unavailable_horizons': [h for h in horizons if h not in available],
+            'count': len(table),
+            'data': table.to_dict(orient='records')
+        })
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': f'Geçersiz ufuk: {str(e)}'
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Çoklu ufuk tahmin hatası: {str(e)}'
+        }), 500
+
+@app.route('/api/screener', methods=['GET'])
+def get_screener():
+    """İzleme listesi taraması: ör. ?by=RSI&top=5&filter=VOLUME_RATIO>1.5"""
+    try:
+        if not investment_advisor:
+            return jsonify({
+                'success': False,
+                'message': 'Yatırım danışmanı kullanılamıyor'
+            }), 500
+        
+        by = request.args.get('by', 'RSI').upper()
+        top_n = int(request.args.get('top', 5))
+        ascending = request.args.get('ascending', 'false').lower() == 'true'
+        days = int(request.args.get('days', 60))
+        conditions = [parse_condition(text) for text in request.args.getlist('filter')]
+        
+        result = investment_advisor.screen_watchlist(by, top_n, ascending, conditions, days)
+        return jsonify({
+            'success': True,
+            'data': result
+        })
+        
+    except (ValueError, KeyError) as e:
+        return jsonify({
+            'success': False,
+            'message': f'Geçersiz tarama isteği: {str(e)}'
+        }), 400
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Tarama hatası: {str(e)}'
+        }), 500
+
 @app.route('/api/portfolio', methods=['GET'])
 def get_portfolio():
     """Kullanıcının portföyünü getir"""
@@ -0,0 +1,232 @@
+# backtest.py
+# Fiyat modeli için ileri yürüyen (walk-forward) geriye dönük test - sembol başına süreç havuzunda çalışır
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from xgboost import XGBRegressor
+
+from indicators import compute_indicators
+from market_data import market_data_service
+
+# model/arge-model.ipynb'deki nihai eğitim parametreleri
+TRAIN_PARAMS = {
+    'objective': 'reg:squarederror',
+    'n_estimators': 750,
+    'colsample_bytree': 0.7,
+    'learning_rate': 0.05,
+    'max_depth': 3,
+    'gamma': 1,
+}
+
+BACKTEST_DIR = os.getenv('BACKTEST_DIR', 'data/backtests')
+TRADING_DAYS = 252
+
+
+def build_dataset(df: pd.DataFrame, features: List[str], symbol: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """Notebook'taki kurulum: özellikler + hedef olarak ertesi günün kapanışı (close.shift(-1))
+
+    Dönüş sözlüğü: X (satır, özellik), y (ertesi kapanış), close (bugünkü kapanış), dates.
+    Özelliklerinden biri NaN olan ya da hedefi olmayan (son bar) satırlar çıkarılır.
+    """
+    frame = compute_indicators(df, symbol, columns=features)
+    X = frame[features].to_numpy(dtype='f8')
+    close = frame['close'].to_numpy(dtype='f8')
+    y = np.append(close[1:], np.nan)
+
+    valid = ~np.isnan(X).any(axis=1) & ~np.isnan(y)
+    return {'X': X[valid], 'y': y[valid], 'close': close[valid],
+            'dates': frame.index[valid].strftime('%Y-%m-%d').to_numpy()}
+
+
+def walk_forward(X: np.ndarray, y: np.ndarray, train_window: int = 250, test_window: int = 20,
+                 expanding: bool = False, params: Optional[Dict] = None) -> np.ndarray:
+    """Kayan pencerelerle yeniden eğit / tahmin et; tahmin edilmeyen satırlar NaN kalır
+
+    Her adımda model [başlangıç, t) aralığında eğitilir ve [t, t + test_window)
+    bloğu tek predict çağrısıyla tahmin edilir; böylece hiçbir tahmin kendi
+    eğitim verisini görmez.
+    """
+    params = {**TRAIN_PARAMS, **(params or {})}
+    predictions = np.full(len(y), np.nan)
+    for start in range(train_window, len(y), test_window):
+        train_from = 0 if expanding else start - train_window
+        model = XGBRegressor(**params)
+        model.fit(X[train_from:start], y[train_from:start])
+        end = min(start + test_window, len(y))
+        predictions[start:end] = model.predict(X[start:end])
+    return predictions
+
+
+def evaluate(predictions: np.ndarray, actual: np.ndarray, close: np.ndarray,
+             cost_bps: float = 0.0, allow_short: bool = False) -> Dict:
+    """Tahmin hatası, yön isabeti ve basit stratejinin getirisi (tamamı vektörel)
+
+    Strateji: model yükseliş bekliyorsa ertesi gün için al, aksi halde nakitte kal
+    (allow_short ile açığa sat). Pozisyon değişimlerinde cost_bps kadar maliyet düşülür.
+    """
+    mask = ~np.isnan(predictions)
+    pred, actual, close = predictions[mask], actual[mask], close[mask]
+    if len(pred) == 0:
+        return {'n': 0}
+
+    error = pred - actual
+    predicted_move = np.sign(pred - close)
+    actual_move = np.sign(actual - close)
+
+    position = np.where(predicted_move > 0, 1.0, -1.0 if allow_short else 0.0)
+    returns = actual / close - 1
+    trades = np.abs(np.diff(position, prepend=0.0))
+    strategy = position * returns - trades * cost_bps / 10000
+    equity = np.cumprod(1 + strategy)
+    drawdown = equity / np.maximum.accumulate(equity) - 1
+    volatility = strategy.std(ddof=1) if len(strategy) > 1 else 0.0
+
+    return {
+        'n': int(len(pred)),
+        'mae': float(np.mean(np.abs(error))),
+        'rmse': float(np.sqrt(np.mean(error ** 2))),
+        'mape': float(np.mean(np.abs(error / actual)) * 100),
+        'directional_accuracy': float(np.mean(predicted_move == actual_move)),
+        'strategy_return': float(equity[-1] - 1),
+        'buy_hold_return': float(np.prod(1 + returns) - 1),
+        'sharpe': float(strategy.mean() / volatility * np.sqrt(TRADING_DAYS)) if volatility > 0 else 0.0,
+        'max_drawdown': float(drawdown.min()),
+        'trades': int(trades.sum()),
+        'exposure': float(np.mean(position != 0)),
+    }
+
+
+def window_metrics(predictions: np.ndarray, actual: np.ndarray, close: np.ndarray, dates: np.ndarray,
+                   train_window: int, test_window: int) -> List[Dict]:
+    """Her test bloğu için MAE ve yön isabeti (np.add.reduceat ile tek geçişte)"""
+    starts = np.arange(train_window, len(actual), test_window)
+    if len(starts) == 0:
+        return []
+    abs_error = np.abs(predictions[train_window:] - actual[train_window:])
+    hits = (np.sign(predictions - close) == np.sign(actual - close))[train_window:].astype('f8')
+    offsets = starts - train_window
+    counts = np.diff(np.append(offsets, len(abs_error)))
+    mae = np.add.reduceat(abs_error, offsets) / counts
+    accuracy = np.add.reduceat(hits, offsets) / counts
+    return [{'start': dates[s], 'end': dates[s + c - 1], 'mae': round(float(m), 4), 'directional_accuracy': round(float(a), 4)}
+            for s, c, m, a in zip(starts, counts, mae, accuracy)]
+
+
+def _walk_forward_task(symbol: str, dataset: Dict[str, np.ndarray], config: Dict) -> Dict:
+    """Süreç havuzunda çalışan iş: bir sembolün walk-forward testi"""
+    started = time.perf_counter()
+    predictions = walk_forward(dataset['X'], dataset['y'], config['train_window'], config['test_window'],
+                               config['expanding'], {'n_jobs': 1})
+    return {
+        'symbol': symbol,
+        'walk_forward': evaluate(predictions, dataset['y'], dataset['close'], config['cost_bps'], config['allow_short']),
+        'windows': window_metrics(predictions, dataset['y'], dataset['close'], dataset['dates'],
+                                  config['train_window'], config['test_window']),
+        'elapsed_s': round(time.perf_counter() - started, 2),
+    }
+
+
+def run_backtest(symbols: List[str], days: int = 3 * 365, train_window: int = 250, test_window: int = 20,
+                 expanding: bool = False, cost_bps: float = 0.0, allow_short: bool = False,
+                 workers: Optional[int] = None, output_dir: Optional[str] = None) -> Dict:
+    """Sembolleri süreç havuzunda walk-forward test et, kayıtlı modeli de aynı geçmişte ölç ve rapor yaz
+
+    Geçmiş, piyasa verisi servisinin (yerel bar deposu) tek toplu isteğiyle alınır.
+    Kayıtlı (pickle) modelin sonuçları eğitim dönemini de kapsadığından iyimser olabilir;
+    walk-forward sonuçları örneklem dışıdır.
+    """
+    # Kayıtlı model yalnızca ana süreçte yüklenir; havuz süreçleri yalnızca dizilerle çalışır
+    from price_predictor import MODEL_FEATURES, PRICE_MODEL, model_registry
+
+    config = {'days': days, 'train_window': train_window, 'test_window': test_window, 'expanding': expanding,
+              'cost_bps': cost_bps, 'allow_short': allow_short}
+    started = time.perf_counter()
+
+    frames, failed = market_data_service.get_histories(symbols, days=days)
+    datasets = {}
+    for symbol, df in frames.items():
+        dataset = build_dataset(df, MODEL_FEATURES, symbol)
+        if len(dataset['y']) <= train_window:
+            print(f"Yetersiz geçmiş ({symbol}): {len(dataset['y'])} satır, eğitim penceresi {train_window}")
+            failed.append(symbol)
+            continue
+        datasets[symbol] = dataset
+
+    results = {}
+    model = model_registry.get(PRICE_MODEL)
+    entry = model_registry.entry(PRICE_MODEL)
+    for symbol, dataset in datasets.items():
+        results[symbol] = {'symbol': symbol, 'rows': len(dataset['y']),
+                           'period': [dataset['dates'][0], dataset['dates'][-1]]}
+        if model is not None:
+            # Kayıtlı modelin tüm geçmiş boyunca performansı (tek predict çağrısı)
+            pickled = model.predict(dataset['X']).astype('f8')
+            results[symbol]['pickled_model'] = evaluate(pickled, dataset['y'], dataset['close'], cost_bps, allow_short)
+
+    # spawn: OpenMP kullanmış bir süreçten fork etmek xgboost'u kilitleyebilir
+    workers = workers or min(len(datasets), os.cpu_count() or 1) or 1
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context('spawn')) as pool:
+        futures = {symbol: pool.submit(_walk_forward_task, symbol, dataset, config)
+                   for symbol, dataset in datasets.items()}
+        for symbol, future in futures.items():
+            try:
+                results[symbol].update(future.result())
+            except Exception as e:
+                print(f"Walk-forward hatası ({symbol}): {e}")
+                results[symbol]['error'] = str(e)
+
+    tested = [r['walk_forward'] for r in results.values() if r.get('walk_forward', {}).get('n')]
+    summary = {key: float(np.mean([m[key] for m in tested]))
+               for key in ('mae', 'mape', 'directional_accuracy', 'strategy_return', 'buy_hold_return', 'sharpe')} if tested else {}
+
+    report = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'model_version': entry.version if entry is not None else None,
+        'features': MODEL_FEATURES,
+        'config': {**config, 'train_params': TRAIN_PARAMS, 'workers': workers},
+        'summary': summary,
+        'symbols': results,
+        'failed_symbols': failed,
+        'elapsed_s': round(time.perf_counter() - started, 2),
+    }
+
+    output_dir = Path(output_dir or BACKTEST_DIR)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    path = output_dir / f"backtest_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    path.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding='utf-8')
+    report['path'] = str(path)
+
+    print(f"{'Sembol':<10} {'MAE':>8} {'Yön %':>7} {'Strateji':>9} {'Al-tut':>8}")
+    for symbol, result in results.items():
+        wf = result.get('walk_forward') or {}
+        if wf.get('n'):
+            print(f"{symbol:<10} {wf['mae']:>8.3f} {wf['directional_accuracy'] * 100:>6.1f}% "
+                  f"{wf['strategy_return'] * 100:>8.1f}% {wf['buy_hold_return'] * 100:>7.1f}%")
+    print(f"Rapor yazıldı: {path} ({report['elapsed_s']} sn)")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fiyat modeli walk-forward geriye dönük testi")
+    parser.add_argument('symbols', nargs='*', default=['KCHOL.IS'])
+    parser.add_argument('--days', type=int, default=3 * 365, help="geçmiş uzunluğu (takvim günü)")
+    parser.add_argument('--train', type=int, default=250, help="eğitim penceresi (bar)")
+    parser.add_argument('--test', type=int, default=20, help="yeniden eğitim aralığı / test bloğu (bar)")
+    parser.add_argument('--expanding', action='store_true', help="eğitim penceresini kaydırmak yerine genişlet")
+    parser.add_argument('--cost-bps', type=float, default=0.0, help="pozisyon değişimi başına maliyet (baz puan)")
+    parser.add_argument('--short', action='store_true', help="düşüş beklentisinde açığa sat")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    run_backtest(args.symbols, args.days, args.train, args.test, args.expanding, args.cost_bps,
+                 args.short, args.workers)
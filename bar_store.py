@@ -0,0 +1,137 @@
+# bar_store.py
+# Sembol başına disk üzerinde tutulan günlük OHLCV deposu (memory-mapped NumPy)
+
+import json
+import os
+import threading
+import time
+from datetime import date
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+BAR_COLUMNS = ['close', 'high', 'low', 'open', 'volume']
+BAR_DTYPE = np.dtype([('date', '<i8')] + [(col, '<f8') for col in BAR_COLUMNS])
+
+# Aynı günün yeniden indirilen fiyatı bu göreli farktan fazla değiştiyse temettü/bölünme düzeltmesi uygulanmıştır
+ADJUSTMENT_TOLERANCE = float(os.getenv('BAR_STORE_ADJUST_TOLERANCE', 1e-3))
+
+
+def frame_to_records(df: pd.DataFrame) -> np.ndarray:
+    """OHLCV DataFrame'ini yapılandırılmış NumPy dizisine çevir (tarih = epoch gün sayısı)"""
+    df = df.dropna(subset=['close'])
+    records = np.empty(len(df), dtype=BAR_DTYPE)
+    records['date'] = df.index.values.astype('datetime64[D]').astype('int64')
+    for col in BAR_COLUMNS:
+        records[col] = df[col].to_numpy(dtype='f8')
+    return records
+
+
+def records_to_frame(records: np.ndarray) -> pd.DataFrame:
+    """Yapılandırılmış diziyi tarih indeksli OHLCV DataFrame'ine çevir"""
+    index = pd.DatetimeIndex(records['date'].astype('datetime64[D]').astype('datetime64[ns]'))
+    return pd.DataFrame({col: np.array(records[col]) for col in BAR_COLUMNS}, index=index)
+
+
+def _day_number(value: date) -> int:
+    return int(np.datetime64(value, 'D').astype('int64'))
+
+
+class BarStore:
+    """Her sembolün tüm günlük geçmişini ayrı bir .npy dosyasında tutar
+
+    Dosyalar salt okunur memory-map ile açılır; yazmalar geçici dosya + os.replace
+    ile atomik yapılır, böylece okuyucular hiçbir zaman yarım dosya görmez.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or os.getenv('BAR_STORE_PATH', 'data/bars'))
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.meta_file = self.root / '_meta.json'
+        self._lock = threading.Lock()
+        self._meta = self._load_meta()
+
+    def _path(self, symbol: str) -> Path:
+        return self.root / f"{symbol.upper()}.npy"
+
+    def _load_meta(self) -> Dict:
+        if self.meta_file.exists():
+            try:
+                with open(self.meta_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"Bar deposu meta verisi okunamadı: {e}")
+        return {}
+
+    def _save_meta(self):
+        tmp_file = self.meta_file.with_suffix('.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self._meta, f, indent=2)
+        os.replace(tmp_file, self.meta_file)
+
+    def load(self, symbol: str) -> Optional[np.ndarray]:
+        """Sembolün tüm barlarını memory-map olarak aç"""
+        path = self._path(symbol)
+        if not path.exists():
+            return None
+        try:
+            return np.load(path, mmap_mode='r')
+        except Exception as e:
+            print(f"Bar dosyası okunamadı ({symbol}): {e}")
+            return None
+
+    def last_date(self, symbol: str) -> Optional[date]:
+        records = self.load(symbol)
+        if records is None or len(records) == 0:
+            return None
+        return pd.Timestamp(np.datetime64(int(records['date'][-1]), 'D')).date()
+
+    def merge(self, symbol: str, df: pd.DataFrame):
+        """Yeni barları ekle; çakışan günler (ör. gün içi kısmi bar) yenileriyle değiştirilir"""
+        new_records = frame_to_records(df)
+        with self._lock:
+            existing = self.load(symbol)
+            if existing is not None and len(existing) and len(new_records):
+                keep = np.asarray(existing[existing['date'] < new_records['date'][0]])
+                newer = np.asarray(existing[existing['date'] > new_records['date'][-1]])
+                records = np.concatenate([keep, new_records, newer])
+            elif existing is not None and len(existing):
+                records = np.asarray(existing)
+            else:
+                records = new_records
+
+            path = self._path(symbol)
+            tmp_path = path.with_suffix('.tmp.npy')
+            np.save(tmp_path, records)
+            os.replace(tmp_path, path)
+
+    def replace(self, symbol: str, df: pd.DataFrame):
+        """Sembolün tüm geçmişini verilen barlarla değiştir (ör. temettü/bölünme sonrası yeni düzeltme tabanı)"""
+        records = frame_to_records(df)
+        with self._lock:
+            path = self._path(symbol)
+            tmp_path = path.with_suffix('.tmp.npy')
+            np.save(tmp_path, records)
+            os.replace(tmp_path, path)
+
+    def mark_synced(self, symbol: str, synced_at: Optional[float] = None):
+        with self._lock:
+            self._meta.setdefault(symbol.upper(), {})['synced_at'] = synced_at or time.time()
+            self._save_meta()
+
+    def synced_at(self, symbol: str) -> Optional[float]:
+        return self._meta.get(symbol.upper(), {}).get('synced_at')
+
+    def get_range(self, symbol: str, start: date, end: date) -> Optional[pd.DataFrame]:
+        """[start, end] aralığındaki barları ağ erişimi olmadan döndür"""
+        records = self.load(symbol)
+        if records is None or len(records) == 0:
+            return None
+        dates = records['date']
+        lo = np.searchsorted(dates, _day_number(start), side='left')
+        hi = np.searchsorted(dates, _day_number(end), side='right')
+        if hi <= lo:
+            return None
+        return records_to_frame(records[lo:hi])
@@ -0,0 +1,158 @@
+# bist_calendar.py
+# Borsa İstanbul pay piyasası seans takvimi: hafta sonları, resmi/dini tatiller, yarım günler ve seans saatleri
+
+import os
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterable, Optional, Tuple
+
+try:
+    from zoneinfo import ZoneInfo
+    ISTANBUL_TZ = ZoneInfo('Europe/Istanbul')
+except Exception:
+    # 2016'dan beri Türkiye sabit UTC+3 kullanıyor
+    ISTANBUL_TZ = timezone(timedelta(hours=3))
+
+SESSION_OPEN = time(10, 0)
+SESSION_CLOSE = time(18, 0)
+HALF_DAY_CLOSE = time(12, 30)
+# Kapanış seansı ve veri sağlayıcı gecikmesi: günlük bar bu süre sonunda kesinleşmiş sayılır
+BAR_FINAL_DELAY = timedelta(minutes=int(os.getenv('BIST_BAR_FINAL_DELAY_MINUTES', 20)))
+
+# Her yıl aynı tarihe denk gelen resmi tatiller (ay, gün)
+FIXED_HOLIDAYS = [
+    (1, 1),    # Yılbaşı
+    (4, 23),   # Ulusal Egemenlik ve Çocuk Bayramı
+    (5, 1),    # Emek ve Dayanışma Günü
+    (5, 19),   # Atatürk'ü Anma, Gençlik ve Spor Bayramı
+    (7, 15),   # Demokrasi ve Milli Birlik Günü
+    (8, 30),   # Zafer Bayramı
+    (10, 29),  # Cumhuriyet Bayramı
+]
+FIXED_HALF_DAYS = [
+    (10, 28),  # Cumhuriyet Bayramı arifesi
+]
+
+# Ramazan ve Kurban Bayramı: (arife, bayram günleri) - her yıl Diyanet takvimine göre yeni yıl eklenmelidir;
+# tabloda olmayan yıllar sorgulandığında bir kez uyarı yazılır
+RELIGIOUS_HOLIDAYS = {
+    2024: [('2024-04-09', ['2024-04-10', '2024-04-11', '2024-04-12']),
+           ('2024-06-15', ['2024-06-16', '2024-06-17', '2024-06-18', '2024-06-19'])],
+    2025: [('2025-03-29', ['2025-03-30', '2025-03-31', '2025-04-01']),
+           ('2025-06-05', ['2025-06-06', '2025-06-07', '2025-06-08', '2025-06-09'])],
+    2026: [('2026-03-19', ['2026-03-20', '2026-03-21', '2026-03-22']),
+           ('2026-05-26', ['2026-05-27', '2026-05-28', '2026-05-29', '2026-05-30'])],
+    2027: [('2027-03-08', ['2027-03-09', '2027-03-10', '2027-03-11']),
+           ('2027-05-15', ['2027-05-16', '2027-05-17', '2027-05-18', '2027-05-19'])],
+}
+
+
+def _parse_dates(values: Iterable[str]):
+    return {date.fromisoformat(value.strip()) for value in values if value and value.strip()}
+
+
+class BistCalendar:
+    """BIST işlem günleri ve seans saatleri
+
+    Tablolarda olmayan ek tatiller (ör. idari izin ile uzatılan bayramlar) ve yarım
+    günler BIST_EXTRA_HOLIDAYS / BIST_EXTRA_HALF_DAYS ile virgülle ayrılmış ISO tarih
+    listesi olarak eklenebilir.
+    """
+
+    def __init__(self, extra_holidays: Optional[Iterable[str]] = None,
+                 extra_half_days: Optional[Iterable[str]] = None):
+        self.holidays = set()
+        self.half_days = set()
+        for arife, days in (item for items in RELIGIOUS_HOLIDAYS.values() for item in items):
+            self.half_days.add(date.fromisoformat(arife))
+            self.holidays.update(date.fromisoformat(day) for day in days)
+
+        if extra_holidays is None:
+            extra_holidays = os.getenv('BIST_EXTRA_HOLIDAYS', '').split(',')
+        if extra_half_days is None:
+            extra_half_days = os.getenv('BIST_EXTRA_HALF_DAYS', '').split(',')
+        self.holidays |= _parse_dates(extra_holidays)
+        self.half_days |= _parse_dates(extra_half_days)
+        self._warned_years = set()
+
+    def _check_year(self, year: int):
+        """Dini bayramları tabloda olmayan yıl için bir kez uyar (bayram günleri işlem günü sayılır)"""
+        if year in RELIGIOUS_HOLIDAYS or year in self._warned_years:
+            return
+        self._warned_years.add(year)
+        print(f"UYARI: {year} yılının Ramazan/Kurban Bayramı tarihleri bist_calendar.RELIGIOUS_HOLIDAYS "
+              f"tablosunda yok; bu yılın bayram günleri işlem günü sayılacak (tabloyu ya da BIST_EXTRA_HOLIDAYS'i güncelleyin)")
+
+    def now(self) -> datetime:
+        return datetime.now(ISTANBUL_TZ)
+
+    def is_holiday(self, day: date) -> bool:
+        self._check_year(day.year)
+        return day in self.holidays or (day.month, day.day) in FIXED_HOLIDAYS
+
+    def is_half_day(self, day: date) -> bool:
+        self._check_year(day.year)
+        return day in self.half_days or (day.month, day.day) in FIXED_HALF_DAYS
+
+    def is_trading_day(self, day: date) -> bool:
+        return day.weekday() < 5 and not self.is_holiday(day)
+
+    def session_hours(self, day: date) -> Optional[Tuple[datetime, datetime]]:
+        """İşlem günü ise (açılış, kapanış) saatlerini İstanbul saatiyle döndür"""
+        if not self.is_trading_day(day):
+            return None
+        close = HALF_DAY_CLOSE if self.is_half_day(day) else SESSION_CLOSE
+        return (datetime.combine(day, SESSION_OPEN, ISTANBUL_TZ),
+                datetime.combine(day, close, ISTANBUL_TZ))
+
+    def is_open(self, now: Optional[datetime] = None) -> bool:
+        """Seans (barın kesinleşme gecikmesi dahil) şu an sürüyor mu"""
+        now = now or self.now()
+        hours = self.session_hours(now.astimezone(ISTANBUL_TZ).date())
+        return hours is not None and hours[0] <= now < hours[1] + BAR_FINAL_DELAY
+
+    def next_trading_day(self, day: date) -> date:
+        day += timedelta(days=1)
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return day
+
+    def trading_day_after(self, day: date, n: int) -> date:
+        """day'den sonraki n'inci işlem günü (n=1 -> next_trading_day)"""
+        for _ in range(n):
+            day = self.next_trading_day(day)
+        return day
+
+    def previous_trading_day(self, day: date) -> date:
+        day -= timedelta(days=1)
+        while not self.is_trading_day(day):
+            day -= timedelta(days=1)
+        return day
+
+    def bar_final_at(self, day: date) -> Optional[datetime]:
+        """O günün günlük barının kesinleştiği an"""
+        hours = self.session_hours(day)
+        return hours[1] + BAR_FINAL_DELAY if hours else None
+
+    def last_completed_session(self, now: Optional[datetime] = None) -> date:
+        """Barı kesinleşmiş en son işlem günü"""
+        now = now or self.now()
+        today = now.astimezone(ISTANBUL_TZ).date()
+        final_at = self.bar_final_at(today)
+        if final_at is not None and now >= final_at:
+            return today
+        return self.previous_trading_day(today)
+
+    def is_series_current(self, synced_at: Optional[float], now: Optional[datetime] = None) -> bool:
+        """Son senkron, en son seansın barı kesinleştikten sonra yapıldıysa ve şu an seans
+        açık değilse yeni bar oluşamaz: seri kanıtlanabilir şekilde günceldir."""
+        if not synced_at:
+            return False
+        now = now or self.now()
+        if self.is_open(now):
+            return False
+        final_at = self.bar_final_at(self.last_completed_session(now))
+        return synced_at >= final_at.timestamp()
+
+
+# Süreç genelinde paylaşılan tek örnek
+bist_calendar = BistCalendar()
@@ -0,0 +1,137 @@
+# chart_cache.py
+# İçerik adresli grafik önbelleği - aynı veri dilimi ve çizim ayarları için matplotlib yeniden çalıştırılmaz
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+class ChartCache:
+    """Grafik türü + çizilen veri dilimi + çizim ayarlarının özetiyle anahtarlanan önbellek
+
+    Anahtar sha256(tür, ayarlar, tarih indeksi, çizilen sütunların değerleri) olduğu
+    için veri ancak yeni bar geldiğinde değişir; aynı bar için tekrar eden istekler
+    PNG'yi yeniden üretmez. Bellekte LRU ile sınırlı sayıda kayıt tutulur, kayıtlar
+    ayrıca diske (CHART_CACHE_DIR) yazılır; böylece uygulama yeniden başladığında da
+    kullanılır. Disk katmanı CHART_CACHE_DISK_ENTRIES kaydı aşınca en eski dosyalar silinir.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, cache_dir: Optional[str] = None,
+                 max_disk_entries: Optional[int] = None):
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('CHART_CACHE_SIZE', 64))
+        self.max_disk_entries = (max_disk_entries if max_disk_entries is not None
+                                 else int(os.getenv('CHART_CACHE_DISK_ENTRIES', 1000)))
+        self.cache_dir = Path(cache_dir or os.getenv('CHART_CACHE_DIR', 'data/charts'))
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'renders': 0, 'render_errors': 0}
+
+    @staticmethod
+    def key(kind: str, df: pd.DataFrame, columns: Sequence[str], settings: Dict) -> str:
+        """Grafikte kullanılan sütunlar ve tarihler üzerinden içerik özeti"""
+        digest = hashlib.sha256()
+        digest.update(json.dumps({'kind': kind, 'settings': settings, 'columns': list(columns)},
+                                 sort_keys=True).encode('utf-8'))
+        digest.update(np.ascontiguousarray(df.index.asi8).tobytes())
+        digest.update(np.ascontiguousarray(df[list(columns)].to_numpy(dtype='f8')).tobytes())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[List[Dict]]:
+        with self._lock:
+            charts = self._cache.get(key)
+            if charts is not None:
+                self._cache.move_to_end(key)
+                self._stats['hits'] += 1
+                return [dict(chart) for chart in charts]
+
+        path = self._path(key)
+        try:
+            charts = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            with self._lock:
+                self._stats['misses'] += 1
+            return None
+
+        self._remember(key, charts)
+        with self._lock:
+            self._stats['disk_hits'] += 1
+        return [dict(chart) for chart in charts]
+
+    def _remember(self, key: str, charts: List[Dict]):
+        with self._lock:
+            self._cache[key] = charts
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def put(self, key: str, charts: List[Dict]):
+        self._remember(key, [dict(chart) for chart in charts])
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            path = self._path(key)
+            tmp_path = path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(charts, ensure_ascii=False), encoding='utf-8')
+            os.replace(tmp_path, path)
+            self._prune_disk()
+        except OSError as e:
+            print(f"Grafik önbelleği diske yazılamadı: {e}")
+
+    def _prune_disk(self):
+        files = list(self.cache_dir.glob('*.json'))
+        if len(files) <= self.max_disk_entries:
+            return
+        files.sort(key=lambda f: f.stat().st_mtime)
+        for old in files[:len(files) - self.max_disk_entries]:
+            old.unlink(missing_ok=True)
+
+    def get_or_render(self, kind: str, df: pd.DataFrame, columns: Sequence[str], settings: Dict,
+                      render: Callable[[pd.DataFrame], List[Dict]]) -> List[Dict]:
+        """Önbellekteki grafikleri döndür, yoksa render(df) ile çizip sakla
+
+        Hata mesajı içeren (img olmayan) sonuçlar önbelleğe alınmaz; bir sonraki
+        istek yeniden dener.
+        """
+        try:
+            key = self.key(kind, df, columns, settings)
+        except (KeyError, ValueError, TypeError):
+            # Eksik sütun: anahtar üretilemez, grafik önbelleksiz çizilir (ve kendi hatasını gösterir)
+            return render(df)
+
+        charts = self.get(key)
+        if charts is not None:
+            return charts
+
+        charts = render(df)
+        with self._lock:
+            self._stats['renders'] += 1
+        if charts and all(str(chart.get('data', '')).startswith('<img') for chart in charts):
+            self.put(key, charts)
+        else:
+            with self._lock:
+                self._stats['render_errors'] += 1
+        return charts
+
+    def invalidate(self):
+        with self._lock:
+            self._cache.clear()
+        for path in self.cache_dir.glob('*.json'):
+            path.unlink(missing_ok=True)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self._stats, 'entries': len(self._cache), 'max_entries': self.max_entries,
+                    'cache_dir': str(self.cache_dir)}
+
+
+# Süreç genelinde paylaşılan tek örnek
+chart_cache = ChartCache()
@@ -0,0 +1,178 @@
+# chart_data.py
+# İstemci tarafı grafik modu - PNG yerine seyreltilmiş sayısal seriler (float32) ve grafik tanımı gönderilir,
+# static/js/script.js bunları tarayıcıda Plotly ile çizer
+
+import base64
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# Panel türü -> tarayıcıda çizilecek grafik tanımı (chart_renderer.PANELS'deki matplotlib çizimlerinin karşılığı).
+# rows: ortak x eksenli alt grafikler (height oranı), traces: sütun + görünüm, levels: yatay referans çizgileri
+PANEL_SPECS = {
+    'price_sma': {
+        'title': 'KCHOL Teknik Analiz - Fiyat ve Hareketli Ortalamalar',
+        'rows': [
+            {'height': 3, 'yaxis': 'Fiyat (TL)', 'traces': [
+                {'column': 'close', 'name': 'Fiyat', 'color': 'white', 'width': 1},
+                {'column': 'SMA20', 'name': 'SMA 20', 'color': 'orange', 'width': 1},
+                {'column': 'SMA50', 'name': 'SMA 50', 'color': 'blue', 'width': 1},
+                {'column': 'SMA200', 'name': 'SMA 200', 'color': 'red', 'width': 1},
+            ]},
+            {'height': 1, 'yaxis': 'Hacim', 'traces': [
+                {'column': 'volume', 'name': 'Hacim', 'type': 'bar', 'color': 'blue', 'opacity': 0.3},
+            ]},
+        ],
+    },
+    'rsi': {
+        'title': 'RSI (Relative Strength Index)',
+        'rows': [
+            {'height': 1, 'yaxis': 'RSI', 'traces': [
+                {'column': 'RSI', 'name': 'RSI', 'color': 'purple', 'width': 2},
+            ], 'levels': [
+                {'y': 70, 'name': 'Aşırı Alım (70)', 'color': 'red', 'dash': 'dash'},
+                {'y': 30, 'name': 'Aşırı Satım (30)', 'color': 'green', 'dash': 'dash'},
+                {'y': 50, 'name': 'Nötr (50)', 'color': 'gray', 'dash': 'dot'},
+            ]},
+        ],
+    },
+    'macd': {
+        'title': 'MACD (Moving Average Convergence Divergence)',
+        'rows': [
+            {'height': 2, 'yaxis': 'MACD', 'traces': [
+                {'column': 'MACD', 'name': 'MACD', 'color': 'blue', 'width': 2},
+                {'column': 'MACD_SIGNAL', 'name': 'Sinyal', 'color': 'red', 'width': 2},
+            ]},
+            {'height': 1, 'yaxis': 'Histogram', 'traces': [
+                {'column': 'MACD_HIST', 'name': 'Histogram', 'type': 'bar', 'color': 'green',
+                 'negative_color': 'red', 'opacity': 0.7},
+            ]},
+        ],
+    },
+    'bollinger': {
+        'title': 'Bollinger Bands',
+        'rows': [
+            {'height': 1, 'yaxis': 'Fiyat (TL)', 'traces': [
+                {'column': 'BB_UPPER', 'name': 'Üst Bant', 'color': 'red', 'width': 1, 'dash': 'dash'},
+                {'column': 'BB_LOWER', 'name': 'Alt Bant', 'color': 'green', 'width': 1, 'dash': 'dash',
+                 'fill': 'tonexty'},
+                {'column': 'BB_MIDDLE', 'name': 'Orta Bant', 'color': 'blue', 'width': 1},
+                {'column': 'close', 'name': 'Fiyat', 'color': 'white', 'width': 2},
+            ]},
+        ],
+    },
+    'sma': {
+        'title': 'Hareketli Ortalamalar',
+        'rows': [
+            {'height': 1, 'yaxis': 'Fiyat (TL)', 'traces': [
+                {'column': 'close', 'name': 'Fiyat', 'color': 'white', 'width': 2},
+                {'column': 'SMA20', 'name': 'SMA 20', 'color': 'orange', 'width': 1},
+                {'column': 'SMA50', 'name': 'SMA 50', 'color': 'blue', 'width': 1},
+                {'column': 'SMA200', 'name': 'SMA 200', 'color': 'red', 'width': 1},
+            ]},
+        ],
+    },
+    'volume': {
+        'title': 'İşlem Hacmi',
+        'rows': [
+            {'height': 1, 'yaxis': 'Hacim', 'traces': [
+                {'column': 'volume', 'name': 'Hacim', 'type': 'bar', 'color': 'blue', 'opacity': 0.7},
+            ]},
+        ],
+    },
+    'price': {
+        'title': 'KCHOL Fiyat Grafiği',
+        'rows': [
+            {'height': 1, 'yaxis': 'Fiyat (TL)', 'traces': [
+                {'column': 'close', 'name': 'Fiyat', 'color': 'white', 'width': 2},
+            ]},
+        ],
+    },
+}
+
+# Sunucuda türetilen sütunlar (indikatör tablosunda yoksa)
+DERIVED_COLUMNS = {
+    'MACD_HIST': lambda df: df['MACD'] - df['MACD_SIGNAL'],
+}
+
+
+def panel_columns(kind: str) -> List[str]:
+    columns = []
+    for row in PANEL_SPECS[kind]['rows']:
+        for trace in row['traces']:
+            if trace['column'] not in columns:
+                columns.append(trace['column'])
+    return columns
+
+
+def lttb_indices(values: np.ndarray, threshold: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets: grafiğin görünen şeklini koruyarak threshold noktaya seyrelt
+
+    Seçim tek bir seri (panelin ana serisi) üzerinden yapılır ve aynı satırlar panelin
+    tüm sütunlarına uygulanır; böylece seriler aynı x noktalarında hizalı kalır.
+    """
+    n = len(values)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    y = np.where(np.isnan(values), np.nanmean(values) if np.isfinite(values).any() else 0.0, values)
+    x = np.arange(n, dtype='f8')
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        # Bir sonraki kovanın ortalaması üçgenin üçüncü köşesi
+        avg_x = x[end:next_end].mean() if next_end > end else x[-1]
+        avg_y = y[end:next_end].mean() if next_end > end else y[-1]
+        area = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+def _b64(array: np.ndarray) -> str:
+    return base64.b64encode(np.ascontiguousarray(array).tobytes()).decode('ascii')
+
+
+def encode_panel(kind: str, df: pd.DataFrame, max_points: Optional[int] = None) -> Dict:
+    """Panelin serilerini küçük bir JSON yüküne çevir
+
+    Tarihler ilk gün (ISO) + gün farkları (int32, little-endian, base64) olarak,
+    değerler float32 (little-endian, base64; NaN korunur) olarak kodlanır.
+    """
+    max_points = max_points or int(os.getenv('CHART_DATA_POINTS', 400))
+    columns = panel_columns(kind)
+    values = {}
+    for column in columns:
+        series = df[column] if column in df.columns else DERIVED_COLUMNS[column](df)
+        values[column] = series.to_numpy(dtype='f8')
+
+    index = lttb_indices(values[columns[0]], max_points)
+    days = df.index.values.astype('datetime64[D]')[index]
+    deltas = np.diff(days.astype('int64')).astype('<i4')
+    return {
+        'format': 'series',
+        'spec': PANEL_SPECS[kind],
+        'series': {
+            'start': str(days[0]) if len(days) else None,
+            'deltas': _b64(deltas),
+            'points': int(len(index)),
+            'source_points': int(len(df)),
+            'columns': {column: _b64(values[column][index].astype('<f4')) for column in columns},
+        },
+    }
+
+
+def decode_panel(payload: Dict) -> pd.DataFrame:
+    """encode_panel'in tersi (sunucu tarafı kontroller ve PNG'ye dönüştürme için)"""
+    series = payload['series']
+    deltas = np.frombuffer(base64.b64decode(series['deltas']), dtype='<i4').astype('int64')
+    days = np.datetime64(series['start'], 'D') + np.concatenate([[0], np.cumsum(deltas)]).astype('timedelta64[D]')
+    return pd.DataFrame({column: np.frombuffer(base64.b64decode(data), dtype='<f4')
+                         for column, data in series['columns'].items()}, index=pd.DatetimeIndex(days))
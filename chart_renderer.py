@@ -0,0 +1,487 @@
+# chart_renderer.py
+# Grafik çizim servisi - matplotlib panelleri istek iş parçacığında değil, Agg arka uçlu işçi süreçlerinde çizilir
+
+import base64
+import io
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from matplotlib import dates as mdates
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PolyCollection
+from matplotlib.figure import Figure
+from PIL import Image
+
+from worker_context import worker_context
+
+# Birleşik figürden kesilen PNG'lerin zlib seviyesi (düşük = daha hızlı, biraz daha büyük dosya)
+PNG_COMPRESS_LEVEL = int(os.getenv('CHART_PNG_COMPRESS_LEVEL', 3))
+
+
+def series_from_frame(df: pd.DataFrame, columns: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Panele gönderilecek veri: tarih (ns) ve istenen sütunlar düz float dizileri olarak (küçük ve pickle'lanabilir)"""
+    series = {'dates': df.index.asi8.copy()}
+    for column in columns:
+        series[column] = df[column].to_numpy(dtype='f8')
+    return series
+
+
+def _style(fig: Figure, axes, date_axis, settings: Dict):
+    """Koyu tema: 'dashboard' (tüm çerçeve beyaz, gün/ay etiketleri) ya da 'detail' (sade çerçeve, tam tarih)"""
+    face = settings['facecolor']
+    detail = settings.get('style') == 'detail'
+    fig.patch.set_facecolor(face)
+    for ax in axes:
+        ax.set_facecolor(face)
+        ax.grid(True, alpha=0.3)
+        ax.tick_params(colors='white')
+        for side in ('bottom', 'left', 'top', 'right'):
+            ax.spines[side].set_color('white')
+        if detail:
+            ax.spines['top'].set_visible(False)
+            ax.spines['right'].set_visible(False)
+
+    if detail:
+        date_axis.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
+    else:
+        date_axis.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
+        date_axis.xaxis.set_major_locator(mdates.DayLocator(interval=7))
+    date_axis.tick_params(axis='x', labelrotation=45)
+
+
+def _title(ax, text: str, settings: Dict):
+    detail = settings.get('style') == 'detail'
+    ax.set_title(text, color='white', fontsize=14, fontweight='bold' if detail else 'normal')
+
+
+def _labels(ax, settings: Dict, ylabel: str, xlabel: Optional[str] = 'Tarih'):
+    font = {'fontsize': 12} if settings.get('style') == 'detail' else {}
+    ax.set_ylabel(ylabel, color='white', **font)
+    if xlabel:
+        ax.set_xlabel(xlabel, color='white', **font)
+
+
+def _legend(ax, settings: Dict):
+    ax.legend(loc='upper left' if settings.get('style') == 'detail' else 'best')
+
+
+def _bars(ax, x: np.ndarray, heights: np.ndarray, color, alpha: float, label: Optional[str] = None):
+    """ax.bar yerine tek PolyCollection: yüzlerce Rectangle yaması yerine tek sanatçı (aynı görünüm, çok daha hızlı)"""
+    left = mdates.date2num(x) - 0.4
+    heights = np.nan_to_num(heights)
+    verts = np.empty((len(left), 4, 2))
+    verts[:, 0, 0] = verts[:, 1, 0] = left
+    verts[:, 2, 0] = verts[:, 3, 0] = left + 0.8
+    verts[:, 0, 1] = verts[:, 3, 1] = 0
+    verts[:, 1, 1] = verts[:, 2, 1] = heights
+    bars = PolyCollection(verts, facecolors=color, edgecolors='none', alpha=alpha, label=label)
+    ax.add_collection(bars)
+    ax.update_datalim([(left.min(), min(heights.min(), 0)), (left.max() + 0.8, max(heights.max(), 0))]
+                      if len(left) else [])
+    ax.autoscale_view()
+    return bars
+
+
+def _draw_price_sma(axes, s: Dict, settings: Dict):
+    ax1, ax2 = axes
+    x = s['dates']
+    ax1.plot(x, s['close'], color='white', linewidth=1, alpha=0.7)
+    ax1.plot(x, s['SMA20'], color='orange', linewidth=1, label='SMA 20')
+    ax1.plot(x, s['SMA50'], color='blue', linewidth=1, label='SMA 50')
+    ax1.plot(x, s['SMA200'], color='red', linewidth=1, label='SMA 200')
+    _title(ax1, 'KCHOL Teknik Analiz - Fiyat ve Hareketli Ortalamalar', settings)
+    _labels(ax1, settings, 'Fiyat (TL)', None)
+    _legend(ax1, settings)
+
+    _bars(ax2, x, s['volume'], 'blue', 0.3)
+    _labels(ax2, settings, 'Hacim')
+
+
+def _draw_rsi(axes, s: Dict, settings: Dict):
+    ax, = axes
+    ax.plot(s['dates'], s['RSI'], color='purple', linewidth=2, label='RSI')
+    ax.axhline(y=70, color='red', linestyle='--', alpha=0.7, label='Aşırı Alım (70)')
+    ax.axhline(y=30, color='green', linestyle='--', alpha=0.7, label='Aşırı Satım (30)')
+    ax.axhline(y=50, color='gray', linestyle=':', alpha=0.5, label='Nötr (50)')
+    _title(ax, 'RSI (Relative Strength Index)', settings)
+    _labels(ax, settings, 'RSI')
+    _legend(ax, settings)
+
+
+def _draw_macd(axes, s: Dict, settings: Dict):
+    ax1, ax2 = axes
+    x = s['dates']
+    ax1.plot(x, s['MACD'], color='blue', linewidth=2, label='MACD')
+    ax1.plot(x, s['MACD_SIGNAL'], color='red', linewidth=2, label='Sinyal')
+    _title(ax1, 'MACD (Moving Average Convergence Divergence)', settings)
+    _labels(ax1, settings, 'MACD', None)
+    _legend(ax1, settings)
+
+    histogram = s['MACD'] - s['MACD_SIGNAL']
+    _bars(ax2, x, histogram, np.where(histogram >= 0, 'green', 'red'), 0.7, label='Histogram')
+    _labels(ax2, settings, 'Histogram')
+
+
+def _draw_bollinger(axes, s: Dict, settings: Dict):
+    ax, = axes
+    x = s['dates']
+    ax.plot(x, s['close'], color='white', linewidth=2, label='Fiyat')
+    ax.plot(x, s['BB_UPPER'], color='red', linewidth=1, linestyle='--', label='Üst Bant')
+    ax.plot(x, s['BB_LOWER'], color='green', linewidth=1, linestyle='--', label='Alt Bant')
+    ax.plot(x, s['BB_MIDDLE'], color='blue', linewidth=1, label='Orta Bant')
+    ax.fill_between(x, s['BB_LOWER'], s['BB_UPPER'], color='gray',
+                    alpha=0.3 if settings.get('style') == 'detail' else 0.1)
+    _title(ax, 'Bollinger Bands', settings)
+    _labels(ax, settings, 'Fiyat (TL)')
+    _legend(ax, settings)
+
+
+def _draw_sma(axes, s: Dict, settings: Dict):
+    ax, = axes
+    x = s['dates']
+    ax.plot(x, s['close'], color='white', linewidth=2, label='Fiyat')
+    ax.plot(x, s['SMA20'], color='orange', linewidth=1, label='SMA 20')
+    ax.plot(x, s['SMA50'], color='blue', linewidth=1, label='SMA 50')
+    ax.plot(x, s['SMA200'], color='red', linewidth=1, label='SMA 200')
+    _title(ax, 'Hareketli Ortalamalar', settings)
+    _labels(ax, settings, 'Fiyat (TL)')
+    _legend(ax, settings)
+
+
+def _draw_volume(axes, s: Dict, settings: Dict):
+    ax, = axes
+    _bars(ax, s['dates'], s['volume'], 'blue', 0.7, label='Hacim')
+    _title(ax, 'İşlem Hacmi', settings)
+    _labels(ax, settings, 'Hacim')
+    _legend(ax, settings)
+
+
+def _draw_price(axes, s: Dict, settings: Dict):
+    ax, = axes
+    ax.plot(s['dates'], s['close'], color='white', linewidth=2, label='Fiyat')
+    _title(ax, 'KCHOL Fiyat Grafiği', settings)
+    _labels(ax, settings, 'Fiyat (TL)')
+    _legend(ax, settings)
+
+
+# Panel türü -> (çizim fonksiyonu, figür boyutu, kullandığı sütunlar, alt grafik yükseklik oranları)
+PANELS = {
+    'price_sma': (_draw_price_sma, (12, 8), ['close', 'SMA20', 'SMA50', 'SMA200', 'volume'], [3, 1]),
+    'rsi': (_draw_rsi, (12, 6), ['RSI'], [1]),
+    'macd': (_draw_macd, (12, 8), ['MACD', 'MACD_SIGNAL'], [2, 1]),
+    'bollinger': (_draw_bollinger, (12, 6), ['close', 'BB_UPPER', 'BB_MIDDLE', 'BB_LOWER'], [1]),
+    'sma': (_draw_sma, (12, 6), ['close', 'SMA20', 'SMA50', 'SMA200'], [1]),
+    'volume': (_draw_volume, (12, 6), ['volume'], [1]),
+    'price': (_draw_price, (12, 6), ['close'], [1]),
+}
+
+
+def _panel_axes(container, kind: str):
+    ratios = PANELS[kind][3]
+    axes = container.subplots(len(ratios), 1, gridspec_kw={'height_ratios': ratios}, squeeze=False)[:, 0]
+    return list(axes)
+
+
+def _dates(series: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    return {**series, 'dates': np.asarray(series['dates']).astype('datetime64[ns]')}
+
+
+def render_panel(kind: str, series: Dict[str, np.ndarray], settings: Dict) -> str:
+    """Tek paneli PNG olarak çiz ve base64 döndür
+
+    pyplot kullanılmaz: her iş kendi Figure + Agg tuvalini kurar, böylece süreçler
+    ve iş parçacıkları arasında paylaşılan küresel çizim durumu yoktur.
+    """
+    draw, figsize, _, _ = PANELS[kind]
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    axes = _panel_axes(fig, kind)
+    draw(axes, _dates(series), settings)
+    _style(fig, axes, axes[-1], settings)
+    if settings.get('style') != 'detail':
+        fig.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=settings['dpi'], bbox_inches='tight', facecolor=settings['facecolor'])
+    return base64.b64encode(buffer.getvalue()).decode('utf-8')
+
+
+class CompositeFigure:
+    """Birden çok paneli ortak x eksenli (aynı tarih aralığı) tek figürde çizen, önceden stillendirilmiş şablon
+
+    Her panel kendi alt figüründe (subfigure) durur; eksenler, çerçeve, ızgara, renkler
+    ve tarih biçimleyicileri şablon kurulurken bir kez ayarlanır. Her çizimde yalnızca
+    veri sanatçıları (çizgi, alan, çubuk) silinip yeniden eklenir ve tuval tek seferde
+    çizilir; panel PNG'leri bu tek çizimden alt figür sınırlarına göre kesilir (ya da
+    figür bütün olarak dışa aktarılır). Kenar boşlukları sabittir, tight_layout /
+    bbox_inches='tight' ile ikinci bir çizim gerekmez.
+    """
+
+    # Alt figür kenar boşlukları (inç): sol, sağ, üst, alt
+    MARGINS = (0.9, 0.25, 0.55, 0.85)
+
+    def __init__(self, kinds: Sequence[str], settings: Dict):
+        self.kinds = list(kinds)
+        self.settings = settings
+        heights = [PANELS[kind][1][1] for kind in self.kinds]
+        width = max(PANELS[kind][1][0] for kind in self.kinds)
+        self.fig = Figure(figsize=(width, sum(heights)), dpi=settings['dpi'])
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.subfigs = list(self.fig.subfigures(len(self.kinds), 1, height_ratios=heights, squeeze=False)[:, 0])
+        self.axes = {}
+        left, right, top, bottom = self.MARGINS
+        for kind, subfig, height in zip(self.kinds, self.subfigs, heights):
+            subfig.subplots_adjust(left=left / width, right=1 - right / width, top=1 - top / height,
+                                   bottom=bottom / height, hspace=0.08)
+            axes = _panel_axes(subfig, kind)
+            # Grubun yalnızca alt ekseninde tarih etiketleri
+            for ax in axes[:-1]:
+                ax.tick_params(axis='x', labelbottom=False)
+            _style(subfig, axes, axes[-1], settings)
+            self.axes[kind] = axes
+
+    def _clear(self):
+        for axes in self.axes.values():
+            for ax in axes:
+                for artist in list(ax.lines) + list(ax.collections) + list(ax.patches):
+                    artist.remove()
+                if ax.get_legend():
+                    ax.get_legend().remove()
+                ax.relim()
+
+    def render(self, series: Dict[str, np.ndarray], sliced: bool = True) -> List[str]:
+        """Panelleri tek geçişte çiz; sliced ise panel başına, değilse tek PNG (base64)"""
+        self._clear()
+        series = _dates(series)
+        for kind in self.kinds:
+            PANELS[kind][0](self.axes[kind], series, self.settings)
+        # Ortak x ekseni: tüm eksenlere aynı tarih aralığı verilir. sharex kullanılmaz; paylaşılan
+        # eksenlerde matplotlib her etiket yerleşiminde tüm kardeş eksenlerin tarih etiketlerini ölçer
+        if len(series['dates']):
+            lo, hi = mdates.date2num(series['dates'][[0, -1]])
+            margin = max((hi - lo) * 0.05, 1)
+            for axes in self.axes.values():
+                for ax in axes:
+                    ax.set_xlim(lo - margin, hi + margin)
+        self.canvas.draw()
+
+        pixels = np.asarray(self.canvas.buffer_rgba())[:, :, :3]
+        if not sliced:
+            return [_encode_png(pixels)]
+        height = pixels.shape[0]
+        crops = []
+        for subfig in self.subfigs:
+            x0, y0, x1, y1 = np.round(subfig.bbox.extents).astype(int)
+            crops.append(pixels[height - y1:height - y0, x0:x1])
+        # PNG sıkıştırması GIL'i bırakır; kesitler iş parçacıklarında paralel kodlanır
+        return list(_encoders.map(_encode_png, crops))
+
+
+def _encode_png(pixels: np.ndarray) -> str:
+    buffer = io.BytesIO()
+    Image.fromarray(np.ascontiguousarray(pixels)).save(buffer, format='PNG', compress_level=PNG_COMPRESS_LEVEL)
+    return base64.b64encode(buffer.getvalue()).decode('utf-8')
+
+
+_encoders = ThreadPoolExecutor(max_workers=min(4, os.cpu_count() or 1), thread_name_prefix='png')
+
+# Süreç başına şablonlar (panel listesi + ayarlar -> CompositeFigure); iş parçacıkları arasında kilitli kullanılır
+_templates: Dict[str, CompositeFigure] = {}
+_templates_lock = threading.Lock()
+
+
+def render_composite(kinds: Sequence[str], series: Dict[str, np.ndarray], settings: Dict,
+                     sliced: bool = True) -> List[str]:
+    """Panelleri süreçteki hazır şablon figürde tek geçişte çiz (şablon ilk kullanımda kurulur)"""
+    key = json.dumps({'kinds': list(kinds), 'settings': settings}, sort_keys=True)
+    with _templates_lock:
+        template = _templates.get(key)
+        if template is None:
+            template = _templates[key] = CompositeFigure(kinds, settings)
+        return template.render(series, sliced)
+
+
+def _worker_main(conn):
+    """Çizim işçisi döngüsü: (fonksiyon, argümanlar) al, (sonuç, hata) gönder"""
+    os.environ['MPLBACKEND'] = 'Agg'
+    conn.send('ready')
+    while True:
+        try:
+            fn, args = conn.recv()
+        except (EOFError, OSError):
+            break
+        try:
+            result = (fn(*args), None)
+        except Exception as e:
+            result = (None, str(e))
+        conn.send(result)
+
+
+class _RenderWorker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+
+class ChartRenderService:
+    """Grafik işlerini Agg arka uçlu işçi süreçlerine dağıtır
+
+    Matplotlib çizimi CPU'ya bağlıdır ve GIL'i tutar; işler ayrı süreçlerde çizildiği
+    için bir grafik isteği diğer Flask iş parçacıklarını bekletmez. Her işçi aynı anda
+    tek iş çizer; bir isteğin panelleri boştaki işçilere aynı anda dağıtılıp paralel
+    çizilir ve her panel kendi sonucunu ya da hatasını döndürür. Süre sınırı
+    (CHART_RENDER_TIMEOUT) işin işçide başladığı andan sayılır; aşılırsa yalnızca o
+    işçi öldürülüp yerine yenisi başlatılır, diğer isteklerin işleri etkilenmez. Boş
+    işçi beklemek de aynı süreyle sınırlıdır (aşılırsa iş "meşgul" hatasıyla döner).
+    CHART_RENDER_WORKERS=0 ile çizim istek iş parçacığında yapılır.
+    render_composite, panelleri süreçteki hazır CompositeFigure şablonunda tek işte çizer.
+    """
+
+    def __init__(self, workers: Optional[int] = None, timeout: Optional[float] = None):
+        self.workers = workers if workers is not None else int(os.getenv('CHART_RENDER_WORKERS',
+                                                                         min(4, os.cpu_count() or 1)))
+        self.timeout = timeout if timeout is not None else float(os.getenv('CHART_RENDER_TIMEOUT', 20))
+        self._context = None
+        self._idle = queue.Queue()
+        self._dispatch: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._started = False
+        self._stats = {'jobs': 0, 'composite_jobs': 0, 'errors': 0, 'timeouts': 0, 'crashes': 0, 'busy': 0,
+                       'restarts': 0}
+
+    def start(self):
+        """İşçileri başlat (beklemez; hazır olan işçi boşta kuyruğuna girer)"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            self._context = worker_context()
+            # Panel başına bir bekleme iş parçacığı; çizim işçilerde yapılır
+            self._dispatch = ThreadPoolExecutor(max_workers=max(1, self.workers) * 4,
+                                                thread_name_prefix='chart-dispatch')
+        for _ in range(self.workers):
+            self._spawn()
+
+    def _spawn(self):
+        worker = _RenderWorker(self._context)
+        threading.Thread(target=self._wait_ready, args=(worker,), daemon=True).start()
+
+    def _wait_ready(self, worker: _RenderWorker):
+        try:
+            if worker.conn.poll(60) and worker.conn.recv() == 'ready':
+                self._idle.put(worker)
+                return
+        except (EOFError, OSError):
+            pass
+        print("Grafik çizim işçisi başlatılamadı")
+        worker.kill()
+
+    def _replace(self, worker: _RenderWorker):
+        worker.kill()
+        with self._lock:
+            self._stats['restarts'] += 1
+        self._spawn()
+
+    def warm_up(self, timeout: float = 60) -> bool:
+        """İşçileri önceden başlat ve hazır olmalarını bekle (matplotlib yükleme maliyeti ilk isteğe yansımasın)"""
+        if self.workers <= 0:
+            return True
+        self.start()
+        deadline = time.monotonic() + timeout
+        while self._idle.qsize() < self.workers and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return self._idle.qsize() >= self.workers
+
+    def render(self, jobs: Sequence[Tuple[str, Dict[str, np.ndarray], Dict]]) -> List[Tuple[Optional[str], Optional[str]]]:
+        """[(panel türü, seri, ayarlar), ...] işlerini paralel çiz: her iş için (base64, hata)"""
+        with self._lock:
+            self._stats['jobs'] += len(jobs)
+        return self._count(self._run([(render_panel, job) for job in jobs]))
+
+    def render_composite(self, kinds: Sequence[str], series: Dict[str, np.ndarray],
+                         settings: Dict) -> List[Tuple[Optional[str], Optional[str]]]:
+        """Panelleri tek işte, ortak x eksenli tek figürde çiz: panel başına (base64, hata)
+
+        Tüm paneller aynı çizimden kesildiği için hata (eksik sütun, süre aşımı) hepsine yansır.
+        """
+        with self._lock:
+            self._stats['jobs'] += 1
+            self._stats['composite_jobs'] += 1
+        (images, error), = self._run([(render_composite, (kinds, series, settings))])
+        if error:
+            return self._count([(None, error) for _ in kinds])
+        return [(image, None) for image in images]
+
+    def _run(self, calls: Sequence[Tuple[Callable, Tuple]]) -> List[Tuple[Optional[object], Optional[str]]]:
+        """(fonksiyon, argümanlar) çağrılarını işçilerde (ya da workers=0 ise burada) çalıştır: (sonuç, hata)"""
+        if self.workers <= 0:
+            results = []
+            for fn, args in calls:
+                try:
+                    results.append((fn(*args), None))
+                except Exception as e:
+                    results.append((None, str(e)))
+            return results
+
+        self.start()
+        futures = [self._dispatch.submit(self._call, fn, args) for fn, args in calls]
+        return [future.result() for future in futures]
+
+    def _call(self, fn: Callable, args: Tuple) -> Tuple[Optional[object], Optional[str]]:
+        """Tek işi boştaki işçide çalıştır; süre, iş işçiye verildiği andan sayılır"""
+        try:
+            worker = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self._stats['busy'] += 1
+            return None, f"Çizim işçileri meşgul ({self.timeout:g} sn içinde boş işçi bulunamadı)"
+
+        try:
+            worker.conn.send((fn, args))
+            if not worker.conn.poll(self.timeout):
+                with self._lock:
+                    self._stats['timeouts'] += 1
+                self._replace(worker)
+                return None, f"Çizim {self.timeout:g} sn içinde tamamlanamadı"
+            result = worker.conn.recv()
+        except (EOFError, OSError) as e:
+            with self._lock:
+                self._stats['crashes'] += 1
+            self._replace(worker)
+            return None, f"Çizim süreci çöktü: {e}"
+        except Exception as e:
+            # Gönderilemeyen (pickle'lanamayan) iş: işçinin kanal durumu belirsiz, yenisiyle değiştir
+            self._replace(worker)
+            return None, str(e)
+
+        self._idle.put(worker)
+        return result
+
+    def _count(self, results):
+        errors = sum(1 for _, error in results if error)
+        if errors:
+            with self._lock:
+                self._stats['errors'] += errors
+        return results
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self._stats, 'workers': self.workers, 'idle': self._idle.qsize(), 'timeout': self.timeout}
+
+
+# Süreç genelinde paylaşılan tek örnek
+chart_renderer = ChartRenderService()
@@ -0,0 +1,205 @@
+# code_cache.py
+# Gemini'nin ürettiği grafik/analiz kodu önbelleği - aynı istek ve aynı tablo yapısı için LLM'e tekrar gidilmez
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from types import CodeType
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+
+from code_sandbox import compile_code
+
+# İstek metninde anlamı değiştirmeyen dolgu sözcükleri
+FILLER_WORDS = {'lutfen', 'bana', 'bir', 'acaba', 'mi', 'mu', 'simdi', 'hemen', 'bi', 'please'}
+
+# Türkçe harfler ASCII karşılıklarına katlanır ("RSI", "rsı", "grafiği", "grafigi" aynı sözcük olur)
+_ASCII_FOLD = str.maketrans('İIıĞğŞşÇçÖöÜü', 'iiiggssccoouu')
+# Kodun kendisinden kaynaklanan sonuçlar; diğerleri (busy, timeout, crashed, memory_limit, unavailable) havuzun
+# anlık durumudur ve önbellekteki kodu silmez
+CODE_FAILURES = ('error', 'cpu_limit')
+
+_FENCE = re.compile(r"```(?:python|py)?\s*\n(.*?)```", re.DOTALL)
+
+
+def normalize_request(text: str) -> str:
+    """ASCII'ye katlanmış küçük harf, noktalama ve dolgu sözcükleri atılmış sözcükler (sıra korunur)
+
+    "RSI grafiği göster", "rsi grafigi goster!" ve "Lütfen bana RSI grafiği göster" aynı anahtara
+    düşer; sözcük sırası anlamı taşıdığı için ("30 günü 90 gün ile" / "90 günü 30 gün ile") sıralanmaz.
+    """
+    words = re.findall(r"\w+", text.translate(_ASCII_FOLD).lower())
+    return ' '.join(word for word in words if word not in FILLER_WORDS)
+
+
+def frame_schema(df: pd.DataFrame) -> str:
+    """Kodun dayandığı tablo yapısı: sütun adları, tipleri ve indeks tipi (değerler değil)"""
+    return json.dumps({'columns': [[str(column), str(dtype)] for column, dtype in df.dtypes.items()],
+                       'index': type(df.index).__name__})
+
+
+def strip_code_fences(text: str) -> str:
+    """Model yanıtındaki ```python ... ``` bloğunu çıkar (blok yoksa metnin kendisi)"""
+    match = _FENCE.search(text or '')
+    return (match.group(1) if match else text or '').strip()
+
+
+class CodeCache:
+    """Normalize edilmiş istek + tablo yapısı + kapsam ile anahtarlanan kod önbelleği
+
+    Üretilen kod yalnızca sanal alanda (code_sandbox) başarıyla çalıştıktan sonra
+    kaynak metni ve derlenmiş kod nesnesiyle saklanır. Önbellekteki kod kendi hatasıyla
+    (CODE_FAILURES) başarısız olursa kayıt silinir ve istek bir kez yeniden üretilir;
+    havuzun geçici durumlarında (busy, timeout, ...) sonuç kayda dokunmadan döner. Kaynaklar CODE_CACHE_PATH'e
+    yazılır ve açılışta yeniden derlenir; bellekte en çok CODE_CACHE_SIZE kayıt (LRU) tutulur.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, path: Optional[str] = None):
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('CODE_CACHE_SIZE', 256))
+        self.path = Path(path or os.getenv('CODE_CACHE_PATH', 'data/code_cache.json'))
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._stats = {'hits': 0, 'misses': 0, 'generated': 0, 'stored': 0, 'evictions': 0,
+                       'generation_errors': 0, 'syntax_errors': 0, 'runs_ok': 0, 'runs_failed': 0,
+                       'runs_transient': 0}
+
+    @staticmethod
+    def key(scope: str, request: str, df: pd.DataFrame) -> str:
+        digest = hashlib.sha256()
+        digest.update(json.dumps([scope, normalize_request(request), frame_schema(df)]).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _load(self):
+        """Diskteki kaynakları bir kez yükleyip derle (kilit altında çağrılır)"""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            records = json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return
+        for key, record in records.items():
+            try:
+                self._cache[key] = {**record, 'code': compile_code(record['source'])}
+            except (SyntaxError, KeyError, TypeError):
+                continue
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def _save(self):
+        """Kaynakları atomik olarak diske yaz (kilit altında çağrılır)"""
+        records = {key: {k: v for k, v in entry.items() if k != 'code'} for key, entry in self._cache.items()}
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(records, ensure_ascii=False, indent=1), encoding='utf-8')
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Kod önbelleği diske yazılamadı: {e}")
+
+    def get(self, key: str) -> Optional[CodeType]:
+        with self._lock:
+            self._load()
+            entry = self._cache.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._cache.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry['code']
+
+    def put(self, key: str, scope: str, request: str, source: str, code: CodeType):
+        with self._lock:
+            self._load()
+            self._cache[key] = {'scope': scope, 'request': normalize_request(request), 'source': source,
+                                'code': code, 'successes': 1,
+                                'created_at': datetime.now().isoformat(timespec='seconds')}
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+            self._stats['stored'] += 1
+            self._save()
+
+    def record(self, key: str, ok: bool):
+        """Önbellekteki kodun çalıştırma sonucunu işle: başarıyı say, başarısızlıkta kaydı sil"""
+        with self._lock:
+            self._stats['runs_ok' if ok else 'runs_failed'] += 1
+            entry = self._cache.get(key)
+            if entry is None:
+                return
+            if ok:
+                entry['successes'] += 1
+                entry['last_used'] = datetime.now().isoformat(timespec='seconds')
+            else:
+                del self._cache[key]
+                self._stats['evictions'] += 1
+                self._save()
+
+    def get_or_generate(self, scope: str, request: str, df: pd.DataFrame, generate: Callable[[], Optional[str]],
+                        run: Callable[[CodeType], Dict]) -> Dict:
+        """Önbellekteki kodu çalıştır, yoksa (ya da başarısızsa) generate() ile üret, çalıştır ve sakla
+
+        run, code_sandbox.run gibi {'status', 'result', 'error', ...} döndürür; sonuca
+        kodun önbellekten gelip gelmediği ('cached') eklenir.
+        """
+        key = self.key(scope, request, df)
+        code = self.get(key)
+        if code is not None:
+            outcome = run(code)
+            if outcome['status'] == 'ok' or outcome['status'] in CODE_FAILURES:
+                self.record(key, outcome['status'] == 'ok')
+            else:
+                # Havuz dolu/işçi öldü: kod suçlu değil, kayıt kalır ve LLM'e gidilmez
+                with self._lock:
+                    self._stats['runs_transient'] += 1
+            if outcome['status'] not in CODE_FAILURES:
+                return {**outcome, 'cached': True}
+            print(f"Önbellekteki kod başarısız oldu, yeniden üretiliyor ({scope}): {outcome['error']}")
+
+        source = strip_code_fences(generate() or '')
+        with self._lock:
+            self._stats['generated'] += 1
+        if not source:
+            with self._lock:
+                self._stats['generation_errors'] += 1
+            return {'status': 'error', 'result': None, 'error': "Kod üretilemedi", 'elapsed_s': 0.0, 'cached': False}
+        try:
+            code = compile_code(source)
+        except SyntaxError as e:
+            with self._lock:
+                self._stats['syntax_errors'] += 1
+            return {'status': 'error', 'result': None, 'error': f"SyntaxError: {e}", 'elapsed_s': 0.0,
+                    'cached': False}
+
+        outcome = run(code)
+        with self._lock:
+            self._stats['runs_ok' if outcome['status'] == 'ok' else
+                        'runs_failed' if outcome['status'] in CODE_FAILURES else 'runs_transient'] += 1
+        if outcome['status'] == 'ok':
+            self.put(key, scope, request, source, code)
+        return {**outcome, 'cached': False}
+
+    def invalidate(self):
+        with self._lock:
+            self._cache.clear()
+            self._loaded = True
+            self._save()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            runs = self._stats['runs_ok'] + self._stats['runs_failed']
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {**self._stats, 'entries': len(self._cache), 'max_entries': self.max_entries,
+                    'hit_rate': round(self._stats['hits'] / lookups, 3) if lookups else None,
+                    'success_rate': round(self._stats['runs_ok'] / runs, 3) if runs else None}
+
+
+# Süreç genelinde paylaşılan tek örnek
+code_cache = CodeCache()
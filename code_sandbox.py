@@ -0,0 +1,390 @@
+# code_sandbox.py
+# Gemini'nin ürettiği analiz/grafik kodunu Flask sürecinde değil, önceden başlatılmış sınırlı süreçlerde çalıştırır
+
+import importlib
+import json
+import marshal
+import os
+import queue
+import signal
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing.shared_memory import SharedMemory
+from types import CodeType
+from typing import Dict, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from worker_context import worker_context
+
+try:
+    import resource
+except ImportError:  # Windows: CPU süresi sınırı uygulanamaz, duvar saati ve RSS sınırları geçerli
+    resource = None
+
+# Çalıştırılan koda hazır verilebilecek adlar: ad -> (modül, öznitelik)
+NAMESPACE = {
+    'pd': ('pandas', None),
+    'np': ('numpy', None),
+    'plt': ('matplotlib.pyplot', None),
+    'sns': ('seaborn', None),
+    'go': ('plotly.graph_objects', None),
+    'px': ('plotly.express', None),
+    'make_subplots': ('plotly.subplots', 'make_subplots'),
+    'io': ('io', None),
+    'base64': ('base64', None),
+    'json': ('json', None),
+    'datetime': ('datetime', 'datetime'),
+    'timedelta': ('datetime', 'timedelta'),
+    'TA': ('finta', 'TA'),
+}
+
+
+class CpuLimitExceeded(BaseException):
+    """SIGXCPU: üretilen koddaki geniş 'except Exception' blokları yakalamasın diye BaseException"""
+
+
+# --- DataFrame aktarımı (paylaşılan bellek) ---
+
+def share_frame(df: pd.DataFrame):
+    """Sayısal sütunları ve tarih indeksini tek paylaşılan bellek bölgesine kopyala
+
+    Süreçler arasında pickle ile tüm tablo gönderilmez; işçiye yalnızca bölge adı,
+    sütun tipleri ve konumları gider. Sayısal olmayan sütunlar ve tarih dışı indeksler
+    (nadir) meta veriyle birlikte pickle'lanır.
+    """
+    arrays, extra = [], {}
+    for column in df.columns:
+        values = df[column].to_numpy()
+        if values.dtype.kind in 'biufM':
+            arrays.append((column, np.ascontiguousarray(values)))
+        else:
+            extra[column] = df[column]
+    index = None
+    if isinstance(df.index, pd.DatetimeIndex) and df.index.tz is None:
+        # values (datetime64[birim]) birimi korur; asi8 birim bilgisini kaybeder
+        arrays.append(('__index__', np.ascontiguousarray(df.index.values)))
+    else:
+        index = df.index
+
+    size = max(sum(array.nbytes for _, array in arrays), 1)
+    shm = SharedMemory(create=True, size=size)
+    layout, offset = [], 0
+    for name, array in arrays:
+        shm.buf[offset:offset + array.nbytes] = array.tobytes()
+        layout.append((name, array.dtype.str, offset))
+        offset += array.nbytes
+    meta = {'shm': shm.name, 'rows': len(df), 'layout': layout, 'extra': extra, 'index': index,
+            'columns': list(df.columns)}
+    return shm, meta
+
+
+def _load_frame(meta: Dict) -> pd.DataFrame:
+    # spawn ile başlayan işçi ana sürecin resource_tracker'ını paylaşır: bağlanmak bölgeyi ikinci kez
+    # kaydetmez, silme (unlink) yalnızca ana süreçte yapılır
+    shm = SharedMemory(name=meta['shm'])
+    try:
+        data = {name: np.frombuffer(shm.buf, dtype=dtype, count=meta['rows'], offset=offset).copy()
+                for name, dtype, offset in meta['layout']}
+    finally:
+        shm.close()
+    index = pd.DatetimeIndex(data.pop('__index__')) if '__index__' in data else meta['index']
+    data.update({column: series.to_numpy() for column, series in meta['extra'].items()})
+    return pd.DataFrame({column: data[column] for column in meta['columns']}, index=index)
+
+
+def compile_code(source: str) -> CodeType:
+    """Kaynağı sanal alanda çalıştırılacak kod nesnesine derle (işçiye marshal ile gider)"""
+    return compile(source, '<sandbox>', 'exec')
+
+
+# --- İşçi süreç ---
+
+def _on_cpu_limit(signum, frame):
+    raise CpuLimitExceeded()
+
+
+def _resolve(name: str, cache: Dict):
+    if name not in cache:
+        module_name, attribute = NAMESPACE[name]
+        module = importlib.import_module(module_name)
+        cache[name] = getattr(module, attribute) if attribute else module
+    return cache[name]
+
+
+def _execute(code: bytes, frames: Dict, result_var: str, names: Sequence[str], cpu_seconds: float,
+             cache: Dict) -> bytes:
+    started = time.perf_counter()
+    limited = False
+    try:
+        env = {name: _resolve(name, cache) for name in names}
+        env.update({name: _load_frame(meta) for name, meta in frames.items()})
+        if resource is not None and cpu_seconds > 0:
+            # RLIMIT_CPU süreç ömrü boyunca birikir: yumuşak sınır "şu ana kadarki kullanım + bütçe" yapılır
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            soft = int(usage.ru_utime + usage.ru_stime + cpu_seconds) + 1
+            resource.setrlimit(resource.RLIMIT_CPU, (soft if hard == resource.RLIM_INFINITY else min(soft, hard), hard))
+            limited = True
+        exec(marshal.loads(code), env)
+        # Sonuç değişkenini atamayan kod hata değildir (sonuç None); boş sonucu yorumlamak çağırana kalır
+        status, result, error = 'ok', env.get(result_var), None
+    except CpuLimitExceeded:
+        status, result, error = 'cpu_limit', None, f"CPU süresi sınırı ({cpu_seconds:g} sn) aşıldı"
+    except MemoryError:
+        status, result, error = 'memory_limit', None, "Bellek yetersiz"
+    except Exception as e:
+        status, result, error = 'error', None, f"{type(e).__name__}: {e}"
+    finally:
+        if limited:
+            _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+            resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+        if 'matplotlib.pyplot' in sys.modules:
+            sys.modules['matplotlib.pyplot'].close('all')
+
+    outcome = {'status': status, 'result': result, 'error': error,
+               'elapsed_s': round(time.perf_counter() - started, 3)}
+    # Sonuç yalnızca JSON olarak döner: ana süreç üretilen kodun nesnelerini (pickle) hiç çözmez
+    try:
+        return json.dumps(outcome, default=_plain).encode('utf-8')
+    except Exception as e:
+        return json.dumps({**outcome, 'status': 'error', 'result': None,
+                           'error': f"Sonuç JSON'a çevrilemedi: {type(e).__name__}: {e}"}).encode('utf-8')
+
+
+def _plain(value):
+    """json.dumps için numpy sayıları ve dizileri düz Python değerlerine çevir; başka tipler hatadır"""
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} JSON'a çevrilemez")
+
+
+def _worker_main(conn):
+    """İşçi döngüsü: (derlenmiş kod (marshal), tablolar, sonuç değişkeni, adlar, CPU bütçesi) al, sonucu JSON gönder"""
+    os.environ['MPLBACKEND'] = 'Agg'
+    # Üretilen kodun yazdığı dosyalar proje dizinine değil geçici dizine düşsün
+    os.chdir(tempfile.mkdtemp(prefix='sandbox-'))
+    if resource is not None:
+        signal.signal(signal.SIGXCPU, _on_cpu_limit)
+    cache = {}
+    # Sık kullanılan modüller hazır: ilk çalıştırma içe aktarma maliyetini ödemez
+    for name in ('pd', 'np', 'plt', 'io', 'base64', 'json'):
+        _resolve(name, cache)
+    conn.send('ready')
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if message is None:
+            return
+        conn.send_bytes(_execute(*message, cache))
+
+
+# --- Havuz ---
+
+def _rss_mb(pid: int) -> Optional[float]:
+    """Sürecin yerleşik bellek kullanımı (MB); /proc olmayan sistemlerde None"""
+    try:
+        with open(f'/proc/{pid}/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class _SandboxWorker:
+    def __init__(self, context):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+
+class SandboxPool:
+    """Üretilen kodu önceden başlatılmış işçi süreçlerinde sınırlı çalıştıran havuz
+
+    Her çalıştırma üç sınırla korunur: CPU süresi (işçide RLIMIT_CPU; aşılınca SIGXCPU
+    ile kesilir), duvar saati (ana süreç bekler, aşılırsa işçiyi öldürür) ve RSS
+    (ana süreç beklerken /proc üzerinden ölçer, aşılırsa işçiyi öldürür). Öldürülen ya
+    da çöken işçinin yerine arka planda yenisi başlatılır; istek iş parçacığı hiçbir
+    durumda süresiz beklemez. DataFrame'ler işçiye paylaşılan bellekle aktarılır.
+    Sonuç her zaman {'status', 'result', 'error', 'elapsed_s'} sözlüğüdür; status:
+    ok, error, timeout, cpu_limit, memory_limit, crashed, busy ya da unavailable (aktarım
+    hazırlanamadı, ör. /dev/shm dolu). Sonuç değişkenini
+    atamayan kod da ok döner (result None). Sonuç JSON'a çevrilebilir olmalıdır (numpy
+    sayıları ve dizileri listeye çevrilir); diğer nesneler error olarak bildirilir.
+    """
+
+    def __init__(self, workers: Optional[int] = None, timeout: Optional[float] = None,
+                 cpu_seconds: Optional[float] = None, memory_mb: Optional[float] = None):
+        self.workers = workers if workers is not None else int(os.getenv('CODE_SANDBOX_WORKERS', 2))
+        self.timeout = timeout if timeout is not None else float(os.getenv('CODE_SANDBOX_TIMEOUT', 15))
+        self.cpu_seconds = cpu_seconds if cpu_seconds is not None else float(os.getenv('CODE_SANDBOX_CPU_SECONDS', 10))
+        self.memory_mb = memory_mb if memory_mb is not None else float(os.getenv('CODE_SANDBOX_MEMORY_MB', 1024))
+        self._context = worker_context()
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = False
+        self._stats = {'runs': 0, 'ok': 0, 'errors': 0, 'timeouts': 0, 'cpu_limits': 0, 'memory_limits': 0,
+                       'crashes': 0, 'busy': 0, 'unavailable': 0, 'restarts': 0}
+
+    def start(self):
+        """İşçileri başlat (beklemez; hazır olan işçi boşta kuyruğuna girer)"""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for _ in range(self.workers):
+            self._spawn()
+
+    def _spawn(self, attempt: int = 1):
+        try:
+            worker = _SandboxWorker(self._context)
+        except Exception as e:
+            print(f"Kod sanal alanı işçisi oluşturulamadı: {e}")
+            self._retry_spawn(attempt)
+            return
+        threading.Thread(target=self._wait_ready, args=(worker, attempt), daemon=True).start()
+
+    def _wait_ready(self, worker: _SandboxWorker, attempt: int = 1):
+        try:
+            if worker.conn.poll(60) and worker.conn.recv() == 'ready':
+                self._idle.put(worker)
+                return
+        except (EOFError, OSError):
+            pass
+        print(f"Kod sanal alanı işçisi başlatılamadı (deneme {attempt})")
+        worker.kill()
+        self._retry_spawn(attempt)
+
+    def _retry_spawn(self, attempt: int):
+        """Başlatılamayan işçinin yerine artan beklemeyle (en çok 60 sn) yenisini dene; havuz küçülmez"""
+        with self._lock:
+            if not self._started:
+                return
+            self._stats['restarts'] += 1
+        timer = threading.Timer(min(2 ** attempt, 60), self._spawn, args=(attempt + 1,))
+        timer.daemon = True
+        timer.start()
+
+    def _replace(self, worker: _SandboxWorker):
+        worker.kill()
+        with self._lock:
+            self._stats['restarts'] += 1
+        self._spawn()
+
+    def run(self, code: Union[str, CodeType], frames: Optional[Dict[str, pd.DataFrame]] = None,
+            result_var: str = 'result', names: Sequence[str] = ('pd', 'np'), timeout: Optional[float] = None) -> Dict:
+        """Kodu boştaki işçide çalıştır; frames adları kodda DataFrame olarak, names NAMESPACE'ten hazır gelir
+
+        code kaynak metin ya da compile_code ile derlenmiş kod nesnesi olabilir; derleme ana
+        süreçte yapılır, sözdizimi hatalı kod işçiye hiç gönderilmez.
+        """
+        self.start()
+        timeout = timeout if timeout is not None else self.timeout
+        started = time.monotonic()
+        with self._lock:
+            self._stats['runs'] += 1
+        if isinstance(code, str):
+            try:
+                code = compile_code(code)
+            except SyntaxError as e:
+                return self._finish('error', f"SyntaxError: {e}", started)
+
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            return self._finish('busy', f"Boşta kod işçisi yok ({timeout:g} sn beklendi)", started)
+
+        shared = []
+        try:
+            metas = {}
+            for name, df in (frames or {}).items():
+                shm, metas[name] = share_frame(df)
+                shared.append(shm)
+            message = (marshal.dumps(code), metas, result_var, list(names), self.cpu_seconds)
+        except Exception as e:
+            # Aktarım hazırlanamadı (ör. /dev/shm dolu): işçi hiç kullanılmadı, boşta kuyruğuna geri döner
+            self._idle.put(worker)
+            for shm in shared:
+                shm.close()
+                shm.unlink()
+            return self._finish('unavailable', f"Kod işçiye aktarılamadı: {type(e).__name__}: {e}", started)
+
+        try:
+            worker.conn.send(message)
+
+            deadline = started + timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._replace(worker)
+                    return self._finish('timeout', f"Kod {timeout:g} sn içinde tamamlanamadı", started)
+                if worker.conn.poll(min(0.05, remaining)):
+                    break
+                rss = _rss_mb(worker.process.pid)
+                if rss is not None and rss > self.memory_mb:
+                    self._replace(worker)
+                    return self._finish('memory_limit', f"Bellek sınırı ({self.memory_mb:g} MB) aşıldı", started)
+
+            outcome = json.loads(worker.conn.recv_bytes())
+        except (EOFError, OSError, BrokenPipeError) as e:
+            self._replace(worker)
+            return self._finish('crashed', f"Kod işçisi sonlandı: {e}", started)
+        except Exception as e:
+            # Beklenmeyen hata (ör. bozuk yanıt): işçinin durumu belirsiz, yenisiyle değiştirilir
+            self._replace(worker)
+            return self._finish('error', f"Kod işçisi yanıtı okunamadı: {type(e).__name__}: {e}", started)
+        finally:
+            for shm in shared:
+                shm.close()
+                shm.unlink()
+
+        # Çalıştırma sonrası şişmiş işçi (büyük ara tablolar) yenisiyle değiştirilir
+        rss = _rss_mb(worker.process.pid)
+        if rss is not None and rss > self.memory_mb / 2:
+            self._replace(worker)
+        else:
+            self._idle.put(worker)
+        return self._finish(outcome['status'], outcome['error'], started, outcome['result'])
+
+    def _finish(self, status: str, error: Optional[str], started: float, result=None) -> Dict:
+        key = {'ok': 'ok', 'error': 'errors', 'timeout': 'timeouts', 'cpu_limit': 'cpu_limits',
+               'memory_limit': 'memory_limits', 'crashed': 'crashes', 'busy': 'busy',
+               'unavailable': 'unavailable'}[status]
+        with self._lock:
+            self._stats[key] += 1
+        return {'status': status, 'result': result, 'error': error,
+                'elapsed_s': round(time.monotonic() - started, 3)}
+
+    def shutdown(self):
+        with self._lock:
+            self._started = False
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.kill()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self._stats, 'workers': self.workers, 'idle': self._idle.qsize(), 'timeout': self.timeout,
+                    'cpu_seconds': self.cpu_seconds, 'memory_mb': self.memory_mb}
+
+
+# Süreç genelinde paylaşılan tek örnek
+code_sandbox = SandboxPool()
@@ -11,7 +11,6 @@ from datetime import datetime
 from dotenv import load_dotenv
 import google.generativeai as genai
 from typing import List, Dict, Optional, Tuple
-import yfinance as yf
 import pandas as pd
 import numpy as np
 from pathlib import Path
@@ -21,6 +20,11 @@ matplotlib.use('Agg')  # Use non-interactive backend
 import matplotlib.pyplot as plt
 import io
 import base64
+from market_data import market_data_service
+from indicators import compute_indicators, lazy_indicators
+from code_sandbox import code_sandbox
+from code_cache import code_cache
+from llm_gateway import llm_gateway
 
 try:
     import PyPDF2
@@ -269,18 +273,17 @@ class DocumentRAGAgent:
     def get_stock_data(self, symbol: str = "KCHOL.IS") -> Dict:
         """Get current stock data and technical indicators from Yahoo Finance"""
         try:
-            stock = yf.Ticker(symbol)
-            info = stock.info
+            info = market_data_service.provider.get_info(symbol)
             
             # Get historical data for technical analysis (last 100 days)
-            hist = stock.history(period="100d")
-            if hist.empty:
+            hist = self._get_history(symbol)
+            if hist is None:
                 return {}
             
             current_price = hist['Close'].iloc[-1]
             
             # Calculate technical indicators
-            technical_data = self._calculate_technical_indicators(hist)
+            technical_data = self._calculate_technical_indicators(hist, symbol)
             
             return {
                 "current_price": current_price,
@@ -296,48 +299,33 @@ class DocumentRAGAgent:
             print(f"Stock data error: {e}")
             return {}
     
-    def _calculate_technical_indicators(self, hist: pd.DataFrame) -> Dict:
-        """Calculate technical indicators from historical data"""
+    def _get_history(self, symbol: str = "KCHOL.IS", days: int = 100) -> Optional[pd.DataFrame]:
+        """Shared market data cache, with Yahoo-style capitalized columns (Close, Volume, ...)"""
+        df = market_data_service.get_history(symbol, days=days)
+        if df is None:
+            return None
+        return df.rename(columns=str.capitalize)
+    
+    def _calculate_technical_indicators(self, hist: pd.DataFrame, symbol: Optional[str] = None) -> Dict:
+        """Calculate technical indicators from historical data (shared indicator engine)"""
         try:
             # Basic price data
             close_prices = hist['Close']
-            high_prices = hist['High']
-            low_prices = hist['Low']
             volumes = hist['Volume']
             
-            # Moving Averages
-            sma_20 = close_prices.rolling(window=20).mean().iloc[-1]
-            sma_50 = close_prices.rolling(window=50).mean().iloc[-1]
-            sma_200 = close_prices.rolling(window=200).mean().iloc[-1]
-            
-            # RSI (Relative Strength Index)
-            delta = close_prices.diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-            rs = gain / loss
-            rsi = 100 - (100 / (1 + rs))
-            current_rsi = rsi.iloc[-1]
-            
-            # MACD (Moving Average Convergence Divergence)
-            ema_12 = close_prices.ewm(span=12).mean()
-            ema_26 = close_prices.ewm(span=26).mean()
-            macd_line = ema_12 - ema_26
-            signal_line = macd_line.ewm(span=9).mean()
-            macd_histogram = macd_line - signal_line
-            
-            current_macd = macd_line.iloc[-1]
-            current_signal = signal_line.iloc[-1]
-            current_histogram = macd_histogram.iloc[-1]
-            
-            # Bollinger Bands
-            bb_middle = close_prices.rolling(window=20).mean()
-            bb_std = close_prices.rolling(window=20).std()
-            bb_upper = bb_middle + (bb_std * 2)
-            bb_lower = bb_middle - (bb_std * 2)
-            
-            current_bb_upper = bb_upper.iloc[-1]
-            current_bb_lower = bb_lower.iloc[-1]
-            current_bb_middle = bb_middle.iloc[-1]
+            # SMA, RSI, MACD and Bollinger Bands from the shared engine (canonical schema)
+            indicators = lazy_indicators(hist.rename(columns=str.lower), symbol)
+            latest = {col: indicators[col].iloc[-1] for col in
+                      ['SMA20', 'SMA50', 'SMA200', 'RSI', 'MACD', 'MACD_SIGNAL', 'MACD_HIST',
+                       'BB_UPPER', 'BB_LOWER', 'BB_MIDDLE']}
+            sma_20, sma_50, sma_200 = latest['SMA20'], latest['SMA50'], latest['SMA200']
+            current_rsi = latest['RSI']
+            current_macd = latest['MACD']
+            current_signal = latest['MACD_SIGNAL']
+            current_histogram = latest['MACD_HIST']
+            current_bb_upper = latest['BB_UPPER']
+            current_bb_lower = latest['BB_LOWER']
+            current_bb_middle = latest['BB_MIDDLE']
             
             # Volume indicators
             avg_volume = volumes.rolling(window=20).mean().iloc[-1]
@@ -403,8 +391,8 @@ Lütfen aşağıdaki kurallara uygun olarak yanıt ver:
 Yanıtını ver:
             """
             
-            response = self.model.generate_content(prompt)
-            return response.text.strip()
+            # Same normalized question + same retrieved context -> cached answer
+            return llm_gateway.generate(self.model, prompt, scope='rag', question=query, context=context).strip()
             
         except Exception as e:
             print(f"RAG generation error: {e}")
@@ -418,14 +406,23 @@ Yanıtını ver:
             if not stock_data:
                 return "Hisse verisi alınamadı. Lütfen daha sonra tekrar deneyin."
             
-            # Generate chart code using Gemini
-            chart_code = self._generate_chart_code(query, stock_data)
-            if not chart_code:
-                return "Grafik kodu oluşturulamadı. Lütfen tekrar deneyin."
+            hist = self._chart_history()
+            if hist is None:
+                return "Hisse verisi alınamadı. Lütfen daha sonra tekrar deneyin."
             
-            # Execute the chart code
-            chart_image = self._execute_chart_code(chart_code, stock_data)
+            def run(code):
+                outcome = code_sandbox.run(code, {'hist': hist}, 'chart_base64', ['plt', 'np', 'io', 'base64'])
+                # Code that never sets chart_base64 produced no chart: don't cache it
+                if outcome['status'] == 'ok' and not outcome['result']:
+                    return {**outcome, 'status': 'error', 'error': "chart_base64 was not set"}
+                return outcome
+            
+            # Reuse compiled code for repeated requests; otherwise generate with Gemini and run in the sandbox
+            outcome = code_cache.get_or_generate(
+                'rag_chart', query, hist, lambda: self._generate_chart_code(query, stock_data), run)
+            chart_image = outcome['result'] if outcome['status'] == 'ok' else ""
             if not chart_image:
+                print(f"Chart code execution error ({outcome['status']}): {outcome['error']}")
                 return "Grafik oluşturulamadı. Lütfen tekrar deneyin."
             
             return f"Teknik analiz grafiği oluşturuldu:\n\n![Teknik Analiz Grafiği](data:image/png;base64,{chart_image})"
@@ -442,6 +439,7 @@ Yanıtını ver:
 KCHOL hisse senedi için {query} grafiği oluşturacak Python kodu yaz.
 
 MEVCUT VERİLER: hist DataFrame (hist['Close'], hist['Volume'])
+HAZIR İNDİKATÖRLER (yeniden hesaplama): hist['SMA20'], hist['SMA50'], hist['RSI'], hist['MACD'], hist['MACD_SIGNAL'], hist['MACD_HIST'], hist['BB_UPPER'], hist['BB_MIDDLE'], hist['BB_LOWER'], hist['ATR'], hist['WILLIAMS']
 
 GEREKSİNİMLER:
 - Sadece matplotlib, numpy, io, base64 kullan
@@ -457,11 +455,7 @@ import base64
 
 plt.rcParams['font.family'] = ['DejaVu Sans', 'Arial Unicode MS', 'sans-serif']
 
-delta = hist['Close'].diff()
-gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-rs = gain / loss
-rsi = 100 - (100 / (1 + rs))
+rsi = hist['RSI']
 
 plt.figure(figsize=(12, 6))
 plt.plot(hist.index, rsi, label='RSI', linewidth=2, color='purple')
@@ -490,35 +484,20 @@ SADECE KOD YAZ, FONKSİYON TANIMLAMA YOK:
             print(f"Chart code generation error: {e}")
             return ""
     
-    def _execute_chart_code(self, code: str, stock_data: Dict) -> str:
-        """Execute the generated chart code and return base64 image"""
+    def _chart_history(self) -> Optional[pd.DataFrame]:
+        """Historical data with the shared indicator columns that generated chart code reads"""
         try:
-            # Get historical data for chart
-            stock = yf.Ticker("KCHOL.IS")
-            hist = stock.history(period="100d")
-            
-            # Create a safe execution environment
-            local_vars = {
-                'hist': hist,
-                'plt': plt,
-                'np': np,
-                'io': io,
-                'base64': base64
-            }
+            hist = self._get_history("KCHOL.IS")
+            if hist is None:
+                return None
             
-            # Execute the code
-            exec(code, {}, local_vars)
-            
-            # Get the result
-            if 'chart_base64' in local_vars:
-                return local_vars['chart_base64']
-            else:
-                print("chart_base64 variable not found in executed code")
-                return ""
+            # Hazır indikatör sütunları (ortak motor) - üretilen kod bunları yeniden hesaplamaz
+            indicators = compute_indicators(hist.rename(columns=str.lower), "KCHOL.IS")
+            return hist.join(indicators.drop(columns=['close', 'high', 'low', 'open', 'volume']))
                 
         except Exception as e:
-            print(f"Chart code execution error: {e}")
-            return ""
+            print(f"Chart history error: {e}")
+            return None
     
     def process_query(self, query: str) -> str:
         """Main method to process user query using Document RAG"""
@@ -0,0 +1,172 @@
+# feature_store.py
+# Modelin özellik matrisini sembol başına diskte tutan artımlı depo - her gece yalnızca yeni günler eklenir
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from bar_store import ADJUSTMENT_TOLERANCE, BAR_COLUMNS
+from bist_calendar import bist_calendar
+from indicators import compute_indicators
+from streaming_indicators import StreamingIndicatorSet
+
+
+def feature_dtype(features: List[str]) -> np.dtype:
+    return np.dtype([('date', '<i8')] + [(feature, '<f8') for feature in features])
+
+
+class FeatureStore:
+    """Sembol başına özellik satırları (.npy) ve indikatör akış durumu (.state.json)
+
+    İlk kurulumda tüm bar geçmişi için özellikler vektörel olarak hesaplanır ve
+    indikatörlerin akış durumu (streaming_indicators) kaydedilir. Sonraki
+    güncellemelerde yalnızca son kayıtlı günden sonraki, kesinleşmiş seanslara ait
+    barlar akışa beslenip dosyaya eklenir; SMA200/RSI/ATR/BB/Williams baştan
+    hesaplanmaz. Özellik listesi ya da geçmişin başlangıcı değişirse, ya da kayıtlı son
+    satırların fiyatları barlardakiyle uyuşmazsa (temettü/bölünme düzeltmesi) sembol yeniden kurulur.
+    """
+
+    def __init__(self, features: List[str], root: Optional[str] = None):
+        self.features = list(features)
+        self.dtype = feature_dtype(self.features)
+        self.root = Path(root or os.getenv('FEATURE_STORE_PATH', 'data/features'))
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _path(self, symbol: str) -> Path:
+        return self.root / f"{symbol.upper()}.npy"
+
+    def _state_path(self, symbol: str) -> Path:
+        return self.root / f"{symbol.upper()}.state.json"
+
+    def load(self, symbol: str) -> Optional[np.ndarray]:
+        path = self._path(symbol)
+        if not path.exists():
+            return None
+        try:
+            records = np.load(path, mmap_mode='r')
+        except Exception as e:
+            print(f"Özellik dosyası okunamadı ({symbol}): {e}")
+            return None
+        return records if records.dtype == self.dtype else None
+
+    def _load_state(self, symbol: str) -> Optional[Dict]:
+        path = self._state_path(symbol)
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Özellik akış durumu okunamadı ({symbol}): {e}")
+            return None
+
+    def _write(self, symbol: str, records: np.ndarray, state: Dict):
+        path = self._path(symbol)
+        tmp_path = path.with_suffix('.tmp.npy')
+        np.save(tmp_path, records)
+        os.replace(tmp_path, path)
+
+        state_path = self._state_path(symbol)
+        tmp_state = state_path.with_suffix('.tmp')
+        with open(tmp_state, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_state, state_path)
+
+    def _to_records(self, dates: pd.DatetimeIndex, columns: Dict[str, np.ndarray]) -> np.ndarray:
+        records = np.empty(len(dates), dtype=self.dtype)
+        records['date'] = dates.values.astype('datetime64[D]').astype('int64')
+        for feature in self.features:
+            records[feature] = columns[feature]
+        return records
+
+    def _basis_changed(self, records: np.ndarray, bars: pd.DataFrame, rows: int = 20) -> bool:
+        """Kayıtlı son satırların fiyat özellikleri aynı günlerin barlarından farklı mı"""
+        columns = [column for column in BAR_COLUMNS if column != 'volume' and column in self.features]
+        tail = records[-rows:]
+        days = pd.DatetimeIndex(tail['date'].astype('datetime64[D]').astype('datetime64[ns]'))
+        common = days.isin(bars.index)
+        if not columns or not common.any():
+            return False
+        stored = np.column_stack([tail[column][common] for column in columns])
+        current = bars.loc[days[common], columns].to_numpy(dtype='f8')
+        return not np.allclose(stored, current, rtol=ADJUSTMENT_TOLERANCE, atol=0, equal_nan=True)
+
+    def update(self, symbol: str, bars: pd.DataFrame) -> int:
+        """Kesinleşmiş yeni barların özelliklerini ekle; eklenen satır sayısını döndür"""
+        last_session = pd.Timestamp(bist_calendar.last_completed_session())
+        bars = bars[bars.index <= last_session]
+        if bars.empty:
+            return 0
+
+        with self._lock:
+            records = self.load(symbol)
+            state = self._load_state(symbol)
+            first_day = int(np.datetime64(bars.index[0], 'D').astype('int64'))
+            rebuild = (records is None or state is None or len(records) == 0
+                       or state.get('features') != self.features or int(records['date'][0]) != first_day)
+            if not rebuild and self._basis_changed(records, bars):
+                print(f"Özellik deposu: {symbol} fiyat geçmişi yeniden düzeltilmiş, özellikler yeniden hesaplanıyor")
+                rebuild = True
+
+            if rebuild:
+                frame = compute_indicators(bars, symbol, columns=self.features)
+                new_records = self._to_records(frame.index, {f: frame[f].to_numpy(dtype='f8') for f in self.features})
+                stream = StreamingIndicatorSet()
+                stream.warm_up(bars)
+                records = new_records
+            else:
+                stream = StreamingIndicatorSet.restore(state['stream'])
+                new_bars = bars[bars.index > pd.Timestamp(stream.last_timestamp)]
+                if new_bars.empty:
+                    return 0
+                rows = []
+                for timestamp, bar in zip(new_bars.index, new_bars[BAR_COLUMNS].to_dict('records')):
+                    rows.append({**bar, **stream.update(bar, timestamp)})
+                new_records = self._to_records(new_bars.index,
+                                               {f: np.array([row[f] for row in rows], dtype='f8') for f in self.features})
+                records = np.concatenate([np.asarray(records), new_records])
+
+            self._write(symbol, records, {'features': self.features, 'stream': stream.checkpoint()})
+            return len(new_records)
+
+    def frame(self, symbol: str) -> Optional[pd.DataFrame]:
+        """Sembolün tüm özellik satırları (tarih indeksli)"""
+        records = self.load(symbol)
+        if records is None or len(records) == 0:
+            return None
+        index = pd.DatetimeIndex(records['date'].astype('datetime64[D]').astype('datetime64[ns]'))
+        return pd.DataFrame({feature: np.array(records[feature]) for feature in self.features}, index=index)
+
+    def dataset(self, symbol: str, horizon: int = 1) -> Optional[Dict[str, np.ndarray]]:
+        """Eğitim verisi: X (özellikler), y (horizon işlem günü sonraki kapanış), tarihler
+
+        Eksik özellikli satırlar (ilk 199 gün) ve hedefi henüz bilinmeyen son günler çıkarılır.
+        """
+        records = self.load(symbol)
+        if records is None or len(records) <= horizon:
+            return None
+        X = np.column_stack([records[feature] for feature in self.features])
+        close = np.asarray(records['close'])
+        y = np.append(close[horizon:], np.full(horizon, np.nan))
+        valid = ~np.isnan(X).any(axis=1) & ~np.isnan(y)
+        dates = records['date'][valid].astype('datetime64[D]')
+        return {'X': X[valid], 'y': y[valid], 'dates': dates}
+
+    def sync(self, symbols: List[str]) -> Dict[str, int]:
+        """Sembollerin barlarını (bar deposundan, tek toplu istekle) alıp özellikleri güncelle"""
+        from market_data import market_data_service
+
+        frames, _ = market_data_service.get_histories(symbols, start=market_data_service.store_start)
+        appended = {}
+        for symbol, bars in frames.items():
+            try:
+                appended[symbol] = self.update(symbol, bars)
+            except Exception as e:
+                print(f"Özellik güncelleme hatası ({symbol}): {e}")
+        return appended
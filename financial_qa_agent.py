@@ -5,14 +5,17 @@ Handles natural language financial questions with comprehensive analysis
 """
 
 import os
-import yfinance as yf
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import google.generativeai as genai
 from dotenv import load_dotenv
 import logging
-from finta import TA
+from market_data import market_data_service
+from indicators import lazy_indicators
+from universe import load_universe
+from symbol_resolver import symbol_resolver
+from llm_gateway import llm_gateway
 import requests
 import json
 
@@ -92,111 +95,26 @@ class FinancialQAAgent:
             
             self.logger.info(f"Veri alınıyor: {yf_symbol} - {start_date} to {end_date}")
             
-            # Farklı sembol formatlarını dene
-            df = None
-            symbol_variants = [yf_symbol, f"{symbol}.IS", symbol]
-            
-            for variant in symbol_variants:
-                try:
-                    self.logger.info(f"Deneniyor: {variant}")
-                    df = yf.download(variant, start_date, end_date, progress=False, timeout=30)
-                    if not df.empty:
-                        self.logger.info(f"Başarılı: {variant} - Veri boyutu: {df.shape}")
-                        break
-                except Exception as e:
-                    self.logger.warning(f"Başarısız: {variant} - Hata: {e}")
-                    continue
+            # Farklı sembol formatlarını dene (çalışan format kalıcı tabloda hatırlanır)
+            variant, df = symbol_resolver.resolve(
+                symbol, [yf_symbol, f"{symbol}.IS", symbol],
+                lambda ticker: market_data_service.get_history(ticker, start=start_date, end=end_date, timeout=30))
+            if variant:
+                self.logger.info(f"Başarılı: {variant} - Veri boyutu: {df.shape}")
             
             if df is None or df.empty:
                 self.logger.error(f"Hiçbir sembol formatı çalışmadı: {symbol}")
                 return None
             
-            # Sütun isimlerini düzenleme
-            try:
-                df.columns = ['_'.join(col).lower() for col in df.columns]
-                df.columns = [col.split('_')[0] for col in df.columns]
-                self.logger.info(f"Düzenlenmiş sütunlar: {df.columns.tolist()}")
-            except Exception as e:
-                self.logger.error(f"Sütun düzenleme hatası: {e}")
+            # NaN değerleri temizle (sadece OHLCV sütunları için)
+            df = df.dropna()
+            if len(df) < 5:  # Minimum veri noktası
+                self.logger.warning(f"Yeterli veri yok: {len(df)} nokta")
                 return None
             
-            # Gerekli sütunların varlığını kontrol et
-            required_columns = ['open', 'high', 'low', 'close', 'volume']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            if missing_columns:
-                self.logger.error(f"Eksik sütunlar: {missing_columns}")
-                return None
-            
-            # Teknik indikatörler ekle
-            try:
-                # Temel teknik indikatörler
-                df['SMA20'] = TA.SMA(df, 20)
-                df['SMA50'] = TA.SMA(df, 50)
-                df['RSI'] = TA.RSI(df)
-                
-                # Sadece RSI için hacim analizi yapılacaksa diğer indikatörleri atla
-                if 'rsi' in question.lower() if 'question' in locals() else False:
-                    self.logger.info("Sadece RSI hesaplanıyor")
-                    return df
-                
-                # Diğer teknik indikatörler (opsiyonel)
-                try:
-                    df['SMA200'] = TA.SMA(df, 200)
-                except:
-                    df['SMA200'] = np.nan
-                
-                # MACD hesapla
-                try:
-                    macd_data = TA.MACD(df)
-                    df['MACD'] = macd_data['MACD']
-                    df['MACD_SIGNAL'] = macd_data['MACD_SIGNAL']
-                except Exception as e:
-                    self.logger.warning(f"MACD hesaplama hatası: {e}")
-                    df['MACD'] = np.nan
-                    df['MACD_SIGNAL'] = np.nan
-                
-                # Bollinger Bands hesapla
-                try:
-                    bb_data = TA.BBANDS(df)
-                    df['BB_UPPER'] = bb_data['BB_UPPER']
-                    df['BB_LOWER'] = bb_data['BB_LOWER']
-                except Exception as e:
-                    self.logger.warning(f"Bollinger Bands hesaplama hatası: {e}")
-                    df['BB_UPPER'] = np.nan
-                    df['BB_LOWER'] = np.nan
-                
-                try:
-                    df['WILLIAMS_R'] = TA.WILLIAMS(df)
-                except:
-                    df['WILLIAMS_R'] = np.nan
-                
-                try:
-                    df['ATR'] = TA.ATR(df)
-                except:
-                    df['ATR'] = np.nan
-                
-                self.logger.info(f"Teknik indikatörler eklendi. Final veri boyutu: {df.shape}")
-                
-            except Exception as e:
-                self.logger.error(f"Teknik indikatör ekleme hatası: {e}")
-                return None
-            
-            # NaN değerleri temizle (sadece gerekli sütunlar için)
-            required_columns = ['open', 'high', 'low', 'close', 'volume']
-            df_cleaned = df[required_columns].dropna()
-            
-            # Teknik indikatör sütunlarını ekle (NaN olsa bile)
-            for col in df.columns:
-                if col not in required_columns:
-                    df_cleaned[col] = df[col]
-            
-            self.logger.info(f"Temizlenmiş veri boyutu: {df_cleaned.shape}")
-            
-            if len(df_cleaned) < 5:  # Minimum veri noktası
-                self.logger.warning(f"Yeterli veri yok: {len(df_cleaned)} nokta")
-                return None
-            
-            return df_cleaned
+            # Teknik indikatörler tembel hesaplanır: her sütun ilk erişimde (bağımlılıklarıyla) hesaplanır,
+            # böylece yalnızca RSI ya da kapanış fiyatı isteyen sorular diğer indikatörlere bedel ödemez
+            return lazy_indicators(df, variant)
             
         except Exception as e:
             self.logger.error(f"Genel veri alma hatası ({symbol}): {e}")
@@ -216,42 +134,19 @@ class FinancialQAAgent:
             
             self.logger.info(f"Hacim verisi alınıyor: {yf_symbol} - {start_date} to {end_date}")
             
-            # Farklı sembol formatlarını dene
-            df = None
-            symbol_variants = [yf_symbol, f"{symbol}.IS", symbol]
-            
-            for variant in symbol_variants:
-                try:
-                    self.logger.info(f"Deneniyor: {variant}")
-                    df = yf.download(variant, start_date, end_date, progress=False, timeout=30)
-                    if not df.empty:
-                        self.logger.info(f"Başarılı: {variant} - Veri boyutu: {df.shape}")
-                        break
-                except Exception as e:
-                    self.logger.warning(f"Başarısız: {variant} - Hata: {e}")
-                    continue
+            # Farklı sembol formatlarını dene (çalışan format kalıcı tabloda hatırlanır)
+            variant, df = symbol_resolver.resolve(
+                symbol, [yf_symbol, f"{symbol}.IS", symbol],
+                lambda ticker: market_data_service.get_history(ticker, start=start_date, end=end_date, timeout=30))
+            if variant:
+                self.logger.info(f"Başarılı: {variant} - Veri boyutu: {df.shape}")
             
             if df is None or df.empty:
                 self.logger.error(f"Hiçbir sembol formatı çalışmadı: {symbol}")
                 return None
             
-            # Sütun isimlerini düzenleme
-            try:
-                df.columns = ['_'.join(col).lower() for col in df.columns]
-                df.columns = [col.split('_')[0] for col in df.columns]
-                self.logger.info(f"Düzenlenmiş sütunlar: {df.columns.tolist()}")
-            except Exception as e:
-                self.logger.error(f"Sütun düzenleme hatası: {e}")
-                return None
-            
-            # Gerekli sütunların varlığını kontrol et
-            required_columns = ['open', 'high', 'low', 'close', 'volume']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            if missing_columns:
-                self.logger.error(f"Eksik sütunlar: {missing_columns}")
-                return None
-            
             # Sadece gerekli sütunları tut
+            required_columns = ['open', 'high', 'low', 'close', 'volume']
             df_volume = df[required_columns].copy()
             
             # NaN değerleri temizle
@@ -1001,26 +896,27 @@ Her terim için gerçek örneklerle açıklama alabilirsiniz."""
         """Birden fazla hissenin RSI değerlerini al"""
         try:
             high_rsi_stocks = []
-            
-            for symbol in ['KCHOL', 'THYAO', 'GARAN', 'AKBNK', 'ISCTR', 'ASELS', 'EREGL', 'SASA']:
-                df = self.get_stock_data(symbol, days=30)
-                
-                if df is not None and not df.empty:
-                    current_rsi = df['RSI'].iloc[-1]
-                    current_price = df['close'].iloc[-1]
-                    
-                    if current_rsi > threshold:
-                        high_rsi_stocks.append({
-                            'symbol': symbol,
-                            'rsi': round(current_rsi, 2),
-                            'price': round(current_price, 2),
-                            'status': 'Aşırı alım'
-                        })
+            symbols = ['KCHOL', 'THYAO', 'GARAN', 'AKBNK', 'ISCTR', 'ASELS', 'EREGL', 'SASA']
+            
+            # Tüm semboller tek toplu istekle alınır, RSI tüm semboller için tek vektörel geçişte hesaplanır
+            yf_symbols = {symbol: self.turkish_stocks.get(symbol, f"{symbol}.IS") for symbol in symbols}
+            universe, failed = load_universe(list(yf_symbols.values()), days=30, timeout=30)
+            codes = {ticker: symbol for symbol, ticker in yf_symbols.items()}
+            prices = dict(zip(universe.symbols, universe.latest('close')))
+            
+            for ticker, current_rsi in universe.top('RSI', len(universe), conditions=[('RSI', '>', threshold)]):
+                high_rsi_stocks.append({
+                    'symbol': codes[ticker],
+                    'rsi': round(current_rsi, 2),
+                    'price': round(prices[ticker], 2),
+                    'status': 'Aşırı alım'
+                })
             
             return {
                 'threshold': threshold,
                 'high_rsi_count': len(high_rsi_stocks),
-                'stocks': high_rsi_stocks
+                'stocks': high_rsi_stocks,
+                'failed_symbols': [symbol for symbol in symbols if yf_symbols[symbol] in failed]
             }
             
         except Exception as e:
@@ -1129,8 +1025,9 @@ YANIT KURALLARI:
 Yanıtını ver:
 """
             
-            response = self.gemini_model.generate_content(prompt)
-            return response.text.strip()
+            # Aynı soru (normalize) + aynı analiz verisi için önbellekten
+            return llm_gateway.generate(self.gemini_model, prompt, scope=f"qa:{question_type}",
+                                        question=question, context=analysis_data).strip()
             
         except Exception as e:
             self.logger.error(f"Gemini yanıt oluşturma hatası: {e}")
@@ -1,6 +1,7 @@
 # hisse_simulasyon.py
 
-import yfinance as yf
+from market_data import market_data_service
+from symbol_resolver import symbol_resolver
 from datetime import datetime
 import dateparser
 
@@ -18,24 +19,23 @@ def hisse_simulasyon(hisse_kodu: str, baslangic_input: str, yatirim_tutari: floa
         baslangic_str = baslangic_tarihi.strftime("%Y-%m-%d")
         bugun = datetime.now().strftime("%Y-%m-%d")
 
-        # 3. Veri çek - farklı formatları dene
-        df = None
+        # 3. Veri çek - farklı formatları dene (çalışan format kalıcı tabloda hatırlanır)
+        # Sembol seçilen tarih aralığından bağımsız olarak deponun tüm geçmişiyle çözülür; aralığın
+        # boş olması (ör. gelecekteki ya da tatile denk gelen bir tarih) geçerli kodu bilinmeyen yapmaz
         symbol_variants = [hisse_kodu, hisse_kodu.replace('.IS', ''), f"{hisse_kodu.replace('.IS', '')}.IS"]
-        
-        for variant in symbol_variants:
-            try:
-                df = yf.download(variant, start=baslangic_str, end=bugun, progress=False)
-                if not df.empty and len(df) >= 2:
-                    break
-            except:
-                continue
+        ticker, _ = symbol_resolver.resolve(
+            hisse_kodu.replace('.IS', ''), symbol_variants,
+            lambda ticker: market_data_service.get_history(ticker, start=market_data_service.store_start, end=bugun))
+        if ticker is None:
+            return {"hata": f"{hisse_kodu} için veri bulunamadı."}
 
-        if df.empty or len(df) < 2:
+        df = market_data_service.get_history(ticker, start=baslangic_str, end=bugun)
+        if df is None or len(df) < 2:
             return {"hata": f"{hisse_kodu} için yeterli veri bulunamadı."}
 
         # 3. İlk ve son fiyatı al
-        ilk_gun_fiyati = df['Close'].iloc[0].item()
-        son_fiyat = df['Close'].iloc[-1].item()
+        ilk_gun_fiyati = float(df['close'].iloc[0])
+        son_fiyat = float(df['close'].iloc[-1])
 
         # 4. Hesaplamalar
         lot_sayisi = yatirim_tutari / ilk_gun_fiyati
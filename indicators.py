@@ -0,0 +1,291 @@
+# indicators.py
+# Ortak teknik indikatör motoru - tüm modüller aynı şemayı ve aynı hesaplamayı kullanır
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+
+from bar_store import BAR_COLUMNS
+
+# Formüller finta ile birebir aynıdır (model finta indikatörleriyle eğitildi):
+# RSI ve MACD pandas ewm(adjust=True), Bollinger std ddof=1, ATR = TR'nin basit ortalaması
+DEFAULT_PARAMS = {
+    'sma_periods': (20, 50, 200),
+    'rsi_period': 14,
+    'macd_fast': 12,
+    'macd_slow': 26,
+    'macd_signal': 9,
+    'bb_period': 20,
+    'bb_std': 2.0,
+    'atr_period': 14,
+    'williams_period': 14,
+}
+
+# Kanonik sütun adları
+INDICATOR_COLUMNS = [
+    'SMA20', 'SMA50', 'SMA200', 'RSI', 'MACD', 'MACD_SIGNAL', 'MACD_HIST',
+    'BB_UPPER', 'BB_MIDDLE', 'BB_LOWER', 'BB_WIDTH', 'ATR', 'WILLIAMS',
+]
+
+
+# Tüm fonksiyonlar zaman eksenini 0. eksen kabul eder: tek hisse için 1-B seri, evren
+# (universe.py) için tarih x sembol matrisi aynı kodla hesaplanır.
+
+def ewm_mean(values: np.ndarray, alpha: float) -> np.ndarray:
+    """pandas ewm(alpha, adjust=True).mean() karşılığı; NaN gözlemler ağırlık almaz"""
+    valid = ~np.isnan(values)
+    decay = 1.0 - alpha
+    # adjust=True: ağırlıklı toplam / ağırlıklar toplamı, ikisi de tek kutuplu IIR filtresi.
+    # NaN'lar sıfır ağırlıkla girer; ilk geçerli gözlemden önce payda 0 olduğundan sonuç NaN kalır
+    numerator = lfilter([1.0], [1.0, -decay], np.where(valid, values, 0.0), axis=0)
+    denominator = lfilter([1.0], [1.0, -decay], valid.astype('f8'), axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator > 0, numerator / denominator, np.nan)
+
+
+def rolling(values: np.ndarray, window: int, reducer, **kwargs) -> np.ndarray:
+    """pandas rolling(window) karşılığı (min_periods=window)"""
+    out = np.full(values.shape, np.nan)
+    if len(values) >= window:
+        out[window - 1:] = reducer(sliding_window_view(values, window, axis=0), axis=-1, **kwargs)
+    return out
+
+
+def shift(values: np.ndarray, periods: int = 1) -> np.ndarray:
+    """pandas shift(periods) karşılığı (periods > 0)"""
+    out = np.full(values.shape, np.nan)
+    out[periods:] = values[:-periods]
+    return out
+
+
+def sma(close: np.ndarray, period: int) -> np.ndarray:
+    return rolling(close, period, np.mean)
+
+
+def rsi(close: np.ndarray, period: int = 14) -> np.ndarray:
+    delta = close - shift(close)
+    gain = np.where(delta < 0, 0.0, delta)
+    loss = np.abs(np.where(delta > 0, 0.0, delta))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = ewm_mean(gain, 1.0 / period) / ewm_mean(loss, 1.0 / period)
+        return 100 - (100 / (1 + rs))
+
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    prev_close = shift(close)
+    # fmax NaN'ları atlar: ilk barda yalnızca high - low kalır (finta ile aynı)
+    return np.fmax(np.fmax(np.abs(high - low), np.abs(high - prev_close)), np.abs(prev_close - low))
+
+
+def williams(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14) -> np.ndarray:
+    highest_high = rolling(high, period, np.max)
+    lowest_low = rolling(low, period, np.min)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (highest_high - close) / (highest_high - lowest_low) * -100
+
+
+def _divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return numerator / denominator
+
+
+def build_graph(params: Dict) -> Dict[str, Tuple[Tuple[str, ...], Callable]]:
+    """Sütun -> (bağımlılıklar, fonksiyon) bağımlılık grafiği
+
+    Bağımlılıklar OHLCV sütunları ya da grafikteki diğer düğümlerdir; EMA_FAST, TR,
+    BB_STD gibi ara düğümler yalnızca ihtiyaç duyan indikatörler için hesaplanır.
+    """
+    p = params
+    graph = {}
+
+    for period in set(p['sma_periods']) | {p['bb_period']}:
+        graph[f"SMA{period}"] = (('close',), lambda close, n=period: sma(close, n))
+
+    graph['RSI'] = (('close',), lambda close: rsi(close, p['rsi_period']))
+
+    graph['EMA_FAST'] = (('close',), lambda close: ewm_mean(close, 2.0 / (p['macd_fast'] + 1)))
+    graph['EMA_SLOW'] = (('close',), lambda close: ewm_mean(close, 2.0 / (p['macd_slow'] + 1)))
+    graph['MACD'] = (('EMA_FAST', 'EMA_SLOW'), lambda fast, slow: fast - slow)
+    graph['MACD_SIGNAL'] = (('MACD',), lambda line: ewm_mean(line, 2.0 / (p['macd_signal'] + 1)))
+    graph['MACD_HIST'] = (('MACD', 'MACD_SIGNAL'), lambda line, signal: line - signal)
+
+    graph['BB_STD'] = (('close',), lambda close: rolling(close, p['bb_period'], np.std, ddof=1))
+    graph['BB_MIDDLE'] = ((f"SMA{p['bb_period']}",), lambda middle: middle.copy())
+    graph['BB_UPPER'] = (('BB_MIDDLE', 'BB_STD'), lambda middle, std: middle + p['bb_std'] * std)
+    graph['BB_LOWER'] = (('BB_MIDDLE', 'BB_STD'), lambda middle, std: middle - p['bb_std'] * std)
+    graph['BB_WIDTH'] = (('BB_UPPER', 'BB_LOWER', 'BB_MIDDLE'),
+                         lambda upper, lower, middle: _divide(upper - lower, middle))
+
+    graph['TR'] = (('high', 'low', 'close'), true_range)
+    graph['ATR'] = (('TR',), lambda tr: rolling(tr, p['atr_period'], np.mean))
+    graph['WILLIAMS'] = (('high', 'low', 'close'),
+                         lambda high, low, close: williams(high, low, close, p['williams_period']))
+    return graph
+
+
+def indicator_columns(params: Optional[Dict] = None) -> List[str]:
+    """Parametrelere göre kanonik (dışa açık) indikatör sütunları"""
+    p = {**DEFAULT_PARAMS, **(params or {})}
+    return [f"SMA{period}" for period in p['sma_periods']] + INDICATOR_COLUMNS[3:]
+
+
+class IndicatorGraph:
+    """Bağımlılık grafiğindeki düğümleri ilk talepte, yalnızca bağımlılıklarıyla hesaplar
+
+    Temel diziler (OHLCV) 1-B seri ya da tarih x sembol matrisi olabilir. Hesaplanan
+    diziler salt okunur saklanır ve sonraki taleplerde yeniden kullanılır.
+    """
+
+    def __init__(self, base: Dict[str, np.ndarray], graph: Dict[str, Tuple[Tuple[str, ...], Callable]]):
+        self.graph = graph
+        self.values: Dict[str, np.ndarray] = dict(base)
+        self._lock = threading.RLock()
+
+    def get(self, name: str) -> np.ndarray:
+        values = self.values.get(name)
+        if values is not None:
+            return values
+        with self._lock:
+            if name in self.values:
+                return self.values[name]
+            deps, fn = self.graph[name]
+            values = fn(*[self.get(dep) for dep in deps])
+            values.flags.writeable = False
+            self.values[name] = values
+            return values
+
+
+class LazyIndicatorFrame:
+    """İndikatör sütunlarını ilk erişimde, yalnızca bağımlılıklarıyla birlikte hesaplayan tablo
+
+    DataFrame'in okuma arayüzünün küçük bir alt kümesini sunar (frame['RSI'], columns,
+    index, len, empty); tam DataFrame gerektiğinde to_frame(columns) kullanılır.
+    Hesaplanan sütunlar aynı çerçeveyi paylaşan isteklerce yeniden kullanılır.
+    """
+
+    def __init__(self, df: pd.DataFrame, symbol: Optional[str] = None, params: Optional[Dict] = None):
+        self.symbol = symbol
+        self.params = {**DEFAULT_PARAMS, **(params or {})}
+        self.ohlcv = df[BAR_COLUMNS]
+        self.index = self.ohlcv.index
+        self.indicator_columns = indicator_columns(self.params)
+        self.columns = pd.Index(BAR_COLUMNS + self.indicator_columns)
+        self._graph = IndicatorGraph({col: self.ohlcv[col].to_numpy(dtype='f8') for col in BAR_COLUMNS},
+                                     build_graph(self.params))
+
+    def __getitem__(self, name: str) -> pd.Series:
+        if name not in self.columns:
+            raise KeyError(name)
+        return pd.Series(self._graph.get(name), index=self.index, name=name, copy=True)
+
+    def __contains__(self, name) -> bool:
+        return name in self.columns
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.index) == 0
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return (len(self.index), len(self.columns))
+
+    @property
+    def computed(self) -> List[str]:
+        """Şimdiye kadar hesaplanmış dışa açık indikatörler"""
+        return [col for col in self.indicator_columns if col in self._graph.values]
+
+    def arrays(self, columns: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        columns = self.indicator_columns if columns is None else columns
+        return {col: self._graph.get(col) for col in columns if col not in BAR_COLUMNS}
+
+    def to_frame(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """OHLCV + istenen indikatörler (varsayılan: hepsi) içeren bağımsız DataFrame"""
+        result = self.ohlcv.copy()
+        for col, values in self.arrays(columns).items():
+            result[col] = np.array(values)
+        return result
+
+
+def compute_arrays(df: pd.DataFrame, params: Optional[Dict] = None) -> Dict[str, np.ndarray]:
+    """OHLCV tablosundan tüm indikatörleri NumPy dizileri olarak hesapla"""
+    return LazyIndicatorFrame(df, params=params).arrays()
+
+
+class IndicatorEngine:
+    """Sembol başına LazyIndicatorFrame'leri (sembol, ilk/son bar, son kapanış, parametreler) anahtarıyla saklar
+
+    Aynı sembolün aynı barları için ikinci bir modül ya da istek, önceki isteklerin
+    hesapladığı sütunları yeniden kullanır ve yalnızca eksik olanları hesaplar;
+    yeni bir bar geldiğinde (ya da gün içi bar güncellendiğinde) anahtar değişir.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('INDICATOR_CACHE_SIZE', 256))
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0}
+
+    @staticmethod
+    def _key(symbol: str, df: pd.DataFrame, params: Dict):
+        # İlk kapanış, geçmişe uygulanan temettü/bölünme düzeltmesini de anahtara katar
+        return (symbol.upper(), df.index[0], df.index[-1], len(df), float(df['close'].iloc[0]),
+                float(df['close'].iloc[-1]), float(df['volume'].iloc[-1]),
+                tuple(sorted(params.items())))
+
+    def lazy(self, df: pd.DataFrame, symbol: Optional[str] = None,
+             params: Optional[Dict] = None) -> Optional[LazyIndicatorFrame]:
+        """Sütunları talep edildikçe hesaplanan (ve saklanan) indikatör çerçevesi"""
+        if df is None or df.empty:
+            return None
+        params = params or {}
+        if not symbol:
+            return LazyIndicatorFrame(df, params=params)
+
+        key = self._key(symbol, df, params)
+        with self._lock:
+            frame = self._cache.get(key)
+            if frame is not None:
+                self._cache.move_to_end(key)
+                self._stats['hits'] += 1
+                return frame
+            self._stats['misses'] += 1
+            frame = LazyIndicatorFrame(df, symbol, params)
+            self._cache[key] = frame
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+            return frame
+
+    def compute(self, df: pd.DataFrame, symbol: Optional[str] = None, params: Optional[Dict] = None,
+                columns: Optional[List[str]] = None) -> Optional[pd.DataFrame]:
+        """OHLCV + istenen (varsayılan: tüm) kanonik indikatör sütunlarını içeren yeni bir DataFrame döndür"""
+        frame = self.lazy(df, symbol, params)
+        return frame.to_frame(columns) if frame is not None else None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self._stats, 'entries': len(self._cache), 'max_entries': self.max_entries,
+                    'computed_columns': sum(len(frame.computed) for frame in self._cache.values())}
+
+
+# Süreç genelinde paylaşılan tek örnek
+indicator_engine = IndicatorEngine()
+
+
+def compute_indicators(df: pd.DataFrame, symbol: Optional[str] = None,
+                       columns: Optional[List[str]] = None, **params) -> Optional[pd.DataFrame]:
+    """Kısayol: indicator_engine.compute(df, symbol, params, columns)"""
+    return indicator_engine.compute(df, symbol, params, columns)
+
+
+def lazy_indicators(df: pd.DataFrame, symbol: Optional[str] = None, **params) -> Optional[LazyIndicatorFrame]:
+    """Kısayol: indicator_engine.lazy(df, symbol, params)"""
+    return indicator_engine.lazy(df, symbol, params)
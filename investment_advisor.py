@@ -1,7 +1,6 @@
 # investment_advisor.py
 # Kullanıcı Risk Profili ve Kişiselleştirilmiş Yatırım Önerileri
 
-import yfinance as yf
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
@@ -9,7 +8,10 @@ import re
 import os
 from dotenv import load_dotenv
 import google.generativeai as genai
-from finta import TA
+from indicators import compute_indicators
+from market_data import market_data_service
+from universe import WATCHLIST, load_universe
+from llm_gateway import llm_gateway
 
 # Load environment variables
 load_dotenv()
@@ -44,12 +46,7 @@ class InvestmentAdvisor:
         }
         
         # Türk hisseleri listesi
-        self.turkish_stocks = [
-            'KCHOL.IS', 'THYAO.IS', 'GARAN.IS', 'AKBNK.IS', 'ASELS.IS', 'SASA.IS',
-            'EREGL.IS', 'ISCTR.IS', 'BIMAS.IS', 'ALARK.IS', 'TUPRS.IS', 'PGSUS.IS',
-            'KRDMD.IS', 'TAVHL.IS', 'DOAS.IS', 'TOASO.IS', 'FROTO.IS', 'VESTL.IS',
-            'YAPI.IS', 'QNBFB.IS', 'HALKB.IS', 'VAKBN.IS', 'SISE.IS', 'KERVN.IS'
-        ]
+        self.turkish_stocks = list(WATCHLIST)
 
     def analyze_risk_profile(self, user_message):
         """Kullanıcı mesajından risk profilini analiz et"""
@@ -76,23 +73,16 @@ class InvestmentAdvisor:
 
     def get_stock_data(self, symbol, days=60):
         """Hisse verisi al"""
+        df = market_data_service.get_history(symbol, days=days)
+        if df is None:
+            return None
+        return self.summarize_stock_data(symbol, df)
+
+    def summarize_stock_data(self, symbol, df):
+        """Hazır OHLCV verisinden indikatör ve volatilite özetini çıkar"""
         try:
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=days)
-            
-            df = yf.download(symbol, start=start_date, end=end_date, progress=False)
-            
-            if df.empty:
-                return None
-            
-            # Sütun isimlerini düzenle
-            df.columns = ['_'.join(col).lower() for col in df.columns]
-            df.columns = [col.split('_')[0] for col in df.columns]
-            
-            # Teknik indikatörler
-            df['RSI'] = TA.RSI(df)
-            df['SMA20'] = TA.SMA(df, 20)
-            df['SMA50'] = TA.SMA(df, 50)
+            # Teknik indikatörler (ortak indikatör motoru, sembol/bar başına bir kez hesaplanır)
+            df = compute_indicators(df, symbol, columns=['RSI', 'SMA20', 'SMA50'])
             
             # Volatilite hesapla
             df['returns'] = df['close'].pct_change()
@@ -112,9 +102,47 @@ class InvestmentAdvisor:
             print(f"Veri alma hatası ({symbol}): {e}")
             return None
 
-    def analyze_stock_for_profile(self, symbol, risk_profile):
+    def summarize_universe(self, universe):
+        """Evrendeki tüm hisselerin özetini tek vektörel geçişte çıkar (summarize_stock_data ile aynı alanlar)"""
+        snapshot = universe.snapshot(['close', 'SMA20', 'SMA50', 'RSI', 'volume'])
+        snapshot['volatility'] = universe.volatility()
+        snapshot['volume_avg'] = universe.mean('volume')
+        
+        return {
+            symbol: {
+                'volatility': row['volatility'],
+                'current_price': row['close'],
+                'sma20': row['SMA20'],
+                'sma50': row['SMA50'],
+                'rsi': row['RSI'],
+                'volume_avg': row['volume_avg'],
+                'volume_current': row['volume']
+            }
+            for symbol, row in snapshot.iterrows()
+        }
+
+    def screen_watchlist(self, by='RSI', top_n=5, ascending=False, conditions=None, days=60):
+        """İzleme listesini tara: ör. RSI'a göre ilk 5, ya da [('VOLUME_RATIO', '>', 1.5)] koşulunu sağlayanlar"""
+        universe, failed = load_universe(self.turkish_stocks, days=days)
+        if universe.empty:
+            return {'by': by, 'stocks': [], 'failed_symbols': failed}
+        
+        snapshot = universe.snapshot(['close', by, 'VOLUME_RATIO'])
+        stocks = [
+            {
+                'symbol': symbol,
+                by: round(value, 2),
+                'price': round(snapshot.at[symbol, 'close'], 2),
+                'volume_ratio': round(snapshot.at[symbol, 'VOLUME_RATIO'], 2)
+            }
+            for symbol, value in universe.top(by, top_n, ascending=ascending, conditions=conditions)
+        ]
+        return {'by': by, 'stocks': stocks, 'failed_symbols': failed}
+
+    def analyze_stock_for_profile(self, symbol, risk_profile, stock_data=None):
         """Belirli bir hisseyi risk profili için analiz et"""
-        stock_data = self.get_stock_data(symbol)
+        if stock_data is None:
+            stock_data = self.get_stock_data(symbol)
         if not stock_data:
             return None
         
@@ -176,9 +204,14 @@ class InvestmentAdvisor:
         else:  # moderate
             target_stocks = ['KCHOL.IS', 'GARAN.IS', 'THYAO.IS', 'ASELS.IS', 'SASA.IS']
         
+        # Hedef hisselerin verisi tek toplu istekle alınır, özetler tek vektörel geçişte çıkarılır
+        universe, failed = load_universe(target_stocks, days=60)
+        summaries = self.summarize_universe(universe)
+        
         for symbol in target_stocks:
             try:
-                analysis = self.analyze_stock_for_profile(symbol, risk_profile)
+                stock_data = summaries.get(symbol)
+                analysis = self.analyze_stock_for_profile(symbol, risk_profile, stock_data) if stock_data else None
                 if analysis:
                     suitable_stocks.append(analysis)
                 else:
@@ -246,12 +279,13 @@ Lütfen aşağıdaki kurallara uygun olarak yanıt ver:
 """
             
             try:
-                response = gemini_model.generate_content(prompt)
+                advice = llm_gateway.generate(gemini_model, prompt, scope='advice', question=user_message,
+                                              context=(risk_profile, strategy_type, analysis_text))
                 return {
                     'risk_profile': risk_profile,
                     'strategy_type': strategy_type,
                     'suitable_stocks': suitable_stocks,
-                    'advice': response.text.strip(),
+                    'advice': advice.strip(),
                     'success': True
                 }
             except Exception as e:
@@ -0,0 +1,194 @@
+# llm_gateway.py
+# Gemini çağrıları için ortak geçit - aynı prompt (ve isteğe bağlı olarak aynı anlamdaki soru + aynı bağlam)
+# için model tekrar çağrılmaz
+
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Union
+
+from bist_calendar import ISTANBUL_TZ, bist_calendar
+from singleflight import SingleFlight
+
+
+def normalize_question(text: str) -> str:
+    """Küçük harfe çevrilmiş, noktalaması atılmış soru; sözcük sırası ve soru ekleri (mi, mı, mu, mü) korunur
+
+    "KCHOL ne olur?" ile "kchol ne olur" aynı, "KCHOL yükselir mi" ile "KCHOL yükselir" farklıdır.
+    """
+    return ' '.join(re.findall(r"\w+", text.replace('İ', 'i').lower()))
+
+
+def context_fingerprint(context: Any) -> str:
+    """Bağlamın boşluklardan bağımsız özeti (sayılar ve metin olduğu gibi korunur)"""
+    return hashlib.sha256(' '.join(str(context).split()).encode('utf-8')).hexdigest()
+
+
+class LLMGateway:
+    """Prompt özetiyle anahtarlanan yanıt önbelleği + yakın tekrar katmanı
+
+    Tam eşleşme katmanı sha256(model, prompt) ile çalışır. Yakın tekrar katmanı (varsayılan
+    kapalı, LLM_SEMANTIC_CACHE=true ile açılır) soru verilen çağrılarda normalize_question +
+    bağlam özetiyle eşleşir; "KCHOL ne olur?" ile "kchol ne olur" aynı bağlamda aynı yanıtı alır.
+    Prompt bir fonksiyon olarak verilirse yakın tekrar isabetinde hiç oluşturulmaz.
+
+    Yanıtların ömrü piyasa verisine bağlıdır: seans açıkken LLM_CACHE_TTL_OPEN saniye,
+    seans kapalıyken bir sonraki seans açılışına kadar (en çok LLM_CACHE_TTL_MAX).
+    Haber/web içerikli çağrılar ayrıca ttl ile kısaltılabilir. Aynı prompt için eşzamanlı
+    çağrılar tek model çağrısında birleştirilir.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, semantic: Optional[bool] = None):
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('LLM_CACHE_SIZE', 1024))
+        self.semantic = (semantic if semantic is not None
+                         else os.getenv('LLM_SEMANTIC_CACHE', 'false').lower() in ('1', 'true', 'yes'))
+        self.ttl_open = float(os.getenv('LLM_CACHE_TTL_OPEN', 300))
+        self.ttl_max = float(os.getenv('LLM_CACHE_TTL_MAX', 21600))
+        self.news_ttl = float(os.getenv('LLM_CACHE_NEWS_TTL', 900))
+        self._entries = OrderedDict()
+        self._aliases = OrderedDict()
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self._scopes: Dict[str, Dict[str, int]] = {}
+        self._stats = {'requests': 0, 'exact_hits': 0, 'semantic_hits': 0, 'misses': 0, 'expired': 0,
+                       'stored': 0, 'llm_calls': 0, 'llm_errors': 0, 'llm_seconds': 0.0}
+
+    @staticmethod
+    def key(model_name: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model_name}\0{prompt}".encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def semantic_key(model_name: str, scope: str, question: str, context: Any) -> str:
+        return hashlib.sha256(f"{model_name}\0{scope}\0{normalize_question(question)}\0"
+                              f"{context_fingerprint(context)}".encode('utf-8')).hexdigest()
+
+    def expires_at(self, ttl: Optional[float] = None, now: Optional[datetime] = None) -> float:
+        """Seans açıkken kısa ömür, kapalıyken bir sonraki açılışa kadar (ttl verilirse daha kısa olanı)"""
+        now = now or bist_calendar.now()
+        if bist_calendar.is_open(now):
+            expiry = now.timestamp() + self.ttl_open
+        else:
+            today = now.astimezone(ISTANBUL_TZ).date()
+            hours = bist_calendar.session_hours(today)
+            if hours is None or now >= hours[0]:
+                hours = bist_calendar.session_hours(bist_calendar.next_trading_day(today))
+            expiry = min(hours[0].timestamp(), now.timestamp() + self.ttl_max)
+        if ttl is not None:
+            expiry = min(expiry, now.timestamp() + ttl)
+        return expiry
+
+    def _get(self, key: str) -> Optional[str]:
+        """Kilit altında çağrılır"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        text, expiry = entry
+        if expiry <= time.time():
+            del self._entries[key]
+            self._stats['expired'] += 1
+            return None
+        self._entries.move_to_end(key)
+        return text
+
+    def _put(self, key: str, text: str, expiry: float, semantic_key: Optional[str]):
+        with self._lock:
+            self._entries[key] = (text, expiry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            if semantic_key:
+                self._alias(semantic_key, key)
+            self._stats['stored'] += 1
+
+    def _alias(self, semantic_key: str, key: str):
+        """Kilit altında çağrılır"""
+        self._aliases[semantic_key] = key
+        self._aliases.move_to_end(semantic_key)
+        while len(self._aliases) > self.max_entries:
+            self._aliases.popitem(last=False)
+
+    def _count(self, scope: str, outcome: str):
+        """Kilit altında çağrılır"""
+        self._stats[outcome] += 1
+        counts = self._scopes.setdefault(scope, {'requests': 0, 'hits': 0})
+        counts['requests'] += 1
+        if outcome != 'misses':
+            counts['hits'] += 1
+
+    def _call(self, model, prompt: str, key: str, ttl: Optional[float], semantic_key: Optional[str]) -> str:
+        """Modeli çağır ve boş olmayan yanıtı sakla (eşzamanlı aynı çağrılar için yalnızca lider çalıştırır)"""
+        started = time.perf_counter()
+        try:
+            text = model.generate_content(prompt).text
+            if text and text.strip():
+                self._put(key, text, self.expires_at(ttl), semantic_key)
+            return text
+        except Exception:
+            with self._lock:
+                self._stats['llm_errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                self._stats['llm_calls'] += 1
+                self._stats['llm_seconds'] += time.perf_counter() - started
+
+    def generate(self, model, prompt: Union[str, Callable[[], str]], scope: str = 'general',
+                 question: Optional[str] = None, context: Any = None, ttl: Optional[float] = None) -> str:
+        """model.generate_content(prompt).text'in önbellekli karşılığı (hatalar aynen yükseltilir)
+
+        question verilirse yakın tekrar katmanı da kullanılır; bu durumda context, promptun
+        soru dışında dayandığı tüm veriyi (piyasa verisi, doküman parçaları, haberler) içermelidir.
+        """
+        model_name = getattr(model, 'model_name', type(model).__name__)
+        semantic_key = (self.semantic_key(model_name, scope, question, context)
+                        if self.semantic and question else None)
+        with self._lock:
+            self._stats['requests'] += 1
+            if semantic_key:
+                key = self._aliases.get(semantic_key)
+                text = self._get(key) if key else None
+                if text is not None:
+                    self._count(scope, 'semantic_hits')
+                    return text
+
+        if callable(prompt):
+            prompt = prompt()
+        key = self.key(model_name, prompt)
+        with self._lock:
+            text = self._get(key)
+            self._count(scope, 'misses' if text is None else 'exact_hits')
+            if text is not None and semantic_key:
+                self._alias(semantic_key, key)
+        if text is not None:
+            return text
+
+        return self._flight.do(key, self._call, model, prompt, key, ttl, semantic_key)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._aliases.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            hits = self._stats['exact_hits'] + self._stats['semantic_hits']
+            lookups = hits + self._stats['misses']
+            calls = self._stats['llm_calls']
+            avg_latency = self._stats['llm_seconds'] / calls if calls else None
+            return {**self._stats, 'llm_seconds': round(self._stats['llm_seconds'], 3),
+                    'entries': len(self._entries), 'semantic_entries': len(self._aliases),
+                    'max_entries': self.max_entries, 'semantic_enabled': self.semantic,
+                    'hit_rate': round(hits / lookups, 3) if lookups else None,
+                    'avg_llm_latency_s': round(avg_latency, 3) if avg_latency is not None else None,
+                    'saved_seconds_estimate': round(hits * avg_latency, 1) if avg_latency is not None else None,
+                    'coalesced': self._flight.stats()['coalesced'],
+                    'scopes': {scope: {**counts, 'hit_rate': round(counts['hits'] / counts['requests'], 3)}
+                               for scope, counts in self._scopes.items()}}
+
+
+# Süreç genelinde paylaşılan tek örnek
+llm_gateway = LLMGateway()
@@ -0,0 +1,306 @@
+# market_data.py
+# Ortak piyasa verisi servisi - tüm modüllerin OHLCV indirmelerini tek bir önbellekten geçirir
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from bar_store import ADJUSTMENT_TOLERANCE, BarStore, BAR_COLUMNS
+from bist_calendar import BistCalendar, bist_calendar
+from market_providers import MarketDataProvider, get_provider, normalize_ohlcv
+from singleflight import SingleFlight
+
+# yfinance'in sütun sırası (close, high, low, open, volume) - model özellik sırası da bununla aynı
+OHLCV_COLUMNS = BAR_COLUMNS
+
+# Yahoo fiyatları temettü/bölünmeye göre düzeltilmiş verir (auto_adjust) ve bu düzeltme geçmişe uygulanır.
+# Artımlı senkronda son kayıtlı günden bu kadar işlem günü öncesinden indirilir; bu kesinleşmiş barlar
+# depodakilerden ADJUSTMENT_TOLERANCE'tan fazla farklıysa tüm geçmiş yeni tabanla yeniden indirilir
+ADJUSTMENT_CHECK_BARS = int(os.getenv('BAR_STORE_ADJUST_CHECK_BARS', 5))
+
+
+def _to_date(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return pd.Timestamp(value).date()
+
+
+class MarketDataService:
+    """Sembol ve tarih aralığına göre anahtarlanan TTL/LRU OHLCV önbelleği
+
+    Bellek önbelleğinin arkasında disk üzerindeki BarStore durur: BAR_STORE_START
+    sonrasındaki pencereler depodan kesilir, ağdan yalnızca son kayıtlı bardan
+    bugüne kadar olan eksik günler indirilir. BIST takvimi sayesinde seans dışında,
+    son seansın barı kesinleştikten sonra senkronlanmış seriler için ağa hiç çıkılmaz.
+    Temettü/bölünme sonrası düzeltme tabanı değişen semboller (ADJUSTMENT_CHECK_BARS)
+    eski tabanlı geçmişe eklenmez, tüm geçmişleri yeniden indirilir.
+    """
+
+    def __init__(self, ttl_seconds: Optional[int] = None, max_entries: Optional[int] = None,
+                 timeout: int = 30, bar_store: Optional[BarStore] = None,
+                 provider: Optional[MarketDataProvider] = None, calendar: Optional[BistCalendar] = None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else int(os.getenv('MARKET_DATA_CACHE_TTL', 300))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('MARKET_DATA_CACHE_SIZE', 128))
+        self.timeout = timeout
+        self.sync_interval = int(os.getenv('BAR_STORE_SYNC_INTERVAL', 300))
+        self.store_start = _to_date(os.getenv('BAR_STORE_START', '2015-01-01'))
+        self.bar_store = bar_store if bar_store is not None else BarStore()
+        # Barların nereden geldiği (yahoo / replay) MARKET_DATA_PROVIDER ile seçilir
+        self.provider = provider if provider is not None else get_provider()
+        self.calendar = calendar if calendar is not None else bist_calendar
+
+        self._cache = OrderedDict()  # (symbol, start, end) -> (stored_at, df)
+        self._lock = threading.Lock()
+        # Aynı sembol/pencere için eşzamanlı istekler tek indirmeyi paylaşır
+        self._flight = SingleFlight()
+        self._stats = {'hits': 0, 'misses': 0, 'downloads': 0, 'errors': 0, 'evictions': 0,
+                       'store_reads': 0, 'store_syncs': 0, 'rebases': 0}
+
+    def _resolve_range(self, days=None, start=None, end=None):
+        end_date = _to_date(end) if end is not None else date.today()
+        if start is not None:
+            start_date = _to_date(start)
+        else:
+            start_date = end_date - timedelta(days=days if days is not None else 300)
+        return start_date, end_date
+
+    def get_history(self, symbol: str, days: Optional[int] = None, start=None, end=None,
+                    timeout: Optional[int] = None) -> Optional[pd.DataFrame]:
+        """[start, end] aralığındaki günlük OHLCV verisini döndür (her çağrıda bağımsız kopya)"""
+        start_date, end_date = self._resolve_range(days, start, end)
+        key = (symbol.upper(), start_date.isoformat(), end_date.isoformat())
+
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and time.time() - entry[0] < self.ttl_seconds:
+                self._cache.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry[1].copy()
+            self._stats['misses'] += 1
+
+        df = self._flight.do(key, self._fetch, symbol, start_date, end_date, timeout)
+        if df is None:
+            return None
+
+        with self._lock:
+            self._cache[key] = (time.time(), df)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+                self._stats['evictions'] += 1
+        return df.copy()
+
+    def _fetch(self, symbol, start_date, end_date, timeout=None) -> Optional[pd.DataFrame]:
+        if start_date >= self.store_start:
+            return self._get_from_store(symbol, start_date, end_date, timeout)
+        # Deponun kapsamadığı eski tarihler doğrudan indirilir
+        return self._download(symbol, start_date, end_date, timeout)
+
+    def _get_from_store(self, symbol, start_date, end_date, timeout=None) -> Optional[pd.DataFrame]:
+        last_date = self.bar_store.last_date(symbol)
+        if last_date is None or last_date < end_date:
+            # Farklı pencereler aynı sembolün depo güncellemesini paylaşır
+            self._flight.do(('sync', symbol.upper()), self.sync, symbol, timeout)
+        with self._lock:
+            self._stats['store_reads'] += 1
+        return self.bar_store.get_range(symbol, start_date, end_date)
+
+    def _is_fresh(self, synced_at: Optional[float]) -> bool:
+        """Yakın zamanda senkronlandı mı ya da son seanstan beri yeni bar oluşması imkansız mı"""
+        if not synced_at:
+            return False
+        return time.time() - synced_at < self.sync_interval or self.calendar.is_series_current(synced_at)
+
+    def _sync_start(self, last_date: date) -> date:
+        """Artımlı indirme başlangıcı: son kayıtlı günden ADJUSTMENT_CHECK_BARS işlem günü öncesi"""
+        start = last_date
+        for _ in range(ADJUSTMENT_CHECK_BARS):
+            start = self.calendar.previous_trading_day(start)
+        return max(start, self.store_start)
+
+    def _basis_changed(self, symbol: str, df: pd.DataFrame, last_date: date) -> bool:
+        """İndirilen barlar depodaki kesinleşmiş barlardan (last_date öncesi) farklı mı"""
+        stored = self.bar_store.get_range(symbol, df.index[0].date(), last_date - timedelta(days=1))
+        if stored is None:
+            return False
+        common = stored.index.intersection(df.index)
+        if len(common) == 0:
+            return False
+        columns = ['open', 'high', 'low', 'close']
+        return not np.allclose(stored.loc[common, columns].to_numpy(dtype='f8'),
+                               df.loc[common, columns].to_numpy(dtype='f8'),
+                               rtol=ADJUSTMENT_TOLERANCE, atol=0, equal_nan=True)
+
+    def _store_synced(self, downloaded: Dict[str, pd.DataFrame], last_dates: Dict[str, date],
+                      timeout: Optional[int] = None) -> int:
+        """İndirilen barları depoya ekle; düzeltme tabanı değişmiş sembollerin tüm geçmişi yeniden indirilir
+
+        Tam geçmişi indirilemeyen sembol eski tabanıyla kalır ve senkronlanmış sayılmaz
+        (bir sonraki senkronda yeniden denenir). Dönüş: güncellenen sembol sayısı.
+        """
+        rebase = [symbol for symbol, df in downloaded.items()
+                  if last_dates.get(symbol) and self._basis_changed(symbol, df, last_dates[symbol])]
+        for symbol, df in downloaded.items():
+            if symbol not in rebase:
+                self.bar_store.merge(symbol, df)
+                self.bar_store.mark_synced(symbol)
+
+        rebased = {}
+        if rebase:
+            print(f"Fiyat düzeltmesi (temettü/bölünme) algılandı, tüm geçmiş yeniden indiriliyor: {rebase}")
+            rebased = self._download_many(rebase, self.store_start, date.today(), timeout)
+            for symbol, df in rebased.items():
+                self.bar_store.replace(symbol, df)
+                self.bar_store.mark_synced(symbol)
+                self.invalidate(symbol)
+        with self._lock:
+            self._stats['store_syncs'] += len(downloaded) - len(rebase) + len(rebased)
+            self._stats['rebases'] += len(rebased)
+        return len(downloaded) - len(rebase) + len(rebased)
+
+    def sync(self, symbol: str, timeout: Optional[int] = None) -> bool:
+        """Depodaki son bardan bugüne kadar eksik günleri indirip depoya ekle"""
+        if self._is_fresh(self.bar_store.synced_at(symbol)):
+            return True
+
+        last_date = self.bar_store.last_date(symbol)
+        # Son kayıtlı gün de yeniden indirilir (gün içinde kaydedilmiş kısmi bar güncellenir); ondan önceki
+        # birkaç kesinleşmiş bar da düzeltme tabanı kontrolü için indirilir
+        fetch_start = self._sync_start(last_date) if last_date else self.store_start
+        df = self._download(symbol, fetch_start, date.today(), timeout)
+        if df is None:
+            return last_date is not None
+
+        self._store_synced({symbol: df}, {symbol: last_date} if last_date else {}, timeout)
+        return True
+
+    def get_histories(self, symbols: List[str], days: Optional[int] = None, start=None, end=None,
+                      timeout: Optional[int] = None) -> Tuple[Dict[str, pd.DataFrame], List[str]]:
+        """Birden fazla sembolün geçmişini tek toplu istekle al
+
+        Önbellekte ya da güncel depoda olan semboller ağa çıkmaz; kalanlar tek bir
+        gruplanmış sağlayıcı isteği ile indirilip sembol başına ayrılır.
+        Dönüş: ({sembol: DataFrame}, veri alınamayan semboller)
+        """
+        start_date, end_date = self._resolve_range(days, start, end)
+        frames = {}
+        pending = []
+
+        with self._lock:
+            for symbol in dict.fromkeys(symbols):
+                entry = self._cache.get((symbol.upper(), start_date.isoformat(), end_date.isoformat()))
+                if entry is not None and time.time() - entry[0] < self.ttl_seconds:
+                    self._stats['hits'] += 1
+                    frames[symbol] = entry[1].copy()
+                else:
+                    self._stats['misses'] += 1
+                    pending.append(symbol)
+
+        if pending and start_date >= self.store_start:
+            self.sync_many(pending, end_date, timeout)
+            for symbol in pending:
+                df = self.bar_store.get_range(symbol, start_date, end_date)
+                if df is not None:
+                    frames[symbol] = df
+        elif pending:
+            frames.update(self._download_many(pending, start_date, end_date, timeout))
+
+        with self._lock:
+            for symbol in pending:
+                if symbol in frames:
+                    self._cache[(symbol.upper(), start_date.isoformat(), end_date.isoformat())] = (time.time(), frames[symbol])
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+                self._stats['evictions'] += 1
+
+        failed = [symbol for symbol in dict.fromkeys(symbols) if symbol not in frames]
+        if failed:
+            print(f"Veri alınamayan semboller: {failed}")
+        return {symbol: df.copy() for symbol, df in frames.items()}, failed
+
+    def sync_many(self, symbols: List[str], end_date: Optional[date] = None, timeout: Optional[int] = None):
+        """Depodaki sembolleri toplu güncelle: hiç kaydı olmayanlar ve yalnızca kuyruğu eksik olanlar ayrı gruplanır"""
+        end_date = end_date or date.today()
+        backfill, tails = [], {}
+        for symbol in symbols:
+            last_date = self.bar_store.last_date(symbol)
+            if last_date is not None and (last_date >= end_date or self._is_fresh(self.bar_store.synced_at(symbol))):
+                continue
+            if last_date is None:
+                backfill.append(symbol)
+            else:
+                tails[symbol] = last_date
+
+        groups = []
+        if backfill:
+            groups.append((backfill, self.store_start))
+        if tails:
+            groups.append((list(tails), self._sync_start(min(tails.values()))))
+
+        for group, fetch_start in groups:
+            downloaded = self._download_many(group, fetch_start, date.today(), timeout)
+            self._store_synced(downloaded, tails, timeout)
+
+    def _download_many(self, symbols: List[str], start_date, end_date, timeout=None) -> Dict[str, pd.DataFrame]:
+        if len(symbols) == 1:
+            df = self._download(symbols[0], start_date, end_date, timeout)
+            return {symbols[0]: df} if df is not None else {}
+        try:
+            with self._lock:
+                self._stats['downloads'] += 1
+            print(f"Toplu piyasa verisi indiriliyor: {len(symbols)} sembol - {start_date} to {end_date}")
+            return self.provider.get_bars(symbols, start_date, end_date, timeout=timeout or self.timeout)
+        except Exception as e:
+            with self._lock:
+                self._stats['errors'] += 1
+            print(f"Toplu piyasa verisi indirme hatası: {e}")
+            return {}
+
+    def _download(self, symbol, start_date, end_date, timeout=None) -> Optional[pd.DataFrame]:
+        try:
+            with self._lock:
+                self._stats['downloads'] += 1
+            print(f"Piyasa verisi indiriliyor: {symbol} - {start_date} to {end_date}")
+            frames = self.provider.get_bars([symbol], start_date, end_date, timeout=timeout or self.timeout)
+            return frames.get(symbol)
+        except Exception as e:
+            with self._lock:
+                self._stats['errors'] += 1
+            print(f"Piyasa verisi indirme hatası ({symbol}): {e}")
+            return None
+
+    def invalidate(self, symbol: Optional[str] = None):
+        """Önbelleği tamamen ya da tek sembol için temizle"""
+        with self._lock:
+            if symbol is None:
+                self._cache.clear()
+                return
+            for key in [k for k in self._cache if k[0] == symbol.upper()]:
+                del self._cache[key]
+
+    def stats(self) -> Dict:
+        """Önbellek isabet/ıska sayaçları"""
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                **self._stats,
+                'entries': len(self._cache),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hit_rate': round(self._stats['hits'] / lookups, 4) if lookups else 0.0,
+                'provider': self.provider.name,
+                'market_open': self.calendar.is_open(),
+                'single_flight': self._flight.stats()
+            }
+
+
+# Süreç genelinde paylaşılan tek örnek
+market_data_service = MarketDataService()
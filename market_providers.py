@@ -0,0 +1,302 @@
+# market_providers.py
+# Piyasa verisi sağlayıcıları - canlı Yahoo/truncgil kaynakları ve kayıtlı fixture'lardan çalışan replay
+
+import json
+import os
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+import requests
+import yfinance as yf
+
+from bar_store import BAR_COLUMNS
+
+YAHOO_CHART_URL = "https://query1.finance.yahoo.com/v8/finance/chart/{ticker}"
+TRUNCGIL_URL = "https://finans.truncgil.com/today.json"
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+
+def normalize_ohlcv(df: pd.DataFrame) -> Optional[pd.DataFrame]:
+    """yfinance çıktısını küçük harfli tek seviyeli OHLCV tablosuna çevir"""
+    if df is None or df.empty:
+        return None
+
+    df = df.copy()
+    # Yeni yfinance sürümleri tek hisse için de MultiIndex (Price, Ticker) döndürüyor
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = [col[0] for col in df.columns]
+    df.columns = [str(col).lower() for col in df.columns]
+
+    missing = [col for col in BAR_COLUMNS if col not in df.columns]
+    if missing:
+        print(f"Eksik OHLCV sütunları: {missing}")
+        return None
+
+    df = df[BAR_COLUMNS].dropna(subset=['close'])
+    if df.empty:
+        return None
+    if getattr(df.index, 'tz', None) is not None:
+        df.index = df.index.tz_localize(None)
+    return df
+
+
+class MarketDataProvider:
+    """Tüm piyasa verisi kaynaklarının uyması gereken arayüz
+
+    get_bars: [start, end] (dahil) aralığındaki günlük barlar, {sembol: DataFrame}
+    get_quote: anlık fiyat (bulunamazsa None)
+    get_info: şirket/hisse künye bilgileri (piyasa değeri, F/K, 52 hafta aralığı ...)
+    """
+
+    name = 'base'
+
+    def get_bars(self, symbols: List[str], start: date, end: date,
+                 timeout: Optional[int] = None) -> Dict[str, pd.DataFrame]:
+        raise NotImplementedError
+
+    def get_quote(self, symbol: str, timeout: Optional[int] = None) -> Optional[float]:
+        raise NotImplementedError
+
+    def get_info(self, symbol: str) -> Dict:
+        raise NotImplementedError
+
+
+class YahooProvider(MarketDataProvider):
+    """Canlı kaynaklar: yfinance (barlar, künye), Yahoo chart endpoint ve finans.truncgil (fiyat)"""
+
+    name = 'yahoo'
+
+    def get_bars(self, symbols, start, end, timeout=None):
+        # yfinance'te bitiş tarihi hariç tutulur, bitiş gününü de kapsamak için bir gün ekle
+        end_exclusive = end + timedelta(days=1)
+        if len(symbols) == 1:
+            df = normalize_ohlcv(yf.download(symbols[0], start=start, end=end_exclusive,
+                                             progress=False, timeout=timeout))
+            return {symbols[0]: df} if df is not None else {}
+
+        raw = yf.download(symbols, start=start, end=end_exclusive, group_by='ticker',
+                          progress=False, timeout=timeout)
+        frames = {}
+        if raw is None or raw.empty or not isinstance(raw.columns, pd.MultiIndex):
+            return frames
+        tickers = set(raw.columns.get_level_values(0))
+        for symbol in symbols:
+            if symbol not in tickers:
+                continue
+            df = normalize_ohlcv(raw[symbol])
+            if df is not None:
+                frames[symbol] = df
+        return frames
+
+    def get_quote(self, symbol, timeout=None):
+        ticker = symbol if symbol.endswith('.IS') else f"{symbol}.IS"
+        price = self._yahoo_chart_quote(ticker, timeout or 15)
+        if price:
+            return price
+
+        # Yahoo Finance başarısız olursa Türk hisseleri için finans.truncgil denenir
+        print(f"🔄 {symbol} için alternatif API deneniyor...")
+        return self._truncgil_quote(symbol, timeout or 10)
+
+    def _yahoo_chart_quote(self, ticker, timeout):
+        response = requests.get(YAHOO_CHART_URL.format(ticker=ticker),
+                                headers={'User-Agent': USER_AGENT}, timeout=timeout)
+        if response.status_code != 200:
+            return None
+
+        data = response.json()
+        if not ('chart' in data and 'result' in data['chart'] and data['chart']['result']):
+            return None
+        result = data['chart']['result'][0]
+
+        price = result.get('meta', {}).get('regularMarketPrice')
+        if price and price > 0:
+            print(f" {ticker} Yahoo fiyatı: {price} TL")
+            return price
+
+        # Alternatif fiyat kaynağı: son kapanış
+        quote = result.get('indicators', {}).get('quote', [{}])[0]
+        if quote.get('close'):
+            price = quote['close'][-1]
+            if price and price > 0:
+                print(f" {ticker} Yahoo alternatif fiyatı: {price} TL")
+                return price
+        return None
+
+    def _truncgil_quote(self, symbol, timeout):
+        try:
+            response = requests.get(TRUNCGIL_URL, timeout=timeout)
+            if response.status_code != 200:
+                return None
+
+            data = response.json()
+            clean_symbol = symbol.replace('.IS', '').upper()
+            if clean_symbol not in data:
+                return None
+
+            price_str = data[clean_symbol].get('Alış', '0')
+            price = float(price_str.replace(',', '').replace('₺', '').replace('TL', '').strip())
+            if price > 0:
+                print(f" {symbol} Finans API fiyatı: {price} TL")
+                return price
+        except Exception as e:
+            print(f" Finans API hatası ({symbol}): {e}")
+        return None
+
+    def get_info(self, symbol):
+        return yf.Ticker(symbol).info or {}
+
+
+class ReplayProvider(MarketDataProvider):
+    """Kayıtlı fixture dosyalarından ağsız ve deterministik veri sunar
+
+    Dizin yapısı:
+        bars/<SEMBOL>.csv   date,close,high,low,open,volume
+        quotes.json         {"KCHOL.IS": 185.4, ...}
+        info/<SEMBOL>.json  yf.Ticker(...).info kaydı
+
+    Her çağrı sabit bir gecikme (latency_ms) kadar bekletilir; böylece yük testlerinde
+    ağ maliyeti tekrarlanabilir şekilde taklit edilir. shift_to_today açıkken barlar
+    tam hafta adımlarıyla bugüne kaydırılır (haftanın günleri korunur), böylece eski
+    kayıtlar "son N gün" pencerelerini doldurmaya devam eder.
+    """
+
+    name = 'replay'
+
+    def __init__(self, root: Optional[str] = None, latency_ms: Optional[float] = None,
+                 shift_to_today: Optional[bool] = None):
+        self.root = Path(root or os.getenv('MARKET_DATA_FIXTURES', 'data/fixtures'))
+        self.latency = (latency_ms if latency_ms is not None
+                        else float(os.getenv('MARKET_DATA_REPLAY_LATENCY_MS', 0))) / 1000.0
+        if shift_to_today is None:
+            shift_to_today = os.getenv('MARKET_DATA_REPLAY_SHIFT', 'true').lower() == 'true'
+        self.shift_to_today = shift_to_today
+
+        self._lock = threading.Lock()
+        self._bars: Dict[str, Optional[pd.DataFrame]] = {}
+        self._quotes: Optional[Dict] = None
+
+    def _wait(self):
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def _load_bars(self, symbol: str) -> Optional[pd.DataFrame]:
+        key = symbol.upper()
+        with self._lock:
+            if key in self._bars:
+                return self._bars[key]
+
+        path = self.root / 'bars' / f"{key}.csv"
+        df = None
+        if path.exists():
+            df = pd.read_csv(path, index_col='date', parse_dates=True)[BAR_COLUMNS].sort_index()
+            if self.shift_to_today and not df.empty:
+                weeks = (date.today() - df.index[-1].date()).days // 7
+                df.index = df.index + pd.Timedelta(weeks=weeks)
+
+        with self._lock:
+            self._bars[key] = df
+        return df
+
+    def get_bars(self, symbols, start, end, timeout=None):
+        self._wait()
+        frames = {}
+        for symbol in symbols:
+            df = self._load_bars(symbol)
+            if df is None:
+                continue
+            df = df.loc[pd.Timestamp(start):pd.Timestamp(end)]
+            if not df.empty:
+                frames[symbol] = df.copy()
+        return frames
+
+    def get_quote(self, symbol, timeout=None):
+        self._wait()
+        with self._lock:
+            if self._quotes is None:
+                path = self.root / 'quotes.json'
+                self._quotes = json.loads(path.read_text(encoding='utf-8')) if path.exists() else {}
+            quotes = self._quotes
+
+        ticker = symbol if symbol.endswith('.IS') else f"{symbol}.IS"
+        for key in (symbol, ticker, symbol.replace('.IS', '')):
+            if key in quotes:
+                return float(quotes[key])
+
+        # Kayıtlı fiyat yoksa son kapanış kullanılır
+        df = self._load_bars(ticker)
+        return float(df['close'].iloc[-1]) if df is not None and not df.empty else None
+
+    def get_info(self, symbol):
+        self._wait()
+        path = self.root / 'info' / f"{symbol.upper()}.json"
+        if not path.exists():
+            return {}
+        return json.loads(path.read_text(encoding='utf-8'))
+
+
+def record_fixtures(symbols: List[str], start: date, end: Optional[date] = None,
+                    root: Optional[str] = None, provider: Optional[MarketDataProvider] = None):
+    """Canlı sağlayıcıdan bar/fiyat/künye verisini ReplayProvider'ın okuyacağı dizine kaydet"""
+    provider = provider or YahooProvider()
+    root = Path(root or os.getenv('MARKET_DATA_FIXTURES', 'data/fixtures'))
+    (root / 'bars').mkdir(parents=True, exist_ok=True)
+    (root / 'info').mkdir(parents=True, exist_ok=True)
+
+    frames = provider.get_bars(symbols, start, end or date.today(), timeout=30)
+    for symbol, df in frames.items():
+        df.rename_axis('date').to_csv(root / 'bars' / f"{symbol.upper()}.csv")
+
+    quotes_path = root / 'quotes.json'
+    quotes = json.loads(quotes_path.read_text(encoding='utf-8')) if quotes_path.exists() else {}
+    for symbol in symbols:
+        try:
+            price = provider.get_quote(symbol)
+            if price:
+                quotes[symbol] = price
+            info = provider.get_info(symbol)
+            if info:
+                (root / 'info' / f"{symbol.upper()}.json").write_text(
+                    json.dumps(info, indent=2, ensure_ascii=False, default=str), encoding='utf-8')
+        except Exception as e:
+            print(f"Fixture kaydı hatası ({symbol}): {e}")
+    quotes_path.write_text(json.dumps(quotes, indent=2), encoding='utf-8')
+
+    print(f"{len(frames)}/{len(symbols)} sembol için fixture kaydedildi: {root}")
+    return sorted(frames)
+
+
+PROVIDERS = {
+    YahooProvider.name: YahooProvider,
+    ReplayProvider.name: ReplayProvider,
+}
+
+_default_provider: Optional[MarketDataProvider] = None
+_default_lock = threading.Lock()
+
+
+def get_provider(name: Optional[str] = None) -> MarketDataProvider:
+    """MARKET_DATA_PROVIDER ile seçilen sağlayıcıyı döndür (süreç genelinde tek örnek)"""
+    global _default_provider
+    if name is not None:
+        return PROVIDERS[name]()
+    with _default_lock:
+        if _default_provider is None:
+            name = os.getenv('MARKET_DATA_PROVIDER', YahooProvider.name).lower()
+            if name not in PROVIDERS:
+                print(f"Bilinmeyen piyasa verisi sağlayıcısı '{name}', yahoo kullanılıyor")
+                name = YahooProvider.name
+            _default_provider = PROVIDERS[name]()
+            print(f"Piyasa verisi sağlayıcısı: {name}")
+        return _default_provider
+
+
+if __name__ == "__main__":
+    # Kullanım: python market_providers.py KCHOL.IS THYAO.IS GARAN.IS
+    record_symbols = sys.argv[1:] or ['KCHOL.IS']
+    record_fixtures(record_symbols, start=date.today() - timedelta(days=3 * 365))
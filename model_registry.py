@@ -0,0 +1,161 @@
+# model_registry.py
+# Tahmin modelleri kaydı - modeller açılışta bir kez yüklenir, ısındırılır ve dosya değişince atomik olarak yenilenir
+
+import hashlib
+import os
+import pickle
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+
+class LoadedModel:
+    """Yüklenmiş bir modelin kendisi ve künyesi (sürüm, özellikler, dosya imzası)"""
+
+    def __init__(self, name: str, path: str, model, features: List[str], version: str,
+                 signature, warmup_ms: float):
+        self.name = name
+        self.path = path
+        self.model = model
+        self.features = list(features)
+        self.version = version
+        self.signature = signature
+        self.warmup_ms = warmup_ms
+        self.loaded_at = time.time()
+
+    def info(self) -> Dict:
+        return {
+            'name': self.name,
+            'path': self.path,
+            'version': self.version,
+            'features': self.features,
+            'loaded_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.loaded_at)),
+            'warmup_ms': round(self.warmup_ms, 2)
+        }
+
+
+def _file_signature(path: str):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class ModelRegistry:
+    """İsimle kaydedilen modelleri bellekte tutar; istek yolunda disk erişimi yoktur
+
+    Her model kayıt anında yüklenir ve tek bir ısınma tahmini yapılır. Arka plandaki
+    izleyici MODEL_RELOAD_INTERVAL saniyede bir dosya imzasına (mtime, boyut) bakar;
+    değişen dosya yeni bir nesne olarak yüklenip ısındırıldıktan sonra tek atamayla
+    eskisinin yerine geçer. Yükleme başarısız olursa (ör. yarım yazılmış dosya) eski
+    model hizmet vermeye devam eder ve dosya yeniden değişene kadar tekrar denenmez.
+    """
+
+    def __init__(self, reload_interval: Optional[float] = None):
+        self.reload_interval = (reload_interval if reload_interval is not None
+                                else float(os.getenv('MODEL_RELOAD_INTERVAL', 5)))
+        self._models: Dict[str, LoadedModel] = {}
+        self._failed_signatures: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self._stats = {'loads': 0, 'reloads': 0, 'load_errors': 0}
+
+    def _load(self, name: str, path: str, features: List[str]) -> LoadedModel:
+        signature = _file_signature(path)
+        with open(path, 'rb') as f:
+            payload = f.read()
+        model = pickle.loads(payload)
+
+        # İlk tahmindeki tembel başlatma maliyeti (ör. xgboost booster hazırlığı) isteğe yansımasın
+        started = time.perf_counter()
+        model.predict(np.zeros((1, len(features))))
+        warmup_ms = (time.perf_counter() - started) * 1000
+
+        version = hashlib.sha256(payload).hexdigest()[:12]
+        return LoadedModel(name, path, model, features, version, signature, warmup_ms)
+
+    def register(self, name: str, path: str, features: List[str]) -> Optional[LoadedModel]:
+        """Modeli yükleyip ısındır ve kaydet; yüklenemezse None döner, izleyici dosyayı beklemeye devam eder"""
+        try:
+            entry = self._load(name, path, features)
+            print(f"Model yüklendi: {name} (sürüm {entry.version}, ısınma {entry.warmup_ms:.1f} ms)")
+        except Exception as e:
+            print(f"Model yüklenirken hata ({name}): {e}")
+            entry = LoadedModel(name, path, None, features, None, None, 0.0)
+            with self._lock:
+                self._stats['load_errors'] += 1
+
+        with self._lock:
+            self._models[name] = entry
+            if entry.model is not None:
+                self._stats['loads'] += 1
+        self._start_watcher()
+        return entry if entry.model is not None else None
+
+    def get(self, name: str):
+        """Kayıtlı modelin güncel nesnesi (yoksa None)"""
+        entry = self._models.get(name)
+        return entry.model if entry is not None else None
+
+    def entry(self, name: str) -> Optional[LoadedModel]:
+        return self._models.get(name)
+
+    def info(self, name: str) -> Optional[Dict]:
+        entry = self._models.get(name)
+        if entry is None or entry.model is None:
+            return None
+        return entry.info()
+
+    def reload(self, name: str, force: bool = False) -> bool:
+        """Dosya değiştiyse (ya da force) modeli yeniden yükle; başarılı değişimde True döner"""
+        current = self._models.get(name)
+        if current is None:
+            return False
+        try:
+            signature = _file_signature(current.path)
+        except OSError:
+            return False
+        if not force and (signature == current.signature or signature == self._failed_signatures.get(name)):
+            return False
+
+        try:
+            entry = self._load(name, current.path, current.features)
+        except Exception as e:
+            print(f"Model yeniden yüklenemedi ({name}), önceki sürüm kullanılmaya devam ediyor: {e}")
+            with self._lock:
+                self._failed_signatures[name] = signature
+                self._stats['load_errors'] += 1
+            return False
+
+        with self._lock:
+            # Okuyucular ya eski ya yeni nesneyi görür, yarım yüklenmiş bir modeli asla görmez
+            self._models[name] = entry
+            self._failed_signatures.pop(name, None)
+            self._stats['reloads'] += 1
+        print(f"Model yenilendi: {name} {current.version} -> {entry.version}")
+        return True
+
+    def _watch(self):
+        while True:
+            time.sleep(self.reload_interval)
+            for name in list(self._models):
+                try:
+                    self.reload(name)
+                except Exception as e:
+                    print(f"Model izleyici hatası ({name}): {e}")
+
+    def _start_watcher(self):
+        with self._lock:
+            if self._watcher is not None or self.reload_interval <= 0:
+                return
+            self._watcher = threading.Thread(target=self._watch, name='model-registry-watcher', daemon=True)
+            self._watcher.start()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self._stats,
+                    'models': {name: entry.info() for name, entry in self._models.items() if entry.model is not None}}
+
+
+# Süreç genelinde paylaşılan tek örnek
+model_registry = ModelRegistry()
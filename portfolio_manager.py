@@ -1,12 +1,14 @@
 import json
 import os
 from datetime import datetime, timedelta
-import requests
 from typing import Dict, List, Optional
 
+from market_providers import MarketDataProvider, get_provider
+
 class PortfolioManager:
-    def __init__(self, portfolio_file="user_portfolios.json"):
+    def __init__(self, portfolio_file="user_portfolios.json", provider: Optional[MarketDataProvider] = None):
         self.portfolio_file = portfolio_file
+        self.provider = provider or get_provider()
         self.portfolios = self.load_portfolios()
     
     def load_portfolios(self) -> Dict:
@@ -95,70 +97,13 @@ class PortfolioManager:
         
         for symbol in symbols:
             try:
-                # Önce Yahoo Finance API'yi dene
-                if symbol.endswith('.IS'):
-                    ticker = symbol
-                else:
-                    ticker = f"{symbol}.IS"
-                
-                print(f"🔍 {symbol} için fiyat aranıyor: {ticker}")
-                
-                # Yahoo Finance API
-                url = f"https://query1.finance.yahoo.com/v8/finance/chart/{ticker}"
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-                }
+                print(f"🔍 {symbol} için fiyat aranıyor")
                 
-                response = requests.get(url, headers=headers, timeout=15)
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    
-                    if 'chart' in data and 'result' in data['chart'] and data['chart']['result']:
-                        result = data['chart']['result'][0]
-                        
-                        if 'meta' in result and 'regularMarketPrice' in result['meta']:
-                            price = result['meta']['regularMarketPrice']
-                            if price and price > 0:
-                                prices[symbol] = price
-                                print(f" {symbol} Yahoo fiyatı: {price} TL")
-                                continue
-                        
-                        # Alternatif fiyat kaynakları
-                        if 'indicators' in result and 'quote' in result['indicators']:
-                            quote = result['indicators']['quote'][0]
-                            if 'close' in quote and quote['close']:
-                                price = quote['close'][-1]
-                                if price and price > 0:
-                                    prices[symbol] = price
-                                    print(f" {symbol} Yahoo alternatif fiyatı: {price} TL")
-                                    continue
-                
-                # Yahoo Finance başarısız olursa, alternatif API'leri dene
-                print(f"🔄 {symbol} için alternatif API deneniyor...")
-                
-                # Finans API (Türk hisseleri için)
-                try:
-                    finans_url = f"https://finans.truncgil.com/today.json"
-                    finans_response = requests.get(finans_url, timeout=10)
-                    
-                    if finans_response.status_code == 200:
-                        finans_data = finans_response.json()
-                        
-                        # Symbol'ü temizle
-                        clean_symbol = symbol.replace('.IS', '').upper()
-                        
-                        if clean_symbol in finans_data:
-                            price_str = finans_data[clean_symbol].get('Alış', '0')
-                            # Fiyat string'ini temizle
-                            price = float(price_str.replace(',', '').replace('₺', '').replace('TL', '').strip())
-                            
-                            if price > 0:
-                                prices[symbol] = price
-                                print(f" {symbol} Finans API fiyatı: {price} TL")
-                                continue
-                except Exception as e:
-                    print(f" Finans API hatası ({symbol}): {e}")
+                # Yahoo chart endpoint -> finans.truncgil (ya da replay fixture'ları)
+                price = self.provider.get_quote(symbol)
+                if price and price > 0:
+                    prices[symbol] = price
+                    continue
                 
                 # Tüm API'ler başarısız olursa, varsayılan fiyat kullan
                 if symbol not in prices:
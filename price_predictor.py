@@ -0,0 +1,473 @@
+# price_predictor.py
+# Toplu fiyat tahmini - tüm izleme listesi için özellik matrisi tek seferde kurulur ve model bir kez çağrılır
+
+import copy
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from bist_calendar import bist_calendar
+from model_registry import LoadedModel, model_registry
+from universe import WATCHLIST, Universe, load_universe
+
+# Modelin eğitimde gördüğü özellik sırası (BB_WIDTH = finta BBWIDTH, WILLIAMS = finta WILLIAMS)
+MODEL_FEATURES = ['close', 'high', 'low', 'open', 'volume', 'SMA200', 'RSI', 'ATR', 'BB_WIDTH', 'WILLIAMS']
+
+# Fiyat tahmin modeli açılışta bir kez yüklenip ısındırılır; dosya değişirse arka planda yenilenir
+PRICE_MODEL = 'kchol_price'
+# Fiyat modelinin eğitildiği sembol
+PRICE_SYMBOL = 'KCHOL.IS'
+MODEL_PATH = os.getenv('MODEL_PATH', 'model/kchol_xgb_model.pkl')
+model_registry.register(PRICE_MODEL, MODEL_PATH, MODEL_FEATURES)
+
+# Tahmin ufukları (işlem günü); her ufkun kendi modeli vardır, 1 günlük model yukarıdaki fiyat modelidir
+HORIZONS = [1, 5, 20]
+
+
+def horizon_model_name(horizon: int) -> str:
+    return PRICE_MODEL if horizon == 1 else f"{PRICE_MODEL}_{horizon}d"
+
+
+def horizon_model_path(horizon: int) -> str:
+    """model/kchol_xgb_model.pkl -> model/kchol_xgb_model_5d.pkl"""
+    if horizon == 1:
+        return MODEL_PATH
+    root, ext = os.path.splitext(MODEL_PATH)
+    return f"{root}_{horizon}d{ext}"
+
+
+# Dosyası henüz olmayan ufuk modelleri de kaydedilir; retrain.py yayınladığında izleyici yükler
+for _horizon in HORIZONS[1:]:
+    model_registry.register(horizon_model_name(_horizon), horizon_model_path(_horizon), MODEL_FEATURES)
+
+# retrain.py'nin diğer semboller için yayına aldığı modeller (<dizin>/<SEMBOL>/xgb_<h>d.pkl)
+SYMBOL_MODELS_DIR = os.getenv('SYMBOL_MODELS_DIR', 'model/symbols')
+
+
+def symbol_model_name(symbol: str, horizon: int = 1) -> str:
+    symbol = symbol.upper()
+    return horizon_model_name(horizon) if symbol == PRICE_SYMBOL else f"price_{symbol}_{horizon}d"
+
+
+def symbol_model_path(symbol: str, horizon: int = 1) -> str:
+    symbol = symbol.upper()
+    if symbol == PRICE_SYMBOL:
+        return horizon_model_path(horizon)
+    return os.path.join(SYMBOL_MODELS_DIR, symbol, f"xgb_{horizon}d.pkl")
+
+
+def symbol_model(symbol: str, horizon: int = 1) -> Optional[LoadedModel]:
+    """Sembolün kendi verisiyle eğitilmiş model (yoksa None)
+
+    Diğer sembollerin modelleri dosyası ilk kez görüldüğünde kaydedilir; sonraki
+    sürümleri model kaydının izleyicisi yükler.
+    """
+    name = symbol_model_name(symbol, horizon)
+    entry = model_registry.entry(name)
+    if entry is None:
+        path = symbol_model_path(symbol, horizon)
+        if not os.path.exists(path):
+            return None
+        model_registry.register(name, path, MODEL_FEATURES)
+        entry = model_registry.entry(name)
+    return entry if entry is not None and entry.model is not None else None
+
+
+def prediction_model(symbol: str, horizon: int = 1) -> Tuple[Optional[LoadedModel], Optional[str]]:
+    """(model, modelin eğitildiği sembol): sembolün kendi modeli, yoksa PRICE_SYMBOL'ün modeli"""
+    entry = symbol_model(symbol, horizon)
+    if entry is not None:
+        return entry, symbol.upper()
+    entry = symbol_model(PRICE_SYMBOL, horizon)
+    return (entry, PRICE_SYMBOL) if entry is not None else (None, None)
+
+
+def _model_groups(symbols, horizon: int = 1,
+                  model=None) -> List[Tuple[object, Optional[str], Optional[str], List[str]]]:
+    """Sembolleri tahmin edecek modele göre grupla: [(model, sürüm, modelin sembolü, semboller)]
+
+    Her model bir kez çağrılır; modeli olmayan semboller hiçbir gruba girmez. Model
+    açıkça verilirse tüm semboller onunla (sürüm ve eğitim sembolü bilinmeden) tahmin edilir.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    if model is not None:
+        return [(model, None, None, symbols)]
+    groups = {}
+    for symbol in symbols:
+        entry, model_symbol = prediction_model(symbol, horizon)
+        if entry is not None:
+            groups.setdefault(entry.name, (entry.model, entry.version, model_symbol, []))[3].append(symbol)
+    return list(groups.values())
+
+
+PREDICTIONS_DIR = os.getenv('PREDICTIONS_DIR', 'data/predictions')
+
+# Açıklama metinlerinde kullanılan özellik adları
+FEATURE_LABELS = {
+    'close': 'Kapanış fiyatı',
+    'high': 'Gün içi en yüksek',
+    'low': 'Gün içi en düşük',
+    'open': 'Açılış fiyatı',
+    'volume': 'İşlem hacmi',
+    'SMA200': '200 günlük ortalama',
+    'RSI': 'RSI',
+    'ATR': 'ATR',
+    'BB_WIDTH': 'Bollinger bant genişliği',
+    'WILLIAMS': 'Williams %R',
+}
+
+# cross_symbol_model: satırın sembolünün kendi modeli yok, başka sembolün (model_symbol) modeliyle tahmin edildi
+RESULT_COLUMNS = ['symbol', 'date', 'current_price', 'predicted_price', 'change', 'change_percent',
+                  'prediction_date', 'model_symbol', 'model_version', 'cross_symbol_model']
+
+
+class PredictionCache:
+    """(model sürümü, sembol, son bar zamanı, özellik özeti) anahtarlı tahmin sonucu önbelleği
+
+    Aynı son bar için modelin çıktısı gün içinde değişmez. Yeni bar geldiğinde bar
+    zamanı ve özellikler, model yenilendiğinde sürüm değiştiği için eski kayıtlar
+    kendiliğinden kullanılmaz olur ve LRU ile düşer. Sürümler sembole ve ufuk kümesine
+    göre farklı olabildiğinden (sembol başına modeller, forecast_cache) başka sürümlü
+    bir anahtar geldiğinde önbellek temizlenmez.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('PREDICTION_CACHE_SIZE', 512))
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    @staticmethod
+    def key(version: str, symbol: str, bar_time, features: np.ndarray):
+        digest = hashlib.sha1(np.ascontiguousarray(features, dtype='f8').tobytes()).hexdigest()
+        return (version, symbol.upper(), pd.Timestamp(bar_time).isoformat(), digest)
+
+    def get(self, key) -> Optional[Dict]:
+        with self._lock:
+            result = self._cache.get(key)
+            if result is None:
+                self._stats['misses'] += 1
+                return None
+            self._cache.move_to_end(key)
+            self._stats['hits'] += 1
+        return copy.deepcopy(result)
+
+    def put(self, key, result: Dict):
+        with self._lock:
+            self._cache[key] = copy.deepcopy(result)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._cache.clear()
+            self._stats['invalidations'] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self._stats, 'entries': len(self._cache), 'max_entries': self.max_entries,
+                    'model_versions': len({key[0] for key in self._cache})}
+
+
+# Süreç genelinde paylaşılan tek örnek
+prediction_cache = PredictionCache()
+
+# Çoklu ufuk sonuçları ayrı tutulur: sürüm anahtarı tüm ufuk modellerinin sürümlerinden oluşur
+forecast_cache = PredictionCache()
+
+
+def feature_matrix(universe: Universe, latest_only: bool = True):
+    """Evrenden (satır, 10) özellik matrisi kur: (X, semboller, tarihler)
+
+    latest_only: her sembolün yalnızca son barı (ertesi gün tahmini); aksi halde tüm
+    tarih x sembol hücreleri. Özelliklerinden biri NaN olan satırlar (ör. SMA200 için
+    yeterli geçmişi olmayanlar) çıkarılır.
+    """
+    if universe.empty:
+        return np.empty((0, len(MODEL_FEATURES))), np.empty(0, dtype=object), pd.DatetimeIndex([])
+
+    if latest_only:
+        X = np.column_stack([universe.latest(feature) for feature in MODEL_FEATURES])
+        symbols = np.array(universe.symbols, dtype=object)
+        dates = universe.last_dates()
+    else:
+        # (tarih, sembol, özellik) -> (tarih * sembol, özellik); satırlar tarih sırasıyla
+        X = np.stack([universe.matrix(feature) for feature in MODEL_FEATURES], axis=-1)
+        X = X.reshape(-1, len(MODEL_FEATURES))
+        symbols = np.tile(np.array(universe.symbols, dtype=object), len(universe.dates))
+        dates = universe.dates.repeat(len(universe.symbols))
+
+    valid = ~np.isnan(X).any(axis=1)
+    return X[valid], symbols[valid], dates[valid]
+
+
+def feature_contributions(model, X: np.ndarray) -> np.ndarray:
+    """Ağaçların kendisinden (TreeSHAP, pred_contribs) özellik katkıları
+
+    Dönüş (satır, özellik + 1) matrisidir; son sütun modelin taban değeridir ve her
+    satırın toplamı o satırın tahminini (TL) verir. Tüm satırlar tek çağrıda hesaplanır.
+    """
+    return model.get_booster().predict(xgb.DMatrix(X), pred_contribs=True).astype('f8')
+
+
+def _format_value(feature: str, value: float) -> str:
+    if feature == 'volume':
+        return f"{value / 1_000_000:.1f}M"
+    if feature == 'BB_WIDTH':
+        return f"{value:.3f}"
+    return f"{value:.2f}"
+
+
+def explain_prediction(features: np.ndarray, contributions: np.ndarray, predicted_price: float,
+                       current_price: float, top_n: int = 5) -> Dict:
+    """Bir satırın katkılarından tahmin açıklaması oluştur (en etkili özellikler önce)"""
+    change = predicted_price - current_price
+    order = np.argsort(-np.abs(contributions[:-1]), kind='stable')
+
+    explanations = []
+    for i in order[:top_n]:
+        feature, contribution = MODEL_FEATURES[i], float(contributions[i])
+        direction = 'yukarı' if contribution > 0 else 'aşağı'
+        explanations.append(f"{FEATURE_LABELS[feature]} ({_format_value(feature, features[i])}) "
+                            f"tahmini {contribution:+.2f} TL {direction} çekiyor")
+
+    positive = [i for i in order if contributions[i] > 0]
+    negative = [i for i in order if contributions[i] < 0]
+    return {
+        'trend_direction': "YÜKSELİŞ" if change > 0 else "DÜŞÜŞ",
+        'confidence': "Yüksek" if abs(change) > 5 else "Orta",
+        'explanations': explanations,
+        'key_factors': {
+            'top_positive': FEATURE_LABELS[MODEL_FEATURES[positive[0]]] if positive else None,
+            'top_positive_contribution': round(float(contributions[positive[0]]), 2) if positive else 0.0,
+            'top_negative': FEATURE_LABELS[MODEL_FEATURES[negative[0]]] if negative else None,
+            'top_negative_contribution': round(float(contributions[negative[0]]), 2) if negative else 0.0,
+        },
+        'base_value': round(float(contributions[-1]), 2),
+        'contributions': {feature: round(float(contributions[i]), 4) for i, feature in enumerate(MODEL_FEATURES)}
+    }
+
+
+def predict_universe(universe: Universe, model=None, latest_only: bool = True,
+                     explain: bool = False) -> pd.DataFrame:
+    """Evrendeki tüm satırlar için model başına tek çağrıyla tahmin tablosu döndür
+
+    Her sembol kendi verisiyle eğitilmiş modelle (retrain.py) tahmin edilir; modeli
+    olmayan semboller PRICE_SYMBOL'ün modeline düşer ve cross_symbol_model ile işaretlenir.
+    explain: her satır için özellik katkıları (contrib_<özellik>) ve taban değer
+    sütunları da model başına tek pred_contribs çağrısıyla eklenir.
+    """
+    groups = _model_groups(universe.symbols, 1, model)
+    if not groups:
+        raise RuntimeError("Fiyat tahmin modeli kullanılamıyor")
+
+    X, symbols, dates = feature_matrix(universe, latest_only)
+    if len(X) == 0:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+
+    predicted = np.full(len(X), np.nan)
+    model_symbols = np.full(len(X), None, dtype=object)
+    versions = np.full(len(X), None, dtype=object)
+    contributions = np.full((len(X), len(MODEL_FEATURES) + 1), np.nan) if explain else None
+    for group_model, version, model_symbol, members in groups:
+        rows = np.isin(symbols, members)
+        if not rows.any():
+            continue
+        predicted[rows] = group_model.predict(X[rows])
+        model_symbols[rows] = model_symbol
+        versions[rows] = version
+        if explain:
+            contributions[rows] = feature_contributions(group_model, X[rows])
+
+    # Modeli olmayan sembollerin satırları çıkarılır
+    keep = ~np.isnan(predicted)
+    X, symbols, dates, predicted = X[keep], symbols[keep], dates[keep], predicted[keep]
+    model_symbols, versions = model_symbols[keep], versions[keep]
+    current = X[:, MODEL_FEATURES.index('close')]
+    change = predicted - current
+
+    # Tahmin tarihi: her bar tarihinden sonraki BIST işlem günü (tarih başına bir kez hesaplanır)
+    unique_dates = dates.unique()
+    next_days = {day: bist_calendar.next_trading_day(day.date()) for day in unique_dates}
+
+    table = pd.DataFrame({
+        'symbol': symbols,
+        'date': dates.strftime('%Y-%m-%d'),
+        'current_price': np.round(current, 2),
+        'predicted_price': np.round(predicted, 2),
+        'change': np.round(change, 2),
+        'change_percent': np.round(change / current * 100, 2),
+        'prediction_date': [next_days[day].isoformat() for day in dates],
+        'model_symbol': model_symbols,
+        'model_version': versions,
+        'cross_symbol_model': [trained_on is not None and trained_on != symbol.upper()
+                               for symbol, trained_on in zip(symbols, model_symbols)],
+    })
+    if explain:
+        contributions = contributions[keep]
+        for i, feature in enumerate(MODEL_FEATURES):
+            table[f"contrib_{feature}"] = np.round(contributions[:, i], 4)
+        table['base_value'] = np.round(contributions[:, -1], 4)
+    return table
+
+
+def predict_batch(symbols: Optional[List[str]] = None, days: int = 300, latest_only: bool = True,
+                  model=None, explain: bool = False) -> pd.DataFrame:
+    """Sembollerin verisini tek toplu istekle al ve hepsi için tahmin tablosu üret
+
+    days: SMA200 için en az ~200 işlem günü gerektiğinden varsayılan 300 takvim günü.
+    """
+    universe, failed = load_universe(symbols or WATCHLIST, days=days)
+    if failed:
+        print(f"Tahmin yapılamayan semboller (veri yok): {failed}")
+    return predict_universe(universe, model, latest_only, explain)
+
+
+def horizon_models(horizons: Optional[List[int]] = None,
+                   symbol: str = PRICE_SYMBOL) -> Dict[int, Tuple[LoadedModel, str]]:
+    """İstenen ufuklardan modeli yüklü olanlar: {ufuk: (kayıt girdisi, modelin eğitildiği sembol)}
+
+    Sembolün kendi ufuk modeli yoksa PRICE_SYMBOL'ün o ufuktaki modeli kullanılır.
+    """
+    entries = {}
+    for horizon in horizons or HORIZONS:
+        entry, model_symbol = prediction_model(symbol, horizon)
+        if entry is not None:
+            entries[horizon] = (entry, model_symbol)
+    return entries
+
+
+def forecast_features(symbol: str, X: np.ndarray, bar_time, horizons: Optional[List[int]] = None) -> Dict:
+    """Tek sembolün son özellik satırından (1, özellik) tüm ufuklar için tahmin
+
+    Özellikler bir kez hazırlanır, her ufuk modeli aynı satırla çağrılır. Hedef tarih
+    son bardan itibaren ufuk kadar BIST işlem günü sonrasıdır. Sonuç, modellerin
+    sürümleri ve son bar değişmediği sürece forecast_cache'ten döner.
+    """
+    horizons = sorted(horizons or HORIZONS)
+    entries = horizon_models(horizons, symbol)
+    version = '|'.join(f"{horizon}:{entry.version}" for horizon, (entry, _) in entries.items())
+    key = forecast_cache.key(version, symbol, bar_time, X)
+    cached = forecast_cache.get(key)
+    if cached is not None:
+        return cached
+
+    bar_day = pd.Timestamp(bar_time).date()
+    current = float(X[0, MODEL_FEATURES.index('close')])
+    results = []
+    for horizon, (entry, model_symbol) in entries.items():
+        predicted = float(entry.model.predict(X)[0])
+        change = predicted - current
+        results.append({
+            'horizon': horizon,
+            'target_date': bist_calendar.trading_day_after(bar_day, horizon).isoformat(),
+            'predicted_price': round(predicted, 2),
+            'change': round(change, 2),
+            'change_percent': round(change / current * 100, 2),
+            'model_version': entry.version,
+            'model_symbol': model_symbol,
+            'cross_symbol_model': model_symbol != symbol.upper(),
+        })
+
+    result = {
+        'symbol': symbol.upper(),
+        'date': bar_day.isoformat(),
+        'current_price': round(current, 2),
+        'horizons': results,
+        'unavailable_horizons': [horizon for horizon in horizons if horizon not in entries],
+    }
+    forecast_cache.put(key, result)
+    return result
+
+
+def forecast_universe(universe: Universe, horizons: Optional[List[int]] = None) -> pd.DataFrame:
+    """Evrendeki her sembolün son barı için tüm ufuklarda tahmin (ufuk ve model başına tek çağrı)
+
+    Özellik matrisi bir kez kurulur; tablo sembol x ufuk satırlarından oluşur. Sembolün
+    kendi ufuk modeli yoksa PRICE_SYMBOL'ün modeli kullanılır ve cross_symbol_model işaretlenir.
+    """
+    columns = ['symbol', 'date', 'horizon', 'target_date', 'current_price', 'predicted_price',
+               'change', 'change_percent', 'model_symbol', 'model_version', 'cross_symbol_model']
+    X, symbols, dates = feature_matrix(universe, latest_only=True)
+    if len(X) == 0:
+        return pd.DataFrame(columns=columns)
+
+    current = X[:, MODEL_FEATURES.index('close')]
+    tables = []
+    for horizon in sorted(horizons or HORIZONS):
+        target_dates = {day: bist_calendar.trading_day_after(day.date(), horizon).isoformat()
+                        for day in dates.unique()}
+        for model, version, model_symbol, members in _model_groups(symbols, horizon):
+            rows = np.flatnonzero(np.isin(symbols, members))
+            predicted = model.predict(X[rows]).astype('f8')
+            change = predicted - current[rows]
+            tables.append(pd.DataFrame({
+                'symbol': symbols[rows],
+                'date': dates[rows].strftime('%Y-%m-%d'),
+                'horizon': horizon,
+                'target_date': [target_dates[day] for day in dates[rows]],
+                'current_price': np.round(current[rows], 2),
+                'predicted_price': np.round(predicted, 2),
+                'change': np.round(change, 2),
+                'change_percent': np.round(change / current[rows] * 100, 2),
+                'model_symbol': model_symbol,
+                'model_version': version,
+                'cross_symbol_model': [model_symbol != symbol.upper() for symbol in symbols[rows]],
+            }, index=rows))
+    if not tables:
+        return pd.DataFrame(columns=columns)
+    # Satırlar sembol sırasıyla, her sembolün içinde ufuk sırasıyla
+    return pd.concat(tables).sort_index(kind='stable').reset_index(drop=True)[columns]
+
+
+def forecast_batch(symbols: Optional[List[str]] = None, horizons: Optional[List[int]] = None,
+                   days: int = 300) -> pd.DataFrame:
+    """Sembollerin verisini tek toplu istekle al ve tüm ufuklar için tahmin tablosu üret"""
+    universe, failed = load_universe(symbols or WATCHLIST, days=days)
+    if failed:
+        print(f"Tahmin yapılamayan semboller (veri yok): {failed}")
+    return forecast_universe(universe, horizons)
+
+
+def publish_predictions(symbols: Optional[List[str]] = None, output_dir: Optional[str] = None) -> Path:
+    """Ertesi işlem günü tahminlerini data/predictions/<tarih>.json dosyasına yaz (seans kapanışı sonrası)"""
+    started = time.perf_counter()
+    table = predict_batch(symbols, explain=True)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    session = bist_calendar.last_completed_session()
+    entry = model_registry.entry(PRICE_MODEL)
+    output_dir = Path(output_dir or PREDICTIONS_DIR)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    path = output_dir / f"{session.isoformat()}.json"
+
+    payload = {
+        'session': session.isoformat(),
+        'model_version': entry.version if entry is not None else None,
+        'generated_at': bist_calendar.now().isoformat(timespec='seconds'),
+        'elapsed_ms': round(elapsed_ms, 1),
+        'predictions': table.to_dict(orient='records')
+    }
+    tmp_file = path.with_suffix('.tmp')
+    tmp_file.write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding='utf-8')
+    os.replace(tmp_file, path)
+
+    print(f"{len(table)} sembol için tahmin yayınlandı ({elapsed_ms:.0f} ms): {path}")
+    return path
+
+
+if __name__ == "__main__":
+    # Kullanım (ör. her akşam 18:30'da cron ile): python price_predictor.py [SEMBOL ...]
+    publish_predictions(sys.argv[1:] or None)
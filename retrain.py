@@ -0,0 +1,266 @@
+# retrain.py
+# Çevrimdışı yeniden eğitim hattı - özellik deposunu günceller, parametre ızgarasını süreç havuzunda dener
+# ve en iyi modeli sürümlü pickle olarak yayınlar (Flask uygulaması model kaydı üzerinden kendiliğinden yükler;
+# her sembolün modeli o sembolün tahminlerinde kullanılır)
+
+import argparse
+import hashlib
+import itertools
+import json
+import multiprocessing as mp
+import os
+import pickle
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from xgboost import XGBRegressor
+
+from backtest import TRAIN_PARAMS, evaluate
+from feature_store import FeatureStore
+
+# model/arge-model.ipynb'deki GridSearchCV ızgarası
+DEFAULT_GRID = {
+    'max_depth': [3, 6],
+    'learning_rate': [0.05],
+    'n_estimators': [700, 1000],
+    'colsample_bytree': [0.3, 0.7],
+}
+
+MODEL_VERSIONS_DIR = os.getenv('MODEL_VERSIONS_DIR', 'model/versions')
+
+
+def expand_grid(grid: Dict[str, List]) -> List[Dict]:
+    """{'max_depth': [3, 6], ...} ızgarasını parametre sözlüklerinin listesine aç"""
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def load_grid(text: Optional[str] = None) -> Dict[str, List]:
+    """CLI ya da RETRAIN_GRID ortam değişkenindeki JSON ızgarası; tekil değerler listeye çevrilir"""
+    text = text or os.getenv('RETRAIN_GRID')
+    if not text:
+        return DEFAULT_GRID
+    grid = json.loads(text)
+    return {key: value if isinstance(value, list) else [value] for key, value in grid.items()}
+
+
+def _fit_candidate(symbol: str, horizon: int, X: np.ndarray, y: np.ndarray, split: int, close_index: int,
+                   params: Dict) -> Dict:
+    """Süreç havuzunda çalışan iş: adayı eğitim kısmında eğit, zamanca sonraki doğrulama kısmında ölç"""
+    started = time.perf_counter()
+    model = XGBRegressor(**{**TRAIN_PARAMS, **params, 'n_jobs': 1})
+    # Eğitim hedefleri doğrulama dönemine taşmasın (h günlük hedef, h gün sonraki kapanıştır)
+    model.fit(X[:split - horizon + 1], y[:split - horizon + 1])
+    predictions = model.predict(X[split:]).astype('f8')
+    return {'symbol': symbol, 'horizon': horizon, 'params': params,
+            'validation': evaluate(predictions, y[split:], X[split:, close_index]),
+            'elapsed_s': round(time.perf_counter() - started, 2)}
+
+
+def _fit_final(X: np.ndarray, y: np.ndarray, params: Dict) -> bytes:
+    """Süreç havuzunda çalışan iş: seçilen parametrelerle tüm veride eğit, pickle baytlarını döndür"""
+    model = XGBRegressor(**{**TRAIN_PARAMS, **params, 'n_jobs': 1})
+    model.fit(X, y)
+    return pickle.dumps(model)
+
+
+def _write_atomic(path: Path, payload: bytes):
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.write_bytes(payload)
+    os.replace(tmp_path, path)
+
+
+def publish_model(symbol: str, payload: bytes, record: Dict, versions_dir: Optional[str] = None) -> Dict:
+    """Modeli <sürüm>.pkl olarak sakla ve manifest.json'a ekle
+
+    Sürüm, model kaydındakiyle aynı şekilde dosya içeriğinin sha256 özetidir; böylece
+    /api/model'de görülen sürüm manifestteki kayda doğrudan eşlenir.
+    """
+    version = hashlib.sha256(payload).hexdigest()[:12]
+    versions_dir = Path(versions_dir or MODEL_VERSIONS_DIR)
+    symbol_dir = versions_dir / symbol.upper()
+    symbol_dir.mkdir(parents=True, exist_ok=True)
+    path = symbol_dir / f"{version}.pkl"
+    _write_atomic(path, payload)
+
+    manifest_path = versions_dir / 'manifest.json'
+    manifest = json.loads(manifest_path.read_text(encoding='utf-8')) if manifest_path.exists() else {}
+    entry = {**record, 'symbol': symbol, 'version': version, 'path': str(path),
+             'created_at': datetime.now().isoformat(timespec='seconds')}
+    manifest.setdefault('versions', []).append(entry)
+    _write_atomic(manifest_path, json.dumps(manifest, indent=2, ensure_ascii=False).encode('utf-8'))
+    return entry
+
+
+def promote_model(entry: Dict, model_name: str, model_path: str, versions_dir: Optional[str] = None):
+    """Yayınlanan sürümü uygulamanın okuduğu model yoluna (price_predictor.symbol_model_path) atomik olarak kopyala
+
+    Dosya önce aynı dizine geçici adla yazılıp os.replace ile değiştirilir; model
+    kaydının izleyicisi imza değişikliğini görüp yeni modeli yükler, okuyucular hiçbir
+    zaman yarım yazılmış bir dosya görmez.
+    """
+    target = Path(model_path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(target.name + '.tmp')
+    shutil.copyfile(entry['path'], tmp_path)
+    os.replace(tmp_path, target)
+
+    manifest_path = Path(versions_dir or MODEL_VERSIONS_DIR) / 'manifest.json'
+    manifest = json.loads(manifest_path.read_text(encoding='utf-8'))
+    manifest.setdefault('production', {})[model_name] = {
+        'symbol': entry['symbol'], 'horizon': entry['horizon'], 'version': entry['version'], 'model_path': str(target),
+        'promoted_at': datetime.now().isoformat(timespec='seconds')}
+    _write_atomic(manifest_path, json.dumps(manifest, indent=2, ensure_ascii=False).encode('utf-8'))
+    print(f"Model yayına alındı: {model_name} {entry['version']} -> {target}")
+
+
+def score_model(model_path: str, X: np.ndarray, y: np.ndarray, close_index: int) -> Optional[Dict]:
+    """Pickle'lanmış modeli verilen satırlarda ölç; dosya yoksa ya da okunamazsa None"""
+    if not os.path.exists(model_path):
+        return None
+    try:
+        with open(model_path, 'rb') as f:
+            model = pickle.load(f)
+        return evaluate(model.predict(X).astype('f8'), y, X[:, close_index])
+    except Exception as e:
+        print(f"Yayındaki model ölçülemedi ({model_path}): {e}")
+        return None
+
+
+def retrain(symbols: Optional[List[str]] = None, grid: Optional[Dict[str, List]] = None, validation: float = 0.2,
+            workers: Optional[int] = None, sync: bool = True, promote: bool = True,
+            versions_dir: Optional[str] = None, horizons: Optional[List[int]] = None,
+            force_promote: bool = False) -> Dict:
+    """Özellik deposunu güncelle, ızgarayı dene, sembol ve ufuk başına en iyi modeli yayınla
+
+    Aday parametreler verinin ilk (1 - validation) kısmında eğitilip son kısmında
+    (örneklem dışı) RMSE ile sıralanır; kazanan parametrelerle tüm veride son model
+    eğitilir. Tüm (sembol, ufuk, aday) eğitimleri tek bir süreç havuzunda paralel yürür
+    ve aynı özellik satırlarını paylaşır; ufuklar yalnızca hedef kaydırmasıyla ayrılır.
+    promote açıksa her yeni model sembolün kendi yoluna alınır (PRICE_SYMBOL için ufuk
+    model yolları, diğerleri için SYMBOL_MODELS_DIR); uygulama o sembolün tahminlerinde
+    bu modeli kullanır. Yeni son model ile yayındaki model aynı doğrulama satırlarında
+    ölçülür (ikisi de tüm veride eğitildiğinden karşılaştırma eşittir); yayındaki modelin
+    RMSE'si daha düşükse yeni model yalnızca yayınlanır, yayına alınmaz (force_promote ile atlanır).
+    """
+    # Özellik listesi ve model yolları yalnızca ana süreçte gerekir; havuz süreçleri modeli yüklemez
+    from price_predictor import MODEL_FEATURES, PRICE_SYMBOL, symbol_model_name, symbol_model_path
+
+    symbols = symbols or [PRICE_SYMBOL]
+    horizons = horizons or [1]
+    candidates = expand_grid(grid or DEFAULT_GRID)
+    started = time.perf_counter()
+
+    store = FeatureStore(MODEL_FEATURES)
+    if sync:
+        appended = store.sync(symbols)
+        print(f"Özellik deposu güncellendi: {sum(appended.values())} yeni satır ({len(appended)} sembol)")
+
+    datasets, failed = {}, []
+    for symbol in symbols:
+        for horizon in horizons:
+            dataset = store.dataset(symbol, horizon)
+            if dataset is None or len(dataset['y']) < 100:
+                print(f"Yetersiz eğitim verisi ({symbol}, {horizon} gün)")
+                failed.append(symbol)
+                continue
+            datasets[(symbol, horizon)] = dataset
+
+    close_index = MODEL_FEATURES.index('close')
+    results = {key: [] for key in datasets}
+    tasks = len(datasets) * len(candidates)
+    workers = workers or min(tasks, os.cpu_count() or 1) or 1
+    published, splits = {}, {}
+
+    # spawn: OpenMP kullanmış bir süreçten fork etmek xgboost'u kilitleyebilir
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context('spawn')) as pool:
+        futures = []
+        for (symbol, horizon), dataset in datasets.items():
+            split = splits[(symbol, horizon)] = int(len(dataset['y']) * (1 - validation))
+            for params in candidates:
+                futures.append(pool.submit(_fit_candidate, symbol, horizon, dataset['X'], dataset['y'], split,
+                                           close_index, params))
+        for future in futures:
+            try:
+                result = future.result()
+                results[(result['symbol'], result['horizon'])].append(result)
+            except Exception as e:
+                print(f"Aday eğitim hatası: {e}")
+
+        best = {key: min(scored, key=lambda r: r['validation']['rmse'])
+                for key, scored in results.items() if scored}
+        finals = {key: pool.submit(_fit_final, datasets[key]['X'], datasets[key]['y'], choice['params'])
+                  for key, choice in best.items()}
+
+        for (symbol, horizon), future in finals.items():
+            key = (symbol, horizon)
+            try:
+                payload = future.result()
+            except Exception as e:
+                print(f"Son model eğitim hatası ({symbol}, {horizon} gün): {e}")
+                failed.append(symbol)
+                continue
+            dataset = datasets[key]
+            record = {
+                'horizon': horizon,
+                'features': MODEL_FEATURES,
+                'params': {**TRAIN_PARAMS, **best[key]['params']},
+                'validation': best[key]['validation'],
+                'rows': int(len(dataset['y'])),
+                'data_through': str(dataset['dates'][-1]),
+                'candidates': len(results[key]),
+            }
+            published[key] = publish_model(symbol, payload, record, versions_dir)
+            print(f"{symbol} ({horizon} gün): sürüm {published[key]['version']}, doğrulama RMSE "
+                  f"{best[key]['validation']['rmse']:.3f}, parametreler {best[key]['params']}")
+
+    promoted, kept = [], []
+    if promote:
+        for (symbol, horizon), entry in published.items():
+            name, model_path = symbol_model_name(symbol, horizon), symbol_model_path(symbol, horizon)
+            dataset, split = datasets[(symbol, horizon)], splits[(symbol, horizon)]
+            if not force_promote:
+                X_val, y_val = dataset['X'][split:], dataset['y'][split:]
+                current = score_model(model_path, X_val, y_val, close_index)
+                challenger = score_model(entry['path'], X_val, y_val, close_index) if current else None
+                if current is not None and challenger is not None and challenger['rmse'] > current['rmse']:
+                    print(f"Yayına alınmadı: {name} yeni sürüm {entry['version']} doğrulama RMSE "
+                          f"{challenger['rmse']:.3f}, yayındaki model {current['rmse']:.3f}")
+                    kept.append(f"{symbol}:{horizon}")
+                    continue
+            promote_model(entry, name, model_path, versions_dir)
+            promoted.append(f"{symbol}:{horizon}")
+
+    elapsed = round(time.perf_counter() - started, 2)
+    print(f"Yeniden eğitim tamamlandı: {len(published)} model, {tasks} aday, {workers} süreç ({elapsed} sn)")
+    return {'published': {f"{symbol}:{horizon}": entry for (symbol, horizon), entry in published.items()},
+            'promoted': promoted, 'kept_production': kept,
+            'failed_symbols': list(dict.fromkeys(failed)), 'candidates': candidates,
+            'workers': workers, 'elapsed_s': elapsed}
+
+
+if __name__ == "__main__":
+    # Kullanım (ör. her gece cron ile): python retrain.py --all
+    from universe import WATCHLIST
+
+    parser = argparse.ArgumentParser(description="Fiyat modelini özellik deposundan yeniden eğit ve yayınla")
+    parser.add_argument('symbols', nargs='*', default=None)
+    parser.add_argument('--all', action='store_true', help="izleme listesindeki tüm semboller")
+    parser.add_argument('--grid', default=None, help='JSON ızgara, ör. \'{"max_depth": [3, 6]}\'')
+    parser.add_argument('--horizons', default='1', help="virgülle ayrılmış tahmin ufukları (işlem günü), ör. 1,5,20")
+    parser.add_argument('--validation', type=float, default=0.2, help="doğrulama için ayrılan son kısım")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--no-sync', action='store_true', help="özellik deposunu güncellemeden eğit")
+    parser.add_argument('--no-promote', action='store_true', help="yeni modelleri yayınla ama uygulamanın model yollarına alma")
+    parser.add_argument('--force-promote', action='store_true',
+                        help="yayındaki model doğrulamada daha iyi olsa da yeni modeli yayına al")
+    args = parser.parse_args()
+
+    retrain(WATCHLIST if args.all else (args.symbols or None), load_grid(args.grid), args.validation,
+            args.workers, not args.no_sync, not args.no_promote,
+            horizons=[int(h) for h in args.horizons.split(',') if h.strip()], force_promote=args.force_promote)
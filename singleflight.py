@@ -0,0 +1,54 @@
+# singleflight.py
+# Aynı anahtar için eşzamanlı istekleri tek bir çağrıda birleştiren yardımcı
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Aynı anahtarla gelen eşzamanlı çağrılardan yalnızca biri işi yapar
+
+    İlk gelen çağrı (lider) fonksiyonu çalıştırır; bu sırada aynı anahtarla gelenler
+    liderin Future nesnesini bekler ve aynı sonucu ya da aynı hatayı alır.
+    Çağrı bittiğinde anahtar silinir, sonuç saklanmaz (önbellek değildir).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self._stats = {'calls': 0, 'coalesced': 0}
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            self._stats['calls'] += 1
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+            else:
+                self._stats['coalesced'] += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self._stats, 'in_flight': len(self._calls)}
@@ -7,6 +7,7 @@ let recognition = null;
 let currentTheme = 'light'; // Varsayılan tema
 let chatHistory = []; // Sohbet geçmişi
 let currentChatId = null; // Aktif sohbet ID'si
+let pendingSeriesCharts = {}; // DOM'a eklendikten sonra Plotly ile çizilecek seri grafikleri
 
 // Tema yönetimi
 function initTheme() {
@@ -355,6 +356,7 @@ function addMessageToDOM(text, sender, type = 'normal', data = null, scroll = tr
     
     messageDiv.innerHTML = messageContent;
     chatMessages.appendChild(messageDiv);
+    renderPendingSeriesCharts();
     
     // Mesajları en alta kaydır
     if (scroll) {
@@ -414,8 +416,13 @@ function formatMessage(text, type, data) {
             }
             
             data.charts.forEach((chart, index) => {
-                console.log(`Chart ${index}:`, chart.title, 'Data length:', chart.data.length);
                 const chartId = `chart-${Date.now()}-${index}`;
+                // Seri modu: sunucu PNG yerine veri + grafik tanımı gönderir, DOM'a eklenince çizilir
+                const isSeries = chart.format === 'series';
+                if (isSeries) {
+                    pendingSeriesCharts[chartId] = chart;
+                }
+                console.log(`Chart ${index}:`, chart.title, isSeries ? `Points: ${chart.series.points}` : `Data length: ${(chart.data || '').length}`);
                 chartsHtml += `
                     <div class="chart-container" id="${chartId}-container">
                         <div class="chart-header">
@@ -435,8 +442,8 @@ function formatMessage(text, type, data) {
                                 </button>
                             </div>
                         </div>
-                        <div class="chart-image" id="${chartId}">
-                            ${chart.data}
+                        <div class="chart-image${isSeries ? ' series-chart' : ''}" id="${chartId}">
+                            ${isSeries ? '' : (chart.data || '')}
                         </div>
                     </div>
                 `;
@@ -1122,6 +1129,121 @@ document.addEventListener('click', function(event) {
     }
 }); 
 
+// base64 -> tipli dizi (sunucu little-endian float32/int32 gönderir)
+function decodeBase64Array(encoded, ArrayType) {
+    const binary = atob(encoded);
+    const bytes = new Uint8Array(binary.length);
+    for (let i = 0; i < binary.length; i++) {
+        bytes[i] = binary.charCodeAt(i);
+    }
+    return new ArrayType(bytes.buffer);
+}
+
+// Seri grafiğinin tarihlerini (başlangıç + gün farkları) ve sütunlarını çöz
+function decodeSeriesChart(chart) {
+    const series = chart.series;
+    const deltas = decodeBase64Array(series.deltas, Int32Array);
+    const dates = new Array(series.points);
+    let day = Date.parse(series.start);
+    for (let i = 0; i < series.points; i++) {
+        if (i > 0) {
+            day += deltas[i - 1] * 86400000;
+        }
+        dates[i] = new Date(day).toISOString().slice(0, 10);
+    }
+    const columns = {};
+    Object.entries(series.columns).forEach(([name, encoded]) => {
+        // NaN (indikatörün ısınma dönemi) Plotly'de boşluk olarak çizilsin
+        columns[name] = Array.from(decodeBase64Array(encoded, Float32Array), v => (Number.isNaN(v) ? null : v));
+    });
+    return { dates, columns };
+}
+
+// Grafik tanımından (satırlar, izler, referans çizgileri) Plotly figürü oluştur
+function renderSeriesChart(chartId, chart) {
+    const element = document.getElementById(chartId);
+    if (!element || typeof Plotly === 'undefined') {
+        return;
+    }
+    const { dates, columns } = decodeSeriesChart(chart);
+    const rows = chart.spec.rows;
+    const totalHeight = rows.reduce((sum, row) => sum + row.height, 0);
+    const gap = rows.length > 1 ? 0.04 : 0;
+    const traces = [];
+    const shapes = [];
+    const layout = {
+        title: { text: chart.spec.title, font: { color: 'white', size: 13 } },
+        paper_bgcolor: '#1e293b',
+        plot_bgcolor: '#1e293b',
+        font: { color: 'white', size: 10 },
+        margin: { l: 50, r: 15, t: 35, b: 30 },
+        height: 300 + 80 * (rows.length - 1),
+        showlegend: true,
+        legend: { orientation: 'h', y: -0.15, font: { size: 9 } },
+        xaxis: { type: 'date', gridcolor: 'rgba(255,255,255,0.1)' }
+    };
+
+    // Satırlar yukarıdan aşağı, ortak x ekseni
+    let top = 1;
+    rows.forEach((row, r) => {
+        const axis = r === 0 ? 'y' : `y${r + 1}`;
+        const axisKey = r === 0 ? 'yaxis' : `yaxis${r + 1}`;
+        const height = (1 - gap * (rows.length - 1)) * row.height / totalHeight;
+        layout[axisKey] = {
+            title: { text: row.yaxis, font: { size: 10 } },
+            domain: [Math.max(top - height, 0), top],
+            gridcolor: 'rgba(255,255,255,0.1)'
+        };
+        top -= height + gap;
+
+        row.traces.forEach(spec => {
+            const values = columns[spec.column];
+            const trace = { x: dates, y: values, name: spec.name, yaxis: axis, opacity: spec.opacity || 1 };
+            if (spec.type === 'bar') {
+                trace.type = 'bar';
+                trace.marker = {
+                    color: spec.negative_color
+                        ? values.map(v => (v !== null && v < 0 ? spec.negative_color : spec.color))
+                        : spec.color
+                };
+            } else {
+                trace.type = 'scatter';
+                trace.mode = 'lines';
+                trace.line = { color: spec.color, width: spec.width || 1, dash: spec.dash || 'solid' };
+                if (spec.fill) {
+                    trace.fill = spec.fill;
+                    trace.fillcolor = 'rgba(128,128,128,0.1)';
+                }
+            }
+            traces.push(trace);
+        });
+
+        (row.levels || []).forEach(level => {
+            shapes.push({
+                type: 'line', xref: 'paper', x0: 0, x1: 1, yref: axis, y0: level.y, y1: level.y,
+                line: { color: level.color, dash: level.dash || 'dash', width: 1 }
+            });
+        });
+    });
+    layout.shapes = shapes;
+
+    Plotly.newPlot(element, traces, layout, { responsive: true, displaylogo: false });
+}
+
+// Bekleyen (DOM'a yeni eklenmiş) seri grafiklerini çiz
+function renderPendingSeriesCharts() {
+    Object.entries(pendingSeriesCharts).forEach(([chartId, chart]) => {
+        if (document.getElementById(chartId)) {
+            try {
+                renderSeriesChart(chartId, chart);
+            } catch (error) {
+                console.error('Seri grafiği çizim hatası:', error);
+            }
+            delete pendingSeriesCharts[chartId];
+        }
+    });
+}
+
 // Grafik indirme fonksiyonu
 async function downloadChart(chartId) {
     try {
@@ -1133,6 +1255,16 @@ async function downloadChart(chartId) {
             return;
         }
         
+        // Tarayıcıda çizilen seri grafikleri doğrudan Plotly ile PNG'ye aktarılır
+        if (chartElement.classList.contains('series-chart') && typeof Plotly !== 'undefined') {
+            const chartTitle = chartElement.closest('.chart-container').querySelector('h4').textContent;
+            await Plotly.downloadImage(chartElement, {
+                format: 'png', scale: 2, filename: chartTitle.replace(/[^a-zA-Z0-9]/g, '_')
+            });
+            showToast('Grafik başarıyla indirildi!', 'success');
+            return;
+        }
+        
         // html2canvas kütüphanesini yükle (eğer yoksa)
         if (typeof html2canvas === 'undefined') {
             await loadHtml2Canvas();
@@ -1265,6 +1397,9 @@ function toggleChartSize(chartId) {
         closeBtn.style.display = 'inline';
         showToast('Grafik büyütüldü', 'info');
     }
+    if (chartImage.classList.contains('series-chart') && typeof Plotly !== 'undefined') {
+        Plotly.Plots.resize(chartImage);
+    }
 }
 
 // Grafik boyutunu sıfırla
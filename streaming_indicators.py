@@ -0,0 +1,399 @@
+# streaming_indicators.py
+# Yeni bar ya da gün içi fiyat geldiğinde indikatörleri tüm pencereyi yeniden hesaplamadan güncelleyen durum makineleri
+
+import json
+import math
+import os
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from bar_store import BAR_COLUMNS
+from indicators import DEFAULT_PARAMS
+
+NAN = float('nan')
+
+
+class EWM:
+    """pandas ewm(adjust=True).mean() karşılığı: ağırlıklı toplam ve ağırlık toplamı taşınır"""
+
+    def __init__(self, alpha: float):
+        self.decay = 1.0 - alpha
+        self.num = 0.0
+        self.den = 0.0
+        self._prev = (0.0, 0.0)
+
+    def update(self, x: float) -> float:
+        self._prev = (self.num, self.den)
+        return self._apply(x)
+
+    def revise(self, x: float) -> float:
+        """Son değeri (gün içi bar) yenisiyle değiştir"""
+        self.num, self.den = self._prev
+        return self._apply(x)
+
+    def _apply(self, x: float) -> float:
+        # Baştaki NaN'lar (ör. ilk barın fiyat farkı) ağırlık almaz
+        if not math.isnan(x):
+            self.num = x + self.decay * self.num
+            self.den = 1.0 + self.decay * self.den
+        return self.value
+
+    @property
+    def value(self) -> float:
+        return self.num / self.den if self.den else NAN
+
+    def state(self) -> Dict:
+        return {'num': self.num, 'den': self.den, 'prev': list(self._prev)}
+
+    def load(self, state: Dict):
+        self.num, self.den = state['num'], state['den']
+        self._prev = tuple(state['prev'])
+
+
+class RollingWindow:
+    """Sabit pencerede toplam ve kareler toplamı; her güncelleme O(1)
+
+    Kayan nokta birikimini sınırlamak için toplamlar her `window` güncellemede bir
+    tampondan yeniden hesaplanır (amortize O(1)).
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque(maxlen=window)
+        self.total = 0.0
+        self.total_sq = 0.0
+        self._since_refresh = 0
+
+    def update(self, x: float):
+        if len(self.values) == self.window:
+            old = self.values[0]
+            self.total -= old
+            self.total_sq -= old * old
+        self.values.append(x)
+        self.total += x
+        self.total_sq += x * x
+        self._since_refresh += 1
+        if self._since_refresh >= self.window:
+            self._refresh()
+
+    def revise(self, x: float):
+        old = self.values[-1]
+        self.values[-1] = x
+        self.total += x - old
+        self.total_sq += x * x - old * old
+
+    def _refresh(self):
+        self.total = math.fsum(self.values)
+        self.total_sq = math.fsum(v * v for v in self.values)
+        self._since_refresh = 0
+
+    @property
+    def full(self) -> bool:
+        return len(self.values) == self.window
+
+    def mean(self) -> float:
+        return self.total / self.window if self.full else NAN
+
+    def std(self) -> float:
+        """Örneklem standart sapması (ddof=1, pandas rolling std ile aynı)"""
+        if not self.full or self.window < 2:
+            return NAN
+        variance = (self.total_sq - self.total * self.total / self.window) / (self.window - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    def state(self) -> Dict:
+        return {'values': list(self.values)}
+
+    def load(self, state: Dict):
+        self.values = deque(state['values'], maxlen=self.window)
+        self._refresh()
+
+
+class RollingExtreme:
+    """Monoton deque ile kayan maksimum/minimum; yeni bar amortize O(1)
+
+    Gün içi revizyonda deque pencere tamponundan yeniden kurulur (O(pencere)).
+    """
+
+    def __init__(self, window: int, mode: str = 'max'):
+        self.window = window
+        self.sign = 1.0 if mode == 'max' else -1.0
+        self.values = deque(maxlen=window)
+        self._deque = deque()  # (sıra, işaretli değer)
+        self._seq = 0
+
+    def update(self, x: float):
+        self.values.append(x)
+        self._push(self._seq, self.sign * x)
+        self._seq += 1
+
+    def _push(self, seq: int, v: float):
+        while self._deque and self._deque[-1][1] <= v:
+            self._deque.pop()
+        self._deque.append((seq, v))
+        while self._deque[0][0] <= seq - self.window:
+            self._deque.popleft()
+
+    def revise(self, x: float):
+        self.values[-1] = x
+        self._rebuild()
+
+    def _rebuild(self):
+        self._deque.clear()
+        first_seq = self._seq - len(self.values)
+        for offset, value in enumerate(self.values):
+            self._push(first_seq + offset, self.sign * value)
+
+    @property
+    def value(self) -> float:
+        if len(self.values) < self.window:
+            return NAN
+        return self.sign * self._deque[0][1]
+
+    def state(self) -> Dict:
+        return {'values': list(self.values), 'seq': self._seq}
+
+    def load(self, state: Dict):
+        self.values = deque(state['values'], maxlen=self.window)
+        self._seq = state['seq']
+        self._rebuild()
+
+
+class StreamingIndicatorSet:
+    """Tek sembol için kanonik indikatör şemasını (indicators.INDICATOR_COLUMNS) bar bar güncelle
+
+    update(bar) yeni bir günlük bar ekler, revise(bar) son barı (gün içi fiyat) değiştirir.
+    Sonuçlar aynı başlangıç barından hesaplanan indicators.compute_arrays ile aynıdır.
+    """
+
+    def __init__(self, params: Optional[Dict] = None):
+        self.params = {**DEFAULT_PARAMS, **(params or {})}
+        p = self.params
+        self.sma = {period: RollingWindow(period) for period in p['sma_periods']}
+        self.rsi_gain = EWM(1.0 / p['rsi_period'])
+        self.rsi_loss = EWM(1.0 / p['rsi_period'])
+        self.ema_fast = EWM(2.0 / (p['macd_fast'] + 1))
+        self.ema_slow = EWM(2.0 / (p['macd_slow'] + 1))
+        self.macd_signal = EWM(2.0 / (p['macd_signal'] + 1))
+        self.bb = RollingWindow(p['bb_period'])
+        self.tr = RollingWindow(p['atr_period'])
+        self.highest = RollingExtreme(p['williams_period'], 'max')
+        self.lowest = RollingExtreme(p['williams_period'], 'min')
+
+        self.prev_close = NAN      # son bardan önceki kapanış
+        self.last_close = NAN
+        self.last_timestamp: Optional[str] = None
+        self.bars = 0
+        self.values: Dict[str, float] = {}
+
+    def update(self, bar: Dict, timestamp=None) -> Dict[str, float]:
+        """Yeni barı ekle ve güncel indikatör değerlerini döndür"""
+        self.prev_close = self.last_close
+        self.bars += 1
+        return self._apply(bar, timestamp, revise=False)
+
+    def revise(self, bar: Dict, timestamp=None) -> Dict[str, float]:
+        """Son barı (henüz kapanmamış gün içi bar) yeni değerlerle değiştir"""
+        if self.bars == 0:
+            return self.update(bar, timestamp)
+        return self._apply(bar, timestamp, revise=True)
+
+    def _apply(self, bar: Dict, timestamp, revise: bool) -> Dict[str, float]:
+        close, high, low = float(bar['close']), float(bar['high']), float(bar['low'])
+        step = 'revise' if revise else 'update'
+
+        for window in self.sma.values():
+            getattr(window, step)(close)
+
+        delta = close - self.prev_close
+        getattr(self.rsi_gain, step)(NAN if math.isnan(delta) else max(delta, 0.0))
+        getattr(self.rsi_loss, step)(NAN if math.isnan(delta) else max(-delta, 0.0))
+
+        macd = getattr(self.ema_fast, step)(close) - getattr(self.ema_slow, step)(close)
+        signal = getattr(self.macd_signal, step)(macd)
+
+        getattr(self.bb, step)(close)
+
+        tr = abs(high - low)
+        if not math.isnan(self.prev_close):
+            tr = max(tr, abs(high - self.prev_close), abs(self.prev_close - low))
+        getattr(self.tr, step)(tr)
+
+        getattr(self.highest, step)(high)
+        getattr(self.lowest, step)(low)
+
+        self.last_close = close
+        if timestamp is not None:
+            self.last_timestamp = str(pd.Timestamp(timestamp))
+        self.values = self._snapshot(close, macd, signal)
+        return self.values
+
+    def _snapshot(self, close: float, macd: float, signal: float) -> Dict[str, float]:
+        values = {f"SMA{period}": window.mean() for period, window in self.sma.items()}
+
+        gain, loss = self.rsi_gain.value, self.rsi_loss.value
+        if math.isnan(gain) or math.isnan(loss) or (gain == 0 and loss == 0):
+            values['RSI'] = NAN
+        else:
+            values['RSI'] = 100.0 if loss == 0 else 100 - 100 / (1 + gain / loss)
+
+        values['MACD'] = macd
+        values['MACD_SIGNAL'] = signal
+        values['MACD_HIST'] = macd - signal
+
+        middle, std = self.bb.mean(), self.bb.std()
+        upper = middle + self.params['bb_std'] * std
+        lower = middle - self.params['bb_std'] * std
+        values.update({'BB_UPPER': upper, 'BB_MIDDLE': middle, 'BB_LOWER': lower,
+                       'BB_WIDTH': (upper - lower) / middle if middle else NAN})
+
+        values['ATR'] = self.tr.mean()
+        highest, lowest = self.highest.value, self.lowest.value
+        values['WILLIAMS'] = (highest - close) / (highest - lowest) * -100 if highest != lowest else NAN
+        return values
+
+    def warm_up(self, df: pd.DataFrame) -> Dict[str, float]:
+        """Geçmiş barları sırayla besle (başlangıç durumu)"""
+        for timestamp, row in zip(df.index, df[BAR_COLUMNS].to_dict('records')):
+            self.update(row, timestamp)
+        return self.values
+
+    def checkpoint(self) -> Dict:
+        """JSON'a yazılabilir tam durum"""
+        return {
+            'params': {k: list(v) if isinstance(v, tuple) else v for k, v in self.params.items()},
+            'sma': {str(period): window.state() for period, window in self.sma.items()},
+            'rsi_gain': self.rsi_gain.state(), 'rsi_loss': self.rsi_loss.state(),
+            'ema_fast': self.ema_fast.state(), 'ema_slow': self.ema_slow.state(),
+            'macd_signal': self.macd_signal.state(),
+            'bb': self.bb.state(), 'tr': self.tr.state(),
+            'highest': self.highest.state(), 'lowest': self.lowest.state(),
+            'prev_close': self.prev_close, 'last_close': self.last_close,
+            'last_timestamp': self.last_timestamp, 'bars': self.bars, 'values': self.values,
+        }
+
+    @classmethod
+    def restore(cls, state: Dict) -> 'StreamingIndicatorSet':
+        params = dict(state['params'])
+        params['sma_periods'] = tuple(params['sma_periods'])
+        stream = cls(params)
+        for period, window in stream.sma.items():
+            window.load(state['sma'][str(period)])
+        for name in ('rsi_gain', 'rsi_loss', 'ema_fast', 'ema_slow', 'macd_signal', 'bb', 'tr', 'highest', 'lowest'):
+            getattr(stream, name).load(state[name])
+        stream.prev_close = state['prev_close']
+        stream.last_close = state['last_close']
+        stream.last_timestamp = state['last_timestamp']
+        stream.bars = state['bars']
+        stream.values = state['values']
+        return stream
+
+
+class IndicatorStreams:
+    """Evren genelinde sembol başına akış durumu
+
+    refresh(symbol, df) yalnızca son işlenen bardan sonraki barları besler; son bar
+    aynı tarihte ama değişmişse (gün içi) revise edilir. İlk görülen sembol için
+    verilen tablonun tamamıyla ısınma yapılır.
+    """
+
+    def __init__(self, checkpoint_path: Optional[str] = None, params: Optional[Dict] = None):
+        self.checkpoint_path = Path(checkpoint_path or os.getenv('INDICATOR_STREAM_CHECKPOINT',
+                                                                'data/indicator_streams.json'))
+        self.params = params
+        self._streams: Dict[str, StreamingIndicatorSet] = {}
+        self._lock = threading.Lock()
+
+    def refresh(self, symbol: str, df: pd.DataFrame) -> Dict[str, float]:
+        key = symbol.upper()
+        with self._lock:
+            stream = self._streams.get(key)
+            if stream is None or stream.last_timestamp is None:
+                stream = StreamingIndicatorSet(self.params)
+                stream.warm_up(df)
+                self._streams[key] = stream
+                return dict(stream.values)
+
+            last = pd.Timestamp(stream.last_timestamp)
+            if last in df.index:
+                # Son işlenen bar gün içinde değişmiş olabilir: O(1) revizyon
+                stream.revise(df.loc[last, BAR_COLUMNS].to_dict(), last)
+            for timestamp, row in zip(df.index[df.index > last], df.loc[df.index > last, BAR_COLUMNS].to_dict('records')):
+                stream.update(row, timestamp)
+            return dict(stream.values)
+
+    def latest(self, symbol: str) -> Optional[Dict[str, float]]:
+        with self._lock:
+            stream = self._streams.get(symbol.upper())
+            return dict(stream.values) if stream else None
+
+    def symbols(self) -> List[str]:
+        with self._lock:
+            return sorted(self._streams)
+
+    def save(self):
+        """Tüm akışların durumunu atomik olarak diske yaz"""
+        with self._lock:
+            data = {symbol: stream.checkpoint() for symbol, stream in self._streams.items()}
+        self.checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.checkpoint_path.with_suffix('.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            # NaN değerleri JSON'da null olarak saklanır
+            json.dump(_nan_to_none(data), f)
+        os.replace(tmp_file, self.checkpoint_path)
+
+    def load(self) -> int:
+        """Diskteki durumları geri yükle; yüklenen sembol sayısını döndür"""
+        if not self.checkpoint_path.exists():
+            return 0
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                data = _none_to_nan(json.load(f))
+            streams = {symbol: StreamingIndicatorSet.restore(state) for symbol, state in data.items()}
+        except Exception as e:
+            print(f"İndikatör akış durumu yüklenemedi: {e}")
+            return 0
+        with self._lock:
+            self._streams.update(streams)
+        return len(streams)
+
+
+def _nan_to_none(value):
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, dict):
+        return {k: _nan_to_none(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_nan_to_none(v) for v in value]
+    return value
+
+
+def _none_to_nan(value):
+    if value is None:
+        return NAN
+    if isinstance(value, dict):
+        return {k: (v if k == 'last_timestamp' else _none_to_nan(v)) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_none_to_nan(v) for v in value]
+    return value
+
+
+# Süreç genelinde paylaşılan tek örnek
+indicator_streams = IndicatorStreams()
+
+
+def refresh_universe(symbols: List[str], days: int = 300) -> Dict[str, Dict[str, float]]:
+    """Sembol listesinin barlarını tek toplu istekle alıp tüm akışları güncelle
+
+    Akış durumu ilk ısınmanın başlangıç barına bağlı kalır; pencere kaydıkça yalnızca
+    yeni barlar beslenir (SMA/Bollinger/ATR/Williams birebir, EWM tabanlılar ihmal
+    edilebilir farkla aynı).
+    """
+    from market_data import market_data_service
+
+    frames, failed = market_data_service.get_histories(symbols, days=days)
+    return {symbol: indicator_streams.refresh(symbol, df) for symbol, df in frames.items()}
@@ -0,0 +1,117 @@
+# symbol_resolver.py
+# Kullanıcının yazdığı hisse kodlarını çalışan Yahoo sembolüne eşleyen kalıcı tablo
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+
+class SymbolResolver:
+    """Her kod için hangi sembol varyantının (X.IS, X, ...) veri döndürdüğünü hatırlar
+
+    Çözülmüş kodlar doğrudan doğru sembolle sorgulanır. Hiçbir varyantı çalışmayan
+    kodlar negatif önbelleğe alınır ve SYMBOL_NEGATIVE_TTL süresince tekrar denenmez;
+    süre kısa tutulur çünkü boş cevap geçici bir ağ sorunundan da kaynaklanabilir.
+    """
+
+    def __init__(self, path: Optional[str] = None, negative_ttl: Optional[int] = None):
+        self.path = Path(path or os.getenv('SYMBOL_CACHE_PATH', 'data/symbol_map.json'))
+        self.negative_ttl = negative_ttl if negative_ttl is not None else int(os.getenv('SYMBOL_NEGATIVE_TTL', 3600))
+        self._lock = threading.Lock()
+        self._resolved: Dict[str, str] = {}
+        self._unknown: Dict[str, float] = {}
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._resolved = data.get('resolved', {})
+            self._unknown = data.get('unknown', {})
+        except Exception as e:
+            print(f"Sembol tablosu okunamadı: {e}")
+
+    def _save(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.path.with_suffix('.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'resolved': self._resolved, 'unknown': self._unknown}, f, indent=2)
+            os.replace(tmp_file, self.path)
+        except Exception as e:
+            print(f"Sembol tablosu kaydedilemedi: {e}")
+
+    def lookup(self, code: str) -> Optional[str]:
+        """Daha önce çözülmüş sembolü döndür"""
+        with self._lock:
+            return self._resolved.get(code.upper())
+
+    def is_unknown(self, code: str) -> bool:
+        with self._lock:
+            failed_at = self._unknown.get(code.upper())
+            return failed_at is not None and time.time() - failed_at < self.negative_ttl
+
+    def remember(self, code: str, ticker: str):
+        key = code.upper()
+        with self._lock:
+            if self._resolved.get(key) == ticker and key not in self._unknown:
+                return
+            self._resolved[key] = ticker
+            self._unknown.pop(key, None)
+            self._save()
+
+    def mark_unknown(self, code: str):
+        key = code.upper()
+        with self._lock:
+            self._resolved.pop(key, None)
+            self._unknown[key] = time.time()
+            self._save()
+
+    def resolve(self, code: str, variants: List[str],
+                fetch: Callable[[str], Optional[pd.DataFrame]]) -> Tuple[Optional[str], Optional[pd.DataFrame]]:
+        """Kodu çalışan sembole çözüp verisini döndür: (sembol, df) ya da (None, None)
+
+        Önce hatırlanan sembol denenir; çalışmazsa varyantlar sırayla denenir.
+        """
+        if self.is_unknown(code):
+            print(f"Bilinmeyen hisse kodu (negatif önbellek): {code}")
+            return None, None
+
+        candidates = list(dict.fromkeys(variants))
+        cached = self.lookup(code)
+        if cached:
+            candidates = [cached] + [ticker for ticker in candidates if ticker != cached]
+
+        for ticker in candidates:
+            try:
+                df = fetch(ticker)
+            except Exception as e:
+                print(f"Sembol denemesi başarısız ({ticker}): {e}")
+                continue
+            if df is not None and not df.empty:
+                self.remember(code, ticker)
+                return ticker, df
+
+        # Daha önce çözülmüş bir kod boş pencere ya da geçici hata yüzünden kara listeye alınmaz
+        if not cached:
+            self.mark_unknown(code)
+        return None, None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            now = time.time()
+            return {
+                'resolved': len(self._resolved),
+                'unknown': sum(1 for failed_at in self._unknown.values() if now - failed_at < self.negative_ttl)
+            }
+
+
+# Süreç genelinde paylaşılan tek örnek
+symbol_resolver = SymbolResolver()
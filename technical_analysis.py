@@ -1,5 +1,4 @@
 import google.generativeai as genai
-import yfinance as yf
 import pandas as pd
 import numpy as np
 import plotly.graph_objects as go
@@ -15,6 +14,14 @@ import tempfile
 import os
 from datetime import datetime, timedelta
 from finta import TA
+from market_data import market_data_service
+from indicators import compute_indicators
+from chart_cache import chart_cache
+from chart_renderer import PANELS, chart_renderer, series_from_frame
+from chart_data import encode_panel
+from code_sandbox import code_sandbox
+from code_cache import code_cache
+from llm_gateway import llm_gateway
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -27,6 +34,45 @@ if GOOGLE_API_KEY:
 else:
     print("  Gemini API anahtarı bulunamadı. .env dosyasında GOOGLE_API_KEY veya GEMINI_API_KEY tanımlayın.")
 
+# Üretilen analiz koduna hazır verilen adlar (df paylaşılan bellekle aktarılır)
+GENERATED_CODE_NAMES = ['pd', 'np', 'go', 'px', 'make_subplots', 'plt', 'sns', 'io', 'base64', 'json',
+                        'datetime', 'timedelta', 'TA']
+
+# Grafik türüne göre çizim ayarları (önbellek anahtarının parçası: değişince eski PNG'ler kullanılmaz)
+CHART_SETTINGS = {
+    'default': {'dpi': 150, 'facecolor': '#1e293b', 'style': 'dashboard', 'layout': 'composite'},
+    'rsi': {'dpi': 150, 'facecolor': '#1e293b', 'style': 'dashboard'},
+    'macd': {'dpi': 150, 'facecolor': '#1e293b', 'style': 'dashboard'},
+    'bollinger': {'dpi': 300, 'facecolor': '#1e1e1e', 'style': 'detail'},
+    'sma': {'dpi': 300, 'facecolor': '#1e1e1e', 'style': 'detail'},
+    'volume': {'dpi': 300, 'facecolor': '#1e1e1e', 'style': 'detail'},
+    'price': {'dpi': 300, 'facecolor': '#1e1e1e', 'style': 'detail'},
+}
+
+# Grafik türüne göre paneller: (panel türü, başlık, grafik tipi, görsel alt metni)
+CHART_PANELS = {
+    'default': [
+        ('price_sma', 'Fiyat Grafiği ve Hareketli Ortalamalar', 'candlestick', 'Fiyat Grafiği'),
+        ('rsi', 'RSI Analizi', 'line', 'RSI Grafiği'),
+        ('macd', 'MACD Analizi', 'line', 'MACD Grafiği'),
+        ('bollinger', 'Bollinger Bands Analizi', 'line', 'Bollinger Bands Grafiği'),
+    ],
+    'rsi': [('rsi', 'RSI Analizi', 'line', 'RSI Grafiği')],
+    'macd': [('macd', 'MACD Analizi', 'line', 'MACD Grafiği')],
+    'bollinger': [('bollinger', 'Bollinger Bands Analizi', 'line', 'Bollinger Bands Grafiği')],
+    'sma': [('sma', 'Hareketli Ortalamalar', 'line', 'SMA Grafiği')],
+    'volume': [('volume', 'İşlem Hacmi', 'bar', 'Hacim Grafiği')],
+    'price': [('price', 'KCHOL Fiyat Grafiği', 'line', 'Fiyat Grafiği')],
+}
+
+# Grafik modu: 'data' -> seriler + grafik tanımı gönderilir, tarayıcı çizer; 'png' -> sunucuda çizilen PNG
+CHART_MODES = ('data', 'png')
+CHART_MODE = os.getenv('CHART_MODE', 'data')
+
+# Grafik türüne göre çizilen sütunlar (önbellek anahtarı yalnızca bu veri diliminden üretilir)
+CHART_COLUMNS = {kind: sorted({column for panel in panels for column in PANELS[panel[0]][2]})
+                 for kind, panels in CHART_PANELS.items()}
+
 class TechnicalAnalysisEngine:
     def __init__(self):
         self.model = None
@@ -36,82 +82,16 @@ class TechnicalAnalysisEngine:
             except Exception as e:
                 print(f"Gemini model yüklenirken hata: {e}")
     
-    def get_stock_data(self, symbol='KCHOL.IS', days=300):
-        """Hisse verisi al ve teknik indikatörleri hesapla"""
+    def get_stock_data(self, symbol='KCHOL.IS', days=300, indicators=None):
+        """Hisse verisi al ve teknik indikatörleri hesapla (indicators verilirse yalnızca onlar)"""
         try:
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=days)
-            
-            df = yf.download(symbol, start_date, end_date, progress=False)
-            
-            if df.empty:
+            df = market_data_service.get_history(symbol, days=days)
+
+            if df is None:
                 return None
-            
-            # Sütun isimlerini düzenleme - MultiIndex kontrolü
-            if isinstance(df.columns, pd.MultiIndex):
-                df.columns = [col[0] for col in df.columns]
-            
-            # Teknik indikatörler - sütun isimlerini küçük harfe çevir
-            df.columns = [col.lower() for col in df.columns]
-            
-            # Teknik indikatörler
-            df['SMA20'] = TA.SMA(df, 20)
-            df['SMA50'] = TA.SMA(df, 50)
-            df['SMA200'] = TA.SMA(df, 200)
-            df['RSI'] = TA.RSI(df)
-            
-            # MACD hesaplama
-            try:
-                macd_data = TA.MACD(df)
-                df['MACD'] = macd_data['MACD']
-                # MACD signal hesapla (9 günlük EMA)
-                df['MACD_Signal'] = df['MACD'].rolling(window=9).mean()
-            except Exception as e:
-                print(f"MACD hesaplama hatası: {e}")
-                # Basit MACD hesaplama
-                ema12 = df['close'].ewm(span=12).mean()
-                ema26 = df['close'].ewm(span=26).mean()
-                df['MACD'] = ema12 - ema26
-                df['MACD_Signal'] = df['MACD'].ewm(span=9).mean()
-            
-            # Bollinger Bands hesaplama
-            bb_data = TA.BBANDS(df)
-            df['BB_Upper'] = bb_data['BB_UPPER']
-            df['BB_Lower'] = bb_data['BB_LOWER']
-            df['BB_Middle'] = bb_data['BB_MIDDLE']
-            
-            df['ATR'] = TA.ATR(df)
-            df['Williams'] = TA.WILLIAMS(df)
-            
-            # NaN değerleri temizleme - sadece temel sütunlarda
-            basic_columns = ['close', 'high', 'low', 'open', 'volume']
-            df_clean = df[basic_columns].dropna()
-            
-            # Teknik indikatörleri sadece mevcut olanlarla ekle
-            if 'SMA20' in df.columns:
-                df_clean['SMA20'] = df['SMA20']
-            if 'SMA50' in df.columns:
-                df_clean['SMA50'] = df['SMA50']
-            if 'SMA200' in df.columns:
-                df_clean['SMA200'] = df['SMA200']
-            if 'RSI' in df.columns:
-                df_clean['RSI'] = df['RSI']
-            if 'MACD' in df.columns:
-                df_clean['MACD'] = df['MACD']
-            if 'MACD_Signal' in df.columns:
-                df_clean['MACD_Signal'] = df['MACD_Signal']
-            if 'BB_Upper' in df.columns:
-                df_clean['BB_Upper'] = df['BB_Upper']
-            if 'BB_Lower' in df.columns:
-                df_clean['BB_Lower'] = df['BB_Lower']
-            if 'BB_Middle' in df.columns:
-                df_clean['BB_Middle'] = df['BB_Middle']
-            if 'ATR' in df.columns:
-                df_clean['ATR'] = df['ATR']
-            if 'Williams' in df.columns:
-                df_clean['Williams'] = df['Williams']
-            
-            return df_clean
+
+            # Teknik indikatörler (ortak indikatör motoru, sembol/bar başına bir kez hesaplanır)
+            return compute_indicators(df, symbol, columns=indicators)
         except Exception as e:
             print(f"Veri alma hatası: {e}")
             return None
@@ -142,9 +122,9 @@ Mevcut veri:
 Gereksinimler:
 1. Sadece Python kodu yaz, açıklama ekleme
 2. DataFrame 'df' olarak mevcut
-3. Plotly kullanarak interaktif grafikler oluştur
-4. Grafikleri base64 formatında encode et
-5. Sonuçları JSON formatında döndür
+3. Grafikleri matplotlib (plt) ile çiz, PNG olarak base64 formatında encode et
+4. Sonucu aşağıdaki formatta sözlük olarak 'result' değişkenine ata
+5. Dosya, ağ ya da import kullanma; pd, np, plt, io, base64, json, datetime hazır
 6. Türkçe etiketler kullan
 7. Modern ve güzel görünümlü grafikler yap
 
@@ -171,796 +151,147 @@ Kod:
             return None, f"Kod üretme hatası: {e}"
     
     def execute_python_code(self, code, df):
-        """Python kodunu güvenli bir şekilde çalıştır"""
-        try:
-            # Geçici dosya oluştur
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-                f.write(code)
-                temp_file = f.name
-            
-            # Güvenli çalışma ortamı oluştur
-            safe_globals = {
-                'df': df,
-                'pd': pd,
-                'np': np,
-                'go': go,
-                'px': px,
-                'make_subplots': make_subplots,
-                'plt': plt,
-                'sns': sns,
-                'io': io,
-                'base64': base64,
-                'json': json,
-                'datetime': datetime,
-                'timedelta': timedelta,
-                'TA': TA
-            }
-            
-            # Kodu çalıştır
-            exec(code, safe_globals)
-            
-            # Sonuçları al
-            result = safe_globals.get('result', {})
-            
-            # Geçici dosyayı sil
-            os.unlink(temp_file)
-            
-            return result, None
-            
-        except Exception as e:
-            return None, f"Kod çalıştırma hatası: {e}"
+        """Python kodunu sınırlı (CPU süresi, duvar saati, bellek) sanal alan sürecinde çalıştır"""
+        outcome = code_sandbox.run(code, {'df': df}, 'result', GENERATED_CODE_NAMES)
+        if outcome['status'] != 'ok':
+            return None, f"Kod çalıştırma hatası ({outcome['status']}): {outcome['error']}"
+        return outcome['result'] or {}, None
     
-    def create_default_charts(self, df):
-        """Varsayılan teknik analiz grafikleri oluştur"""
-        try:
-            charts = []
-            
-            # 1. Mum grafiği ve SMA'lar - Sadece Matplotlib kullan
-            
-            # Grafiği HTML formatında kaydet
-            try:
-                # Matplotlib ile grafik oluştur
-                import matplotlib.pyplot as plt
-                import matplotlib.dates as mdates
-                import base64
-                import io
-                
-                # Grafik boyutunu ayarla
-                fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 8), gridspec_kw={'height_ratios': [3, 1]})
-                
-                # Mum grafiği
-                ax1.plot(df.index, df['close'], color='white', linewidth=1, alpha=0.7)
-                ax1.plot(df.index, df['SMA20'], color='orange', linewidth=1, label='SMA 20')
-                ax1.plot(df.index, df['SMA50'], color='blue', linewidth=1, label='SMA 50')
-                ax1.plot(df.index, df['SMA200'], color='red', linewidth=1, label='SMA 200')
-                
-                ax1.set_title('KCHOL Teknik Analiz - Fiyat ve Hareketli Ortalamalar', color='white', fontsize=14)
-                ax1.set_ylabel('Fiyat (TL)', color='white')
-                ax1.legend()
-                ax1.grid(True, alpha=0.3)
-                ax1.set_facecolor('#1e293b')
-                fig.patch.set_facecolor('#1e293b')
-                
-                # Hacim grafiği
-                ax2.bar(df.index, df['volume'], color='blue', alpha=0.3)
-                ax2.set_ylabel('Hacim', color='white')
-                ax2.set_xlabel('Tarih', color='white')
-                ax2.grid(True, alpha=0.3)
-                ax2.set_facecolor('#1e293b')
-                
-                # Tarih formatını ayarla
-                ax2.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
-                ax2.xaxis.set_major_locator(mdates.DayLocator(interval=7))
-                plt.setp(ax2.xaxis.get_majorticklabels(), rotation=45)
-                
-                # Grafik renklerini ayarla
-                for ax in [ax1, ax2]:
-                    ax.tick_params(colors='white')
-                    ax.spines['bottom'].set_color('white')
-                    ax.spines['top'].set_color('white')
-                    ax.spines['left'].set_color('white')
-                    ax.spines['right'].set_color('white')
-                
-                # Grafiği base64'e çevir
-                buffer = io.BytesIO()
-                plt.tight_layout()
-                plt.savefig(buffer, format='png', dpi=150, bbox_inches='tight', facecolor='#1e293b')
-                buffer.seek(0)
-                img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-                plt.close()
-                
-                # HTML img tag'i oluştur
-                img_html = f'<img src="data:image/png;base64,{img_base64}" alt="Fiyat Grafiği" style="width:100%; height:auto; border-radius:8px;">'
-                img_base64 = img_html
-                
-            except Exception as e:
-                print(f"Matplotlib grafik hatası: {e}")
-                img_base64 = "<div style='color:red; padding:20px; text-align:center;'>Grafik yüklenemedi</div>"
-            
-            charts.append({
-                "title": "Fiyat Grafiği ve Hareketli Ortalamalar",
-                "type": "candlestick",
-                "data": img_base64
-            })
-            
-            # 2. RSI Grafiği - Sadece Matplotlib kullan
-            
-            try:
-                # Matplotlib ile RSI grafiği oluştur
-                import matplotlib.pyplot as plt
-                import matplotlib.dates as mdates
-                import base64
-                import io
-                
-                # Grafik oluştur
-                fig, ax = plt.subplots(figsize=(12, 6))
-                
-                # RSI çizgisi
-                ax.plot(df.index, df['RSI'], color='purple', linewidth=2, label='RSI')
-                
-                # Seviye çizgileri
-                ax.axhline(y=70, color='red', linestyle='--', alpha=0.7, label='Aşırı Alım (70)')
-                ax.axhline(y=30, color='green', linestyle='--', alpha=0.7, label='Aşırı Satım (30)')
-                ax.axhline(y=50, color='gray', linestyle=':', alpha=0.5, label='Nötr (50)')
-                
-                ax.set_title('RSI (Relative Strength Index)', color='white', fontsize=14)
-                ax.set_ylabel('RSI', color='white')
-                ax.set_xlabel('Tarih', color='white')
-                ax.legend()
-                ax.grid(True, alpha=0.3)
-                ax.set_facecolor('#1e293b')
-                fig.patch.set_facecolor('#1e293b')
-                
-                # Tarih formatını ayarla
-                ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
-                ax.xaxis.set_major_locator(mdates.DayLocator(interval=7))
-                plt.setp(ax.xaxis.get_majorticklabels(), rotation=45)
-                
-                # Grafik renklerini ayarla
-                ax.tick_params(colors='white')
-                ax.spines['bottom'].set_color('white')
-                ax.spines['top'].set_color('white')
-                ax.spines['left'].set_color('white')
-                ax.spines['right'].set_color('white')
-                
-                # Grafiği base64'e çevir
-                buffer = io.BytesIO()
-                plt.tight_layout()
-                plt.savefig(buffer, format='png', dpi=150, bbox_inches='tight', facecolor='#1e293b')
-                buffer.seek(0)
-                img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-                plt.close()
-                
-                # HTML img tag'i oluştur
-                img_html = f'<img src="data:image/png;base64,{img_base64}" alt="RSI Grafiği" style="width:100%; height:auto; border-radius:8px;">'
-                img_base64 = img_html
-                
-            except Exception as e:
-                print(f"RSI Matplotlib grafik hatası: {e}")
-                img_base64 = "<div style='color:red; padding:20px; text-align:center;'>RSI Grafik yüklenemedi</div>"
-            
-            charts.append({
-                "title": "RSI Analizi",
-                "type": "line",
-                "data": img_base64
-            })
-            
-            # 3. MACD Grafiği - Sadece Matplotlib kullan
-            
+    def generate_and_execute(self, user_request, df):
+        """İsteğe kod üretip çalıştır; aynı (normalize) istek ve tablo yapısı için önbellekteki derlenmiş kodu kullan"""
+        errors = []
+
+        def generate():
+            text, error = self.generate_python_code(user_request, df)
+            if error:
+                errors.append(error)
+            return text
+
+        def run(code):
+            outcome = code_sandbox.run(code, {'df': df}, 'result', GENERATED_CODE_NAMES)
+            result = outcome['result']
+            # 'result' atamayan ya da grafik/analiz içermeyen kod önbelleğe alınmasın
+            if outcome['status'] == 'ok' and not (isinstance(result, dict)
+                                                  and (result.get('charts') or result.get('analysis'))):
+                return {**outcome, 'status': 'error', 'result': None,
+                        'error': "result grafik ya da analiz içeren bir sözlük değil"}
+            return outcome
+
+        outcome = code_cache.get_or_generate('technical', user_request, df, generate, run)
+        if outcome['status'] != 'ok':
+            return None, errors[0] if errors else f"Kod çalıştırma hatası ({outcome['status']}): {outcome['error']}"
+        return outcome['result'] or {}, None
+    
+    def custom_analysis(self, user_request, df):
+        """Hazır grafiklerin karşılamadığı istek için üretilen kodun çıktısı (charts/analysis/summary ya da None)"""
+        result, error = self.generate_and_execute(user_request, df)
+        if error or not isinstance(result, dict):
+            print(f"Özel analiz yapılamadı: {error or 'result sözlük değil'}")
+            return None
+        charts = []
+        for chart in result.get('charts') or []:
+            if not isinstance(chart, dict) or not chart.get('data'):
+                continue
+            data = str(chart['data'])
+            if not data.lstrip().startswith('<'):
+                data = f'<img src="data:image/png;base64,{data}" alt="{chart.get("title", "Grafik")}" style="width:100%; height:auto; border-radius:8px;">'
+            charts.append({"title": chart.get('title', 'Özel Analiz'), "type": chart.get('type', 'line'), "data": data})
+        return {"charts": charts, "analysis": str(result.get('analysis') or ''), "summary": str(result.get('summary') or '')}
+    
+    def _charts(self, kind, df, mode=None):
+        """Grafik türünü istenen modda üret (bilinmeyen mod CHART_MODE'a düşer)"""
+        mode = mode if mode in CHART_MODES else CHART_MODE
+        if mode == 'png':
+            return self._cached_charts(kind, df)
+        return self._series_charts(kind, df)
+    
+    def _series_charts(self, kind, df):
+        """Panellerin seyreltilmiş serilerini ve grafik tanımlarını döndür (PNG yerine, tarayıcıda çizilir)"""
+        charts = []
+        for panel, title, chart_type, alt in CHART_PANELS[kind]:
             try:
-                # Matplotlib ile MACD grafiği oluştur
-                import matplotlib.pyplot as plt
-                import matplotlib.dates as mdates
-                import base64
-                import io
-                
-                # Grafik oluştur
-                fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 8), gridspec_kw={'height_ratios': [2, 1]})
-                
-                # MACD çizgileri
-                ax1.plot(df.index, df['MACD'], color='blue', linewidth=2, label='MACD')
-                ax1.plot(df.index, df['MACD_Signal'], color='red', linewidth=2, label='Sinyal')
-                
-                ax1.set_title('MACD (Moving Average Convergence Divergence)', color='white', fontsize=14)
-                ax1.set_ylabel('MACD', color='white')
-                ax1.legend()
-                ax1.grid(True, alpha=0.3)
-                ax1.set_facecolor('#1e293b')
-                
-                # Histogram
-                histogram = df['MACD'] - df['MACD_Signal']
-                colors = ['green' if x >= 0 else 'red' for x in histogram]
-                ax2.bar(df.index, histogram, color=colors, alpha=0.7, label='Histogram')
-                ax2.set_ylabel('Histogram', color='white')
-                ax2.set_xlabel('Tarih', color='white')
-                ax2.grid(True, alpha=0.3)
-                ax2.set_facecolor('#1e293b')
-                
-                # Tarih formatını ayarla
-                ax2.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
-                ax2.xaxis.set_major_locator(mdates.DayLocator(interval=7))
-                plt.setp(ax2.xaxis.get_majorticklabels(), rotation=45)
-                
-                # Grafik renklerini ayarla
-                for ax in [ax1, ax2]:
-                    ax.tick_params(colors='white')
-                    ax.spines['bottom'].set_color('white')
-                    ax.spines['top'].set_color('white')
-                    ax.spines['left'].set_color('white')
-                    ax.spines['right'].set_color('white')
-                
-                fig.patch.set_facecolor('#1e293b')
-                
-                # Grafiği base64'e çevir
-                buffer = io.BytesIO()
-                plt.tight_layout()
-                plt.savefig(buffer, format='png', dpi=150, bbox_inches='tight', facecolor='#1e293b')
-                buffer.seek(0)
-                img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-                plt.close()
-                
-                # HTML img tag'i oluştur
-                img_html = f'<img src="data:image/png;base64,{img_base64}" alt="MACD Grafiği" style="width:100%; height:auto; border-radius:8px;">'
-                img_base64 = img_html
-                
-            except Exception as e:
-                print(f"MACD Matplotlib grafik hatası: {e}")
-                img_base64 = "<div style='color:red; padding:20px; text-align:center;'>MACD Grafik yüklenemedi</div>"
-            
-            charts.append({
-                "title": "MACD Analizi",
-                "type": "line",
-                "data": img_base64
-            })
-            
-            # 4. Bollinger Bands Grafiği - Sadece Matplotlib kullan
-            
+                charts.append({"title": title, "type": chart_type, **encode_panel(panel, df)})
+            except KeyError as e:
+                print(f"{alt} için eksik sütun: {e}")
+                charts.append({"title": title, "type": chart_type,
+                               "data": f"<div style='color:red; padding:20px; text-align:center;'>{alt} yüklenemedi</div>"})
+        return charts
+    
+    def _cached_charts(self, kind, df):
+        """Aynı veri dilimi ve ayarlar için daha önce üretilmiş grafikleri döndür, yoksa çiz"""
+        return chart_cache.get_or_render(kind, df, CHART_COLUMNS[kind], CHART_SETTINGS[kind],
+                                         lambda frame: self._render_panels(kind, frame))
+    
+    def _render_panels(self, kind, df):
+        """Grafik türünün panellerini çizim servisine gönder
+
+        layout='composite' ayarlı türlerde (varsayılan set) paneller ortak x eksenli tek
+        figürde tek geçişte çizilip kesilir; diğerlerinde paneller ayrı işler olarak
+        paralel çizilir ve hatalar panele özeldir.
+        """
+        settings = CHART_SETTINGS[kind]
+        panels = CHART_PANELS[kind]
+        error_html = "<div style='color:red; padding:20px; text-align:center;'>{} yüklenemedi</div>"
+        charts = [{"title": title, "type": chart_type, "data": None} for _, title, chart_type, _ in panels]
+        
+        results = None
+        if settings.get('layout') == 'composite':
             try:
-                # Matplotlib ile Bollinger Bands grafiği oluştur
-                import matplotlib.pyplot as plt
-                import matplotlib.dates as mdates
-                import base64
-                import io
-                
-                # Grafik oluştur
-                fig, ax = plt.subplots(figsize=(12, 6))
-                
-                # Fiyat ve bantlar
-                ax.plot(df.index, df['close'], color='white', linewidth=2, label='Fiyat')
-                ax.plot(df.index, df['BB_Upper'], color='red', linewidth=1, linestyle='--', label='Üst Bant')
-                ax.plot(df.index, df['BB_Lower'], color='green', linewidth=1, linestyle='--', label='Alt Bant')
-                ax.plot(df.index, df['BB_Middle'], color='blue', linewidth=1, label='Orta Bant')
-                
-                # Bantları doldur
-                ax.fill_between(df.index, df['BB_Upper'], df['BB_Lower'], alpha=0.1, color='gray')
-                
-                ax.set_title('Bollinger Bands', color='white', fontsize=14)
-                ax.set_ylabel('Fiyat (TL)', color='white')
-                ax.set_xlabel('Tarih', color='white')
-                ax.legend()
-                ax.grid(True, alpha=0.3)
-                ax.set_facecolor('#1e293b')
-                fig.patch.set_facecolor('#1e293b')
-                
-                # Tarih formatını ayarla
-                ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
-                ax.xaxis.set_major_locator(mdates.DayLocator(interval=7))
-                plt.setp(ax.xaxis.get_majorticklabels(), rotation=45)
-                
-                # Grafik renklerini ayarla
-                ax.tick_params(colors='white')
-                ax.spines['bottom'].set_color('white')
-                ax.spines['top'].set_color('white')
-                ax.spines['left'].set_color('white')
-                ax.spines['right'].set_color('white')
-                
-                # Grafiği base64'e çevir
-                buffer = io.BytesIO()
-                plt.tight_layout()
-                plt.savefig(buffer, format='png', dpi=150, bbox_inches='tight', facecolor='#1e293b')
-                buffer.seek(0)
-                img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-                plt.close()
-                
-                # HTML img tag'i oluştur
-                img_html = f'<img src="data:image/png;base64,{img_base64}" alt="Bollinger Bands Grafiği" style="width:100%; height:auto; border-radius:8px;">'
-                img_base64 = img_html
-                
-            except Exception as e:
-                print(f"Bollinger Bands Matplotlib grafik hatası: {e}")
-                img_base64 = "<div style='color:red; padding:20px; text-align:center;'>Bollinger Bands Grafik yüklenemedi</div>"
-            
-            charts.append({
-                "title": "Bollinger Bands Analizi",
-                "type": "line",
-                "data": img_base64
-            })
-            
-            return charts
-            
-        except Exception as e:
-            print(f"Varsayılan grafik oluşturma hatası: {e}")
-            return []
+                series = series_from_frame(df, CHART_COLUMNS[kind])
+                results = chart_renderer.render_composite([panel[0] for panel in panels], series, settings)
+            except KeyError as e:
+                # Eksik sütun: paneller ayrı ayrı çizilir, yalnızca etkilenen panel hata gösterir
+                print(f"Birleşik grafik için eksik sütun: {e}")
+        
+        if results is None:
+            jobs, slots = [], []
+            for i, (panel, _, _, alt) in enumerate(panels):
+                try:
+                    jobs.append((panel, series_from_frame(df, PANELS[panel][2]), settings))
+                    slots.append(i)
+                except KeyError as e:
+                    print(f"{alt} için eksik sütun: {e}")
+                    charts[i]["data"] = error_html.format(alt)
+            results = dict(zip(slots, chart_renderer.render(jobs)))
+        else:
+            results = dict(enumerate(results))
+        
+        for i, (image, error) in results.items():
+            alt = panels[i][3]
+            if error:
+                print(f"{alt} çizim hatası: {error}")
+                charts[i]["data"] = error_html.format(alt)
+            else:
+                charts[i]["data"] = f'<img src="data:image/png;base64,{image}" alt="{alt}" style="width:100%; height:auto; border-radius:8px;">'
+        return charts
+    
+    def create_default_charts(self, df, mode=None):
+        """Varsayılan teknik analiz grafikleri oluştur"""
+        return self._charts('default', df, mode)
     
-    def create_rsi_chart(self, df):
+    def create_rsi_chart(self, df, mode=None):
         """Sadece RSI grafiği oluştur"""
-        try:
-            charts = []
-            
-            # Matplotlib ile RSI grafiği oluştur
-            import matplotlib.pyplot as plt
-            import matplotlib.dates as mdates
-            import base64
-            import io
-            
-            # Grafik oluştur
-            fig, ax = plt.subplots(figsize=(12, 6))
-            
-            # RSI çizgisi
-            ax.plot(df.index, df['RSI'], color='purple', linewidth=2, label='RSI')
-            
-            # Seviye çizgileri
-            ax.axhline(y=70, color='red', linestyle='--', alpha=0.7, label='Aşırı Alım (70)')
-            ax.axhline(y=30, color='green', linestyle='--', alpha=0.7, label='Aşırı Satım (30)')
-            ax.axhline(y=50, color='gray', linestyle=':', alpha=0.5, label='Nötr (50)')
-            
-            ax.set_title('RSI (Relative Strength Index)', color='white', fontsize=14)
-            ax.set_ylabel('RSI', color='white')
-            ax.set_xlabel('Tarih', color='white')
-            ax.legend()
-            ax.grid(True, alpha=0.3)
-            ax.set_facecolor('#1e293b')
-            fig.patch.set_facecolor('#1e293b')
-            
-            # Tarih formatını ayarla
-            ax.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
-            ax.xaxis.set_major_locator(mdates.DayLocator(interval=7))
-            plt.setp(ax.xaxis.get_majorticklabels(), rotation=45)
-            
-            # Grafik renklerini ayarla
-            ax.tick_params(colors='white')
-            ax.spines['bottom'].set_color('white')
-            ax.spines['top'].set_color('white')
-            ax.spines['left'].set_color('white')
-            ax.spines['right'].set_color('white')
-            
-            # Grafiği base64'e çevir
-            buffer = io.BytesIO()
-            plt.tight_layout()
-            plt.savefig(buffer, format='png', dpi=150, bbox_inches='tight', facecolor='#1e293b')
-            buffer.seek(0)
-            img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-            plt.close()
-            
-            # HTML img tag'i oluştur
-            img_html = f'<img src="data:image/png;base64,{img_base64}" alt="RSI Grafiği" style="width:100%; height:auto; border-radius:8px;">'
-            
-            charts.append({
-                "title": "RSI Analizi",
-                "type": "line",
-                "data": img_html
-            })
-            
-            return charts
-            
-        except Exception as e:
-            print(f"RSI grafik oluşturma hatası: {e}")
-            return []
+        return self._charts('rsi', df, mode)
     
-    def create_macd_chart(self, df):
+    def create_macd_chart(self, df, mode=None):
         """Sadece MACD grafiği oluştur"""
-        try:
-            charts = []
-            
-            # Matplotlib ile MACD grafiği oluştur
-            import matplotlib.pyplot as plt
-            import matplotlib.dates as mdates
-            import base64
-            import io
-            
-            # Grafik oluştur
-            fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 8), gridspec_kw={'height_ratios': [2, 1]})
-            
-            # MACD çizgileri
-            ax1.plot(df.index, df['MACD'], color='blue', linewidth=2, label='MACD')
-            ax1.plot(df.index, df['MACD_Signal'], color='red', linewidth=2, label='Sinyal')
-            
-            ax1.set_title('MACD (Moving Average Convergence Divergence)', color='white', fontsize=14)
-            ax1.set_ylabel('MACD', color='white')
-            ax1.legend()
-            ax1.grid(True, alpha=0.3)
-            ax1.set_facecolor('#1e293b')
-            
-            # Histogram
-            histogram = df['MACD'] - df['MACD_Signal']
-            colors = ['green' if x >= 0 else 'red' for x in histogram]
-            ax2.bar(df.index, histogram, color=colors, alpha=0.7, label='Histogram')
-            ax2.set_ylabel('Histogram', color='white')
-            ax2.set_xlabel('Tarih', color='white')
-            ax2.grid(True, alpha=0.3)
-            ax2.set_facecolor('#1e293b')
-            
-            # Tarih formatını ayarla
-            ax2.xaxis.set_major_formatter(mdates.DateFormatter('%d/%m'))
-            ax2.xaxis.set_major_locator(mdates.DayLocator(interval=7))
-            plt.setp(ax2.xaxis.get_majorticklabels(), rotation=45)
-            
-            # Grafik renklerini ayarla
-            for ax in [ax1, ax2]:
-                ax.tick_params(colors='white')
-                ax.spines['bottom'].set_color('white')
-                ax.spines['top'].set_color('white')
-                ax.spines['left'].set_color('white')
-                ax.spines['right'].set_color('white')
-            
-            fig.patch.set_facecolor('#1e293b')
-            
-            # Grafiği base64'e çevir
-            buffer = io.BytesIO()
-            plt.tight_layout()
-            plt.savefig(buffer, format='png', dpi=150, bbox_inches='tight', facecolor='#1e293b')
-            buffer.seek(0)
-            img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-            plt.close()
-            
-            # HTML img tag'i oluştur
-            img_html = f'<img src="data:image/png;base64,{img_base64}" alt="MACD Grafiği" style="width:100%; height:auto; border-radius:8px;">'
-            
-            charts.append({
-                "title": "MACD Analizi",
-                "type": "line",
-                "data": img_html
-            })
-            
-            return charts
-            
-        except Exception as e:
-            print(f"MACD grafik oluşturma hatası: {e}")
-            return []
+        return self._charts('macd', df, mode)
     
-    def create_bollinger_chart(self, df):
+    def create_bollinger_chart(self, df, mode=None):
         """Sadece Bollinger Bands grafiği oluştur"""
-        try:
-            charts = []
-            
-            # Bollinger Bands Grafiği
-            fig = go.Figure()
-            
-            fig.add_trace(go.Scatter(
-                x=df.index, y=df['close'],
-                mode='lines', name='Fiyat',
-                line=dict(color='white', width=2)
-            ))
-            
-            fig.add_trace(go.Scatter(
-                x=df.index, y=df['BB_Upper'],
-                mode='lines', name='Üst Bant',
-                line=dict(color='red', width=1, dash='dash')
-            ))
-            
-            fig.add_trace(go.Scatter(
-                x=df.index, y=df['BB_Lower'],
-                mode='lines', name='Alt Bant',
-                line=dict(color='green', width=1, dash='dash'),
-                fill='tonexty'
-            ))
-            
-            fig.add_trace(go.Scatter(
-                x=df.index, y=df['BB_Middle'],
-                mode='lines', name='Orta Bant',
-                line=dict(color='blue', width=1)
-            ))
-            
-            fig.update_layout(
-                title='Bollinger Bands',
-                xaxis_title='Tarih',
-                yaxis_title='Fiyat (TL)',
-                height=400,
-                template='plotly_dark'
-            )
-            
-            try:
-                # Matplotlib ile Bollinger Bands grafiği oluştur
-                import matplotlib.pyplot as plt
-                import matplotlib.dates as mdates
-                import base64
-                import io
-                
-                # Grafik oluştur
-                fig, ax = plt.subplots(figsize=(12, 6))
-                
-                # Fiyat ve bantlar
-                ax.plot(df.index, df['close'], color='white', linewidth=2, label='Fiyat')
-                ax.plot(df.index, df['BB_Upper'], color='red', linewidth=1, linestyle='--', label='Üst Bant')
-                ax.plot(df.index, df['BB_Lower'], color='green', linewidth=1, linestyle='--', label='Alt Bant')
-                ax.plot(df.index, df['BB_Middle'], color='blue', linewidth=1, label='Orta Bant')
-                
-                # Alt bantları doldur
-                ax.fill_between(df.index, df['BB_Lower'], df['BB_Upper'], alpha=0.3, color='gray')
-                
-                # Grafik ayarları
-                ax.set_title('Bollinger Bands', color='white', fontsize=14, fontweight='bold')
-                ax.set_xlabel('Tarih', color='white', fontsize=12)
-                ax.set_ylabel('Fiyat', color='white', fontsize=12)
-                ax.grid(True, alpha=0.3)
-                ax.legend(loc='upper left')
-                
-                # Tarih formatı
-                ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-                plt.setp(ax.xaxis.get_majorticklabels(), rotation=45)
-                
-                # Arka plan rengi
-                ax.set_facecolor('#1e1e1e')
-                fig.patch.set_facecolor('#1e1e1e')
-                
-                # Eksen renkleri
-                ax.tick_params(colors='white')
-                ax.spines['top'].set_visible(False)
-                ax.spines['right'].set_visible(False)
-                ax.spines['bottom'].set_color('white')
-                ax.spines['left'].set_color('white')
-                
-                # Grafiği base64'e çevir
-                buffer = io.BytesIO()
-                plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight', facecolor='#1e1e1e')
-                buffer.seek(0)
-                img_base64 = base64.b64encode(buffer.getvalue()).decode()
-                buffer.close()
-                plt.close()
-                
-                img_base64 = f"<img src=\"data:image/png;base64,{img_base64}\" alt=\"Bollinger Bands Grafiği\" style=\"width:100%; height:auto; border-radius:8px;\">"
-                
-            except Exception as e:
-                print(f"Bollinger Bands grafik oluşturma hatası: {e}")
-                img_base64 = "<div style='color:red; padding:20px; text-align:center;'>Bollinger Bands Grafik yüklenemedi</div>"
-            
-            charts.append({
-                "title": "Bollinger Bands Analizi",
-                "type": "line",
-                "data": img_base64
-            })
-            
-            return charts
-            
-        except Exception as e:
-            print(f"Bollinger Bands grafik oluşturma hatası: {e}")
-            return []
+        return self._charts('bollinger', df, mode)
     
-    def create_sma_chart(self, df):
+    def create_sma_chart(self, df, mode=None):
         """Sadece SMA grafiği oluştur"""
-        try:
-            charts = []
-            
-            # SMA Grafiği
-            fig = go.Figure()
-            
-            fig.add_trace(go.Scatter(
-                x=df.index, y=df['close'],
-                mode='lines', name='Fiyat',
-                line=dict(color='white', width=2)
-            ))
-            
-            fig.add_trace(go.Scatter(
-                x=df.index, y=df['SMA20'],
-                mode='lines', name='SMA 20',
-                line=dict(color='orange', width=1)
-            ))
-            
-            fig.add_trace(go.Scatter(
-                x=df.index, y=df['SMA50'],
-                mode='lines', name='SMA 50',
-                line=dict(color='blue', width=1)
-            ))
-            
-            fig.add_trace(go.Scatter(
-                x=df.index, y=df['SMA200'],
-                mode='lines', name='SMA 200',
-                line=dict(color='red', width=1)
-            ))
-            
-            fig.update_layout(
-                title='Hareketli Ortalamalar',
-                xaxis_title='Tarih',
-                yaxis_title='Fiyat (TL)',
-                height=400,
-                template='plotly_dark'
-            )
-            
-            try:
-                # Matplotlib ile SMA grafiği oluştur
-                import matplotlib.pyplot as plt
-                import matplotlib.dates as mdates
-                import base64
-                import io
-                
-                # Grafik oluştur
-                fig, ax = plt.subplots(figsize=(12, 6))
-                
-                # Fiyat ve hareketli ortalamalar
-                ax.plot(df.index, df['close'], color='white', linewidth=2, label='Fiyat')
-                ax.plot(df.index, df['SMA20'], color='orange', linewidth=1, label='SMA 20')
-                ax.plot(df.index, df['SMA50'], color='blue', linewidth=1, label='SMA 50')
-                ax.plot(df.index, df['SMA200'], color='red', linewidth=1, label='SMA 200')
-                
-                # Grafik ayarları
-                ax.set_title('Hareketli Ortalamalar', color='white', fontsize=14, fontweight='bold')
-                ax.set_xlabel('Tarih', color='white', fontsize=12)
-                ax.set_ylabel('Fiyat', color='white', fontsize=12)
-                ax.grid(True, alpha=0.3)
-                ax.legend(loc='upper left')
-                
-                # Tarih formatı
-                ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-                plt.setp(ax.xaxis.get_majorticklabels(), rotation=45)
-                
-                # Arka plan rengi
-                ax.set_facecolor('#1e1e1e')
-                fig.patch.set_facecolor('#1e1e1e')
-                
-                # Eksen renkleri
-                ax.tick_params(colors='white')
-                ax.spines['top'].set_visible(False)
-                ax.spines['right'].set_visible(False)
-                ax.spines['bottom'].set_color('white')
-                ax.spines['left'].set_color('white')
-                
-                # Grafiği base64'e çevir
-                buffer = io.BytesIO()
-                plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight', facecolor='#1e1e1e')
-                buffer.seek(0)
-                img_base64 = base64.b64encode(buffer.getvalue()).decode()
-                buffer.close()
-                plt.close()
-                
-                img_base64 = f"<img src=\"data:image/png;base64,{img_base64}\" alt=\"SMA Grafiği\" style=\"width:100%; height:auto; border-radius:8px;\">"
-                
-            except Exception as e:
-                print(f"SMA grafik oluşturma hatası: {e}")
-                img_base64 = "<div style='color:red; padding:20px; text-align:center;'>SMA Grafik yüklenemedi</div>"
-            
-            charts.append({
-                "title": "Hareketli Ortalamalar",
-                "type": "line",
-                "data": img_base64
-            })
-            
-            return charts
-            
-        except Exception as e:
-            print(f"SMA grafik oluşturma hatası: {e}")
-            return []
+        return self._charts('sma', df, mode)
     
-    def create_volume_chart(self, df):
+    def create_volume_chart(self, df, mode=None):
         """Sadece hacim grafiği oluştur"""
-        try:
-            charts = []
-            
-            # Hacim Grafiği - Sadece Matplotlib kullan
-            
-            try:
-                # Matplotlib ile hacim grafiği oluştur
-                import matplotlib.dates as mdates
-                import base64
-                import io
-                
-                # Grafik oluştur
-                fig, ax = plt.subplots(figsize=(12, 6))
-                
-                # Hacim grafiği
-                ax.bar(df.index, df['volume'], color='blue', alpha=0.7, label='Hacim')
-                
-                # Grafik ayarları
-                ax.set_title('İşlem Hacmi', color='white', fontsize=14, fontweight='bold')
-                ax.set_xlabel('Tarih', color='white', fontsize=12)
-                ax.set_ylabel('Hacim', color='white', fontsize=12)
-                ax.grid(True, alpha=0.3)
-                ax.legend(loc='upper left')
-                
-                # Tarih formatı
-                ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-                plt.setp(ax.xaxis.get_majorticklabels(), rotation=45)
-                
-                # Arka plan rengi
-                ax.set_facecolor('#1e1e1e')
-                fig.patch.set_facecolor('#1e1e1e')
-                
-                # Eksen renkleri
-                ax.tick_params(colors='white')
-                ax.spines['top'].set_visible(False)
-                ax.spines['right'].set_visible(False)
-                ax.spines['bottom'].set_color('white')
-                ax.spines['left'].set_color('white')
-                
-                # Grafiği base64'e çevir
-                buffer = io.BytesIO()
-                plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight', facecolor='#1e1e1e')
-                buffer.seek(0)
-                img_base64 = base64.b64encode(buffer.getvalue()).decode()
-                buffer.close()
-                plt.close()
-                
-                img_base64 = f"<img src=\"data:image/png;base64,{img_base64}\" alt=\"Hacim Grafiği\" style=\"width:100%; height:auto; border-radius:8px;\">"
-                
-            except Exception as e:
-                print(f"Hacim Matplotlib grafik hatası: {e}")
-                img_base64 = "<div style='color:red; padding:20px; text-align:center;'>Hacim Grafik yüklenemedi</div>"
-            
-            charts.append({
-                "title": "İşlem Hacmi",
-                "type": "bar",
-                "data": img_base64
-            })
-            
-            return charts
-            
-        except Exception as e:
-            print(f"Hacim grafik oluşturma hatası: {e}")
-            return []
+        return self._charts('volume', df, mode)
     
-    def create_price_chart(self, df):
+    def create_price_chart(self, df, mode=None):
         """Sadece fiyat grafiği oluştur"""
-        try:
-            charts = []
-            
-            try:
-                # Matplotlib ile fiyat grafiği oluştur
-                import matplotlib.dates as mdates
-                import base64
-                import io
-                
-                # Grafik oluştur
-                fig, ax = plt.subplots(figsize=(12, 6))
-                
-                # Fiyat grafiği (çizgi olarak)
-                ax.plot(df.index, df['close'], color='white', linewidth=2, label='Fiyat')
-                
-                # Grafik ayarları
-                ax.set_title('KCHOL Fiyat Grafiği', color='white', fontsize=14, fontweight='bold')
-                ax.set_xlabel('Tarih', color='white', fontsize=12)
-                ax.set_ylabel('Fiyat (TL)', color='white', fontsize=12)
-                ax.grid(True, alpha=0.3)
-                ax.legend(loc='upper left')
-                
-                # Tarih formatı
-                ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-                plt.setp(ax.xaxis.get_majorticklabels(), rotation=45)
-                
-                # Arka plan rengi
-                ax.set_facecolor('#1e1e1e')
-                fig.patch.set_facecolor('#1e1e1e')
-                
-                # Eksen renkleri
-                ax.tick_params(colors='white')
-                ax.spines['top'].set_visible(False)
-                ax.spines['right'].set_visible(False)
-                ax.spines['bottom'].set_color('white')
-                ax.spines['left'].set_color('white')
-                
-                # Grafiği base64'e çevir
-                buffer = io.BytesIO()
-                plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight', facecolor='#1e1e1e')
-                buffer.seek(0)
-                img_base64 = base64.b64encode(buffer.getvalue()).decode()
-                buffer.close()
-                plt.close()
-                
-                img_base64 = f"<img src=\"data:image/png;base64,{img_base64}\" alt=\"Fiyat Grafiği\" style=\"width:100%; height:auto; border-radius:8px;\">"
-                
-            except Exception as e:
-                print(f"Fiyat Matplotlib grafik hatası: {e}")
-                img_base64 = "<div style='color:red; padding:20px; text-align:center;'>Fiyat Grafik yüklenemedi</div>"
-            
-            charts.append({
-                "title": "KCHOL Fiyat Grafiği",
-                "type": "line",
-                "data": img_base64
-            })
-            
-            return charts
-            
-        except Exception as e:
-            print(f"Fiyat grafik oluşturma hatası: {e}")
-            return []
+        return self._charts('price', df, mode)
     
     def analyze_technical_indicators(self, df):
         """Teknik indikatörleri analiz et"""
@@ -974,7 +305,7 @@ Kod:
             
             # MACD analizi
             current_macd = df['MACD'].iloc[-1]
-            current_signal = df['MACD_Signal'].iloc[-1]
+            current_signal = df['MACD_SIGNAL'].iloc[-1]
             macd_signal = "Pozitif" if current_macd > current_signal else "Negatif"
             
             # SMA analizi
@@ -995,9 +326,9 @@ Kod:
                 sma_signal = "Kararsız trend"
             
             # Bollinger Bands analizi
-            bb_upper = df['BB_Upper'].iloc[-1]
-            bb_lower = df['BB_Lower'].iloc[-1]
-            bb_middle = df['BB_Middle'].iloc[-1]
+            bb_upper = df['BB_UPPER'].iloc[-1]
+            bb_lower = df['BB_LOWER'].iloc[-1]
+            bb_middle = df['BB_MIDDLE'].iloc[-1]
             
             bb_signal = ""
             if current_price > bb_upper:
@@ -1008,7 +339,7 @@ Kod:
                 bb_signal = "Bantlar arasında - Normal seviye"
             
             # Williams %R analizi
-            williams_r = df['Williams'].iloc[-1]
+            williams_r = df['WILLIAMS'].iloc[-1]
             williams_signal = "Aşırı alım" if williams_r > -20 else "Aşırı satım" if williams_r < -80 else "Nötr"
             
             # ATR analizi (Volatilite)
@@ -1201,9 +532,9 @@ Kod:
         """Sadece MACD analizi"""
         try:
             current_macd = df['MACD'].iloc[-1]
-            current_signal = df['MACD_Signal'].iloc[-1]
+            current_signal = df['MACD_SIGNAL'].iloc[-1]
             prev_macd = df['MACD'].iloc[-2]
-            prev_signal = df['MACD_Signal'].iloc[-2]
+            prev_signal = df['MACD_SIGNAL'].iloc[-2]
             
             macd_signal = "Pozitif" if current_macd > current_signal else "Negatif"
             macd_trend = "Güçleniyor" if current_macd > prev_macd else "Zayıflıyor" if current_macd < prev_macd else "Sabit"
@@ -1237,9 +568,9 @@ Kod:
         """Sadece Bollinger Bands analizi"""
         try:
             current_price = df['close'].iloc[-1]
-            bb_upper = df['BB_Upper'].iloc[-1]
-            bb_lower = df['BB_Lower'].iloc[-1]
-            bb_middle = df['BB_Middle'].iloc[-1]
+            bb_upper = df['BB_UPPER'].iloc[-1]
+            bb_lower = df['BB_LOWER'].iloc[-1]
+            bb_middle = df['BB_MIDDLE'].iloc[-1]
             
             bb_position = (current_price - bb_lower) / (bb_upper - bb_lower) * 100
             
@@ -1252,7 +583,7 @@ Kod:
                 bb_signal = "Bantlar arasında - Normal seviye"
             
             bb_width = bb_upper - bb_lower
-            avg_bb_width = (df['BB_Upper'] - df['BB_Lower']).mean()
+            avg_bb_width = (df['BB_UPPER'] - df['BB_LOWER']).mean()
             volatility = "Yüksek" if bb_width > avg_bb_width * 1.2 else "Düşük" if bb_width < avg_bb_width * 0.8 else "Normal"
             
             analysis = f"""
@@ -1387,7 +718,7 @@ Kod:
         except Exception as e:
             return f"Fiyat analiz hatası: {e}"
     
-    def process_technical_analysis_request(self, user_request):
+    def process_technical_analysis_request(self, user_request, chart_mode=None):
         """Teknik analiz isteğini işle"""
         try:
             # Hisse verisi al
@@ -1403,7 +734,7 @@ Kod:
             # Gemini ile kullanıcı isteğini analiz et
             if self.model:
                 try:
-                    analysis_result = self.analyze_request_with_gemini(user_request, df)
+                    analysis_result = self.analyze_request_with_gemini(user_request, df, chart_mode)
                     if analysis_result:
                         return analysis_result
                 except Exception as e:
@@ -1411,7 +742,7 @@ Kod:
                     # Fallback to rule-based analysis
             
             # Fallback: Rule-based analiz
-            return self.rule_based_analysis(user_request, df)
+            return self.rule_based_analysis(user_request, df, chart_mode)
             
         except Exception as e:
             return {
@@ -1421,20 +752,20 @@ Kod:
                 "summary": ""
             }
     
-    def analyze_request_with_gemini(self, user_request, df):
+    def analyze_request_with_gemini(self, user_request, df, chart_mode=None):
         """Gemini ile kullanıcı isteğini analiz et"""
         try:
             # Mevcut teknik verileri hazırla
             current_price = df['close'].iloc[-1]
             current_rsi = df['RSI'].iloc[-1]
             current_macd = df['MACD'].iloc[-1]
-            current_signal = df['MACD_Signal'].iloc[-1]
+            current_signal = df['MACD_SIGNAL'].iloc[-1]
             sma20 = df['SMA20'].iloc[-1]
             sma50 = df['SMA50'].iloc[-1]
             sma200 = df['SMA200'].iloc[-1]
-            bb_upper = df['BB_Upper'].iloc[-1]
-            bb_lower = df['BB_Lower'].iloc[-1]
-            bb_middle = df['BB_Middle'].iloc[-1]
+            bb_upper = df['BB_UPPER'].iloc[-1]
+            bb_lower = df['BB_LOWER'].iloc[-1]
+            bb_middle = df['BB_MIDDLE'].iloc[-1]
             current_volume = df['volume'].iloc[-1]
             avg_volume = df['volume'].mean()
             
@@ -1460,6 +791,7 @@ Kullanıcının isteğine göre hangi analizleri yapmam gerekiyor? Aşağıdaki
 5. VOLUME_ANALYSIS - Hacim grafiği ve analizi
 6. PRICE_ANALYSIS - Fiyat grafiği ve analizi
 7. FULL_ANALYSIS - Tüm grafikler ve genel analiz
+8. CUSTOM_ANALYSIS - Yukarıdakilerin karşılamadığı özel grafik ya da hesaplama (ör. belirli bir dönem, göstergelerin karşılaştırması)
 
 Sadece JSON formatında yanıt ver:
 {{
@@ -1471,8 +803,7 @@ Sadece JSON formatında yanıt ver:
 Eğer kullanıcı genel bir analiz istiyorsa FULL_ANALYSIS seç.
 """
             
-            response = self.model.generate_content(prompt)
-            response_text = response.text.strip()
+            response_text = llm_gateway.generate(self.model, prompt, scope='technical').strip()
             
             # JSON yanıtını parse et
             import json
@@ -1487,26 +818,37 @@ Eğer kullanıcı genel bir analiz istiyorsa FULL_ANALYSIS seç.
                 
                 for analysis in analyses:
                     if analysis == "RSI_ANALYSIS":
-                        charts.extend(self.create_rsi_chart(df))
+                        charts.extend(self.create_rsi_chart(df, chart_mode))
                         analysis_text += self.analyze_rsi(df) + "\n\n"
                     elif analysis == "MACD_ANALYSIS":
-                        charts.extend(self.create_macd_chart(df))
+                        charts.extend(self.create_macd_chart(df, chart_mode))
                         analysis_text += self.analyze_macd(df) + "\n\n"
                     elif analysis == "BOLLINGER_ANALYSIS":
-                        charts.extend(self.create_bollinger_chart(df))
+                        charts.extend(self.create_bollinger_chart(df, chart_mode))
                         analysis_text += self.analyze_bollinger(df) + "\n\n"
                     elif analysis == "SMA_ANALYSIS":
-                        charts.extend(self.create_sma_chart(df))
+                        charts.extend(self.create_sma_chart(df, chart_mode))
                         analysis_text += self.analyze_sma(df) + "\n\n"
                     elif analysis == "VOLUME_ANALYSIS":
-                        charts.extend(self.create_volume_chart(df))
+                        charts.extend(self.create_volume_chart(df, chart_mode))
                         analysis_text += self.analyze_volume(df) + "\n\n"
                     elif analysis == "PRICE_ANALYSIS":
-                        charts.extend(self.create_price_chart(df))
+                        charts.extend(self.create_price_chart(df, chart_mode))
                         analysis_text += self.analyze_price(df) + "\n\n"
                     elif analysis == "FULL_ANALYSIS":
-                        charts.extend(self.create_default_charts(df))
+                        charts.extend(self.create_default_charts(df, chart_mode))
                         analysis_text += self.analyze_technical_indicators(df)
+                    elif analysis == "CUSTOM_ANALYSIS":
+                        # Üretilen kod sanal alanda çalışır; aynı istek için derlenmiş kod önbellekten gelir
+                        custom = self.custom_analysis(user_request, df)
+                        if custom:
+                            charts.extend(custom['charts'])
+                            analysis_text += custom['analysis'] + "\n\n"
+                            custom_message = custom_message or custom['summary']
+                
+                if not charts and not analysis_text.strip():
+                    # Hiçbir analiz üretilemediyse kural tabanlı analize düşülür
+                    return None
                 
                 return {
                     "charts": charts,
@@ -1523,44 +865,44 @@ Eğer kullanıcı genel bir analiz istiyorsa FULL_ANALYSIS seç.
             print(f"Gemini analiz hatası: {e}")
             return None
     
-    def rule_based_analysis(self, user_request, df):
+    def rule_based_analysis(self, user_request, df, chart_mode=None):
         """Rule-based analiz (fallback)"""
         user_request_lower = user_request.lower()
         
         # Spesifik analiz istekleri
         if any(word in user_request_lower for word in ['rsi', 'relative strength']):
-            charts = self.create_rsi_chart(df)
+            charts = self.create_rsi_chart(df, chart_mode)
             analysis = self.analyze_rsi(df)
             summary = "RSI analizi tamamlandı."
             
         elif any(word in user_request_lower for word in ['macd', 'moving average convergence']):
-            charts = self.create_macd_chart(df)
+            charts = self.create_macd_chart(df, chart_mode)
             analysis = self.analyze_macd(df)
             summary = "MACD analizi tamamlandı."
             
         elif any(word in user_request_lower for word in ['bollinger', 'bb', 'bant']):
-            charts = self.create_bollinger_chart(df)
+            charts = self.create_bollinger_chart(df, chart_mode)
             analysis = self.analyze_bollinger(df)
             summary = "Bollinger Bands analizi tamamlandı."
             
         elif any(word in user_request_lower for word in ['sma', 'hareketli ortalama', 'moving average']):
-            charts = self.create_sma_chart(df)
+            charts = self.create_sma_chart(df, chart_mode)
             analysis = self.analyze_sma(df)
             summary = "Hareketli ortalama analizi tamamlandı."
             
         elif any(word in user_request_lower for word in ['hacim', 'volume']):
-            charts = self.create_volume_chart(df)
+            charts = self.create_volume_chart(df, chart_mode)
             analysis = self.analyze_volume(df)
             summary = "Hacim analizi tamamlandı."
             
         elif any(word in user_request_lower for word in ['fiyat', 'price', 'mum', 'candlestick']):
-            charts = self.create_price_chart(df)
+            charts = self.create_price_chart(df, chart_mode)
             analysis = self.analyze_price(df)
             summary = "Fiyat analizi tamamlandı."
             
         else:
             # Genel teknik analiz - tüm grafikleri getir
-            charts = self.create_default_charts(df)
+            charts = self.create_default_charts(df, chart_mode)
             analysis = self.analyze_technical_indicators(df)
             summary = f"KCHOL hisse senedi teknik analizi tamamlandı. {len(charts)} grafik oluşturuldu."
         
@@ -0,0 +1,219 @@
+# universe.py
+# Hisse evreni motoru - izleme listesinin tamamı için tarih x sembol matrisleri üzerinde vektörel indikatör ve tarama
+
+import os
+import re
+import threading
+import warnings
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from bar_store import BAR_COLUMNS
+from indicators import DEFAULT_PARAMS, IndicatorGraph, build_graph, indicator_columns, rolling, shift
+from market_data import market_data_service
+
+# İzlenen BIST hisseleri
+WATCHLIST = [
+    'KCHOL.IS', 'THYAO.IS', 'GARAN.IS', 'AKBNK.IS', 'ASELS.IS', 'SASA.IS',
+    'EREGL.IS', 'ISCTR.IS', 'BIMAS.IS', 'ALARK.IS', 'TUPRS.IS', 'PGSUS.IS',
+    'KRDMD.IS', 'TAVHL.IS', 'DOAS.IS', 'TOASO.IS', 'FROTO.IS', 'VESTL.IS',
+    'YAPI.IS', 'QNBFB.IS', 'HALKB.IS', 'VAKBN.IS', 'SISE.IS', 'KERVN.IS'
+]
+
+# Tarama koşullarında kullanılabilecek karşılaştırmalar
+OPERATORS = {
+    '>': np.greater,
+    '>=': np.greater_equal,
+    '<': np.less,
+    '<=': np.less_equal,
+    '==': np.equal,
+    '!=': np.not_equal,
+}
+
+CONDITION_PATTERN = re.compile(r'^\s*([A-Za-z0-9_]+)\s*(>=|<=|==|!=|>|<)\s*(-?\d+(?:\.\d+)?)\s*$')
+
+# Tek hisse indikatörlerine ek olarak evrende tanımlı sütunlar
+UNIVERSE_COLUMNS = ['RETURNS', 'VOLUME_AVG', 'VOLUME_RATIO']
+
+
+def parse_condition(text: str) -> Tuple[str, str, float]:
+    """'VOLUME_RATIO>1.5' biçimindeki koşulu (sütun, operatör, değer) üçlüsüne çevir"""
+    match = CONDITION_PATTERN.match(text)
+    if not match:
+        raise ValueError(f"Geçersiz tarama koşulu: {text}")
+    return match.group(1).upper(), match.group(2), float(match.group(3))
+
+
+def build_universe_graph(params: Dict) -> Dict:
+    """indicators.build_graph + evren taramalarında kullanılan getiri/hacim düğümleri"""
+    graph = build_graph(params)
+    graph['RETURNS'] = (('close',), lambda close: close / shift(close) - 1)
+    graph['VOLUME_AVG'] = (('volume',), lambda volume: rolling(volume, params['volume_window'], np.mean))
+    graph['VOLUME_RATIO'] = (('volume', 'VOLUME_AVG'), lambda volume, average: volume / average)
+    return graph
+
+
+class Universe:
+    """Sembollerin OHLCV verisini hizalanmış tarih x sembol matrislerinde tutar
+
+    İndikatörler indicators.py'deki aynı bağımlılık grafiğiyle, ama tüm semboller
+    için tek vektörel geçişte ve ilk talepte hesaplanır; "RSI'a göre ilk 5" ya da
+    "hacim oranı > 1.5" gibi sorgular sembol döngüsü olmadan dizi işlemleriyle
+    yanıtlanır. Tarihler sembollerin birleşimidir: bir hissenin işlem görmediği
+    günler NaN kalır, bu yüzden sonuçlar tüm günlerde işlem gören hisseler için
+    sembol bazındaki hesapla birebir aynıdır.
+    """
+
+    def __init__(self, frames: Dict[str, pd.DataFrame], params: Optional[Dict] = None):
+        self.params = {**DEFAULT_PARAMS, 'volume_window': int(os.getenv('UNIVERSE_VOLUME_WINDOW', 20)),
+                       **(params or {})}
+        self.symbols = [symbol for symbol, df in frames.items() if df is not None and not df.empty]
+        self.dates = pd.DatetimeIndex([])
+        for symbol in self.symbols:
+            self.dates = self.dates.union(frames[symbol].index)
+
+        base = {col: np.empty((len(self.dates), len(self.symbols))) for col in BAR_COLUMNS}
+        for i, symbol in enumerate(self.symbols):
+            aligned = frames[symbol][BAR_COLUMNS].reindex(self.dates)
+            for col in BAR_COLUMNS:
+                base[col][:, i] = aligned[col].to_numpy(dtype='f8')
+        self.columns = BAR_COLUMNS + indicator_columns(self.params) + UNIVERSE_COLUMNS
+        self._graph = IndicatorGraph(base, build_universe_graph(self.params))
+
+        # Her sembolün son geçerli barının satırı (işlemi durdurulan hisseler daha erken biter)
+        valid = ~np.isnan(base['close'])
+        self._last_row = len(self.dates) - 1 - np.argmax(valid[::-1], axis=0)
+        self._last_row[~valid.any(axis=0)] = 0
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.symbols) == 0 or len(self.dates) == 0
+
+    def matrix(self, name: str) -> np.ndarray:
+        """Salt okunur tarih x sembol matrisi"""
+        if name not in self.columns:
+            raise KeyError(name)
+        return self._graph.get(name)
+
+    def __getitem__(self, name: str) -> pd.DataFrame:
+        return pd.DataFrame(self.matrix(name), index=self.dates, columns=self.symbols, copy=True)
+
+    def latest(self, name: str) -> np.ndarray:
+        """Her sembolün son barındaki değer (sembol sırasıyla)"""
+        if self.empty:
+            return np.empty(0)
+        return self.matrix(name)[self._last_row, np.arange(len(self.symbols))]
+
+    def last_dates(self) -> pd.DatetimeIndex:
+        """Her sembolün son barının tarihi (sembol sırasıyla)"""
+        return self.dates[self._last_row] if not self.empty else pd.DatetimeIndex([])
+
+    def mean(self, name: str) -> np.ndarray:
+        """Pencere boyunca sembol başına ortalama (NaN'lar atlanır)"""
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            return np.nanmean(self.matrix(name), axis=0)
+
+    def volatility(self, periods_per_year: int = 252) -> np.ndarray:
+        """Pencere boyunca yıllıklandırılmış getiri oynaklığı (pandas std, ddof=1)"""
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            return np.nanstd(self.matrix('RETURNS'), axis=0, ddof=1) * np.sqrt(periods_per_year)
+
+    def snapshot(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Sembol x sütun tablosu: her sembolün son barındaki değerler"""
+        columns = columns or self.columns
+        return pd.DataFrame({col: self.latest(col) for col in columns}, index=pd.Index(self.symbols, name='symbol'))
+
+    def mask(self, name: str, op: str, value: float) -> np.ndarray:
+        """Son bar değerleri için koşul maskesi; NaN değerler koşulu sağlamaz"""
+        with np.errstate(invalid='ignore'):
+            return OPERATORS[op](self.latest(name), value)
+
+    def select(self, conditions: Optional[Sequence[Tuple[str, str, float]]] = None) -> np.ndarray:
+        """Tüm koşulları (VE) sağlayan sembollerin maskesi"""
+        selected = np.ones(len(self.symbols), dtype=bool)
+        for name, op, value in conditions or []:
+            selected &= self.mask(name, op, value)
+        return selected
+
+    def screen(self, conditions: Sequence[Tuple[str, str, float]]) -> List[str]:
+        """Tüm koşulları sağlayan semboller, ör. [('VOLUME_RATIO', '>', 1.5), ('RSI', '<', 70)]"""
+        return [self.symbols[i] for i in np.flatnonzero(self.select(conditions))]
+
+    def top(self, name: str, n: int = 5, ascending: bool = False,
+            conditions: Optional[Sequence[Tuple[str, str, float]]] = None) -> List[Tuple[str, float]]:
+        """Sütuna göre sıralanmış ilk n sembol ve değerleri (NaN'lar dışarıda kalır)"""
+        values = self.latest(name)
+        candidates = np.flatnonzero(~np.isnan(values) & self.select(conditions))
+        order = np.argsort(values[candidates], kind='stable')
+        if not ascending:
+            order = order[::-1]
+        return [(self.symbols[i], float(values[i])) for i in candidates[order[:n]]]
+
+    @property
+    def computed(self) -> List[str]:
+        return [col for col in self.columns if col in self._graph.values and col not in BAR_COLUMNS]
+
+
+class UniverseCache:
+    """Aynı barlar için evren matrislerini (ve hesaplanmış indikatörlerini) yeniden kullanır
+
+    Anahtar, sembollerin son bar tarihi/uzunluğu/kapanışından oluşur; yeni bar
+    geldiğinde yeni bir evren kurulur.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv('UNIVERSE_CACHE_SIZE', 8))
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0}
+
+    @staticmethod
+    def _key(frames: Dict[str, pd.DataFrame], params: Dict):
+        return (tuple((symbol.upper(), df.index[0], df.index[-1], len(df), float(df['close'].iloc[0]),
+                       float(df['close'].iloc[-1]))
+                      for symbol, df in frames.items()),
+                tuple(sorted(params.items())))
+
+    def get(self, frames: Dict[str, pd.DataFrame], params: Optional[Dict] = None) -> Universe:
+        params = params or {}
+        key = self._key(frames, params)
+        with self._lock:
+            universe = self._cache.get(key)
+            if universe is not None:
+                self._cache.move_to_end(key)
+                self._stats['hits'] += 1
+                return universe
+            self._stats['misses'] += 1
+
+        universe = Universe(frames, params)
+        with self._lock:
+            self._cache[key] = universe
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return universe
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self._stats, 'entries': len(self._cache), 'max_entries': self.max_entries}
+
+
+# Süreç genelinde paylaşılan tek örnek
+universe_cache = UniverseCache()
+
+
+def load_universe(symbols: Optional[List[str]] = None, days: int = 60,
+                  timeout: Optional[int] = None, **params) -> Tuple[Universe, List[str]]:
+    """Sembollerin verisini tek toplu istekle alıp evreni kur: (evren, veri alınamayan semboller)"""
+    symbols = symbols or WATCHLIST
+    frames, failed = market_data_service.get_histories(symbols, days=days, timeout=timeout)
+    # Evrendeki sütun sırası istenen sembol sırasıyla aynı olsun
+    frames = {symbol: frames[symbol] for symbol in symbols if symbol in frames}
+    return universe_cache.get(frames, params), failed
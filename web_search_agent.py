@@ -9,6 +9,7 @@ from urllib.parse import urljoin, urlparse
 import google.generativeai as genai
 from dotenv import load_dotenv
 import logging
+from llm_gateway import llm_gateway
 
 # Load environment variables
 load_dotenv()
@@ -453,28 +454,30 @@ class WebSearchAgent:
             return "Gemini API kullanılamıyor."
         
         try:
-            # En önemli sonuçlardan içerik çıkar
-            content_summary = []
+            # Aramanın başlık/URL/özetleri aynıysa (yakın tekrar) sayfa içerikleri hiç indirilmez
+            def build_prompt():
+                # En önemli sonuçlardan içerik çıkar
+                content_summary = []
             
-            for i, result in enumerate(search_results[:5]):
-                title = result.get('title', '')
-                url = result.get('url', '')
-                snippet = result.get('snippet', '')
+                for i, result in enumerate(search_results[:5]):
+                    title = result.get('title', '')
+                    url = result.get('url', '')
+                    snippet = result.get('snippet', '')
                 
-                # URL'den içerik çıkar
-                full_content = self.extract_content_from_url(url)
-                if full_content:
-                    content_summary.append(f"Kaynak {i+1}: {title}\nURL: {url}\nİçerik: {full_content[:500]}...\n")
-                else:
-                    content_summary.append(f"Kaynak {i+1}: {title}\nURL: {url}\nÖzet: {snippet}\n")
-            
-            # Kaynak URL'lerini hazırla
-            source_urls = []
-            for i, result in enumerate(search_results[:5]):
-                source_urls.append(f"Kaynak {i+1}: {result.get('url', 'N/A')}")
-            
-            # Gemini ile analiz yap
-            analysis_prompt = f"""
+                    # URL'den içerik çıkar
+                    full_content = self.extract_content_from_url(url)
+                    if full_content:
+                        content_summary.append(f"Kaynak {i+1}: {title}\nURL: {url}\nİçerik: {full_content[:500]}...\n")
+                    else:
+                        content_summary.append(f"Kaynak {i+1}: {title}\nURL: {url}\nÖzet: {snippet}\n")
+            
+                # Kaynak URL'lerini hazırla
+                source_urls = []
+                for i, result in enumerate(search_results[:5]):
+                    source_urls.append(f"Kaynak {i+1}: {result.get('url', 'N/A')}")
+            
+                # Gemini ile analiz yap
+                analysis_prompt = f"""
 Sen bir finans analisti olarak KCHOL hisse senedi ile ilgili web içeriklerini analiz ediyorsun.
 
 Kullanıcı sorusu: {query}
@@ -498,9 +501,11 @@ Analiz kuralları:
 
 Yanıtını ver:
 """
+                return analysis_prompt
             
-            response = self.gemini_model.generate_content(analysis_prompt)
-            return response.text.strip()
+            results_context = [(r.get('title', ''), r.get('url', ''), r.get('snippet', '')) for r in search_results[:5]]
+            return llm_gateway.generate(self.gemini_model, build_prompt, scope='web', question=query,
+                                        context=results_context, ttl=llm_gateway.news_ttl).strip()
             
         except Exception as e:
             self.logger.error(f"Web içerik analizi hatası: {e}")
@@ -778,8 +783,8 @@ Yanıtını ver:
 """
             
             if self.gemini_model:
-                response = self.gemini_model.generate_content(analysis_prompt)
-                analysis = response.text.strip()
+                analysis = llm_gateway.generate(self.gemini_model, analysis_prompt, scope='web_prediction',
+                                                ttl=llm_gateway.news_ttl).strip()
             else:
                 analysis = self._create_fallback_analysis(user_question, model_prediction, ranked_results, has_conflict, conflict_explanation)
             
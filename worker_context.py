@@ -0,0 +1,23 @@
+# worker_context.py
+# Grafik ve kod sanal alanı işçi süreçleri için ortak multiprocessing bağlamı
+
+import multiprocessing as mp
+
+# forkserver sunucusu bu modülleri bir kez içe aktarır; işçiler ondan fork edilir (matplotlib/pandas
+# her işçide yeniden yüklenmez). Sunucu süreç başına tektir, bu yüzden liste tüm havuzlar için ortaktır.
+PRELOAD_MODULES = ['code_sandbox', 'chart_renderer']
+
+
+def worker_context():
+    """forkserver bağlamı (desteklenmeyen platformlarda spawn)
+
+    Çok iş parçacıklı Flask sürecinden doğrudan fork etmek kilitli durumları kopyalayabilir;
+    forkserver işçileri yalnızca PRELOAD_MODULES'ü yüklemiş tek iş parçacıklı sunucudan fork eder.
+    Her iki yöntemde de ana betik işçide __mp_main__ olarak yeniden içe aktarılır; app.py bu
+    durumda ajan kurulumunu atlar.
+    """
+    if 'forkserver' not in mp.get_all_start_methods():
+        return mp.get_context('spawn')
+    context = mp.get_context('forkserver')
+    context.set_forkserver_preload(PRELOAD_MODULES)
+    return context